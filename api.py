@@ -1,65 +1,480 @@
-from fastapi import FastAPI, Depends, HTTPException
+import time
+_import_start = time.perf_counter()
+
+import asyncio
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.security import HTTPBasicCredentials
 from src.auth import authenticate
-from src.validation import InputFeatures, FullInputFeatures
-from src.logger import log_prediction
-from src.utils import get_model, get_zipcode_features
+from src.validation import (ColumnarInputFeatures, ComparablesQuery, InputFeatures, FullInputFeatures,
+                            RoutingUpdate)
+from src.serialization import encode_response, read_body, response_format
+from src.logger import log_prediction, log_prediction_async, prediction_sink
+from src.registry import ModelBundle, parse_run, registry
+from src.routing import Routing, parse_canary, record_live, router, shadow_scorer
+from src.admission import DEADLINE_HEADER, Overloaded, admission
+from src.batching import micro_batcher
+from src.cache import prediction_cache
+from src.comparables import ComparableSales, comparables
+from src.metrics import (IN_FLIGHT, ZIPCODE_LOOKUPS, finish_request, metrics, stage,
+                         start_request, timed_handler)
+from typing import List, Union
+from pydantic import ValidationError
+from contextlib import asynccontextmanager
 from datetime import datetime
 from src.config import settings
-import numpy as np
+from src.startup import startup, warm_up
 import uuid
 
-app = FastAPI()
+startup.imported(_import_start)
+
+# Header selecting the run that scores a request: "experiment_id/run_id"
+MODEL_HEADER = "X-Model-Run"
+
+
+def prepare_models():
+    """Load and warm up every model to serve; `/ready` reports ready once this is done."""
+    with startup.phase("load"):
+        registry.load()
+        router.configure_from_settings()
+    if comparables.enabled:
+        with startup.phase("comparables"):
+            comparables.load()
+    with startup.phase("warmup"):
+        for bundle in registry.bundles():
+            warm_up(bundle)
+    if settings.MODEL_WATCH_INTERVAL > 0:
+        registry.start_watcher(settings.MODEL_WATCH_INTERVAL)
+    startup.mark_ready()
+
+
+def prepare_models_in_background():
+    try:
+        prepare_models()
+    except Exception as e:
+        startup.fail(e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.LOAD_IN_BACKGROUND:
+        # Liveness answers at once; `/ready` stays 503 until the models are warm
+        asyncio.get_running_loop().run_in_executor(None, prepare_models_in_background)
+    else:
+        prepare_models()
+    shadow_scorer.start()
+    prediction_sink.start()
+    if settings.MICROBATCH_ENABLED:
+        await micro_batcher.start()
+    yield
+    await micro_batcher.stop()
+    registry.stop_watcher()
+    shadow_scorer.stop()
+    prediction_sink.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+# Registered before record_timings so that one wraps it and also times shed requests
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    """Admit scoring requests through their lane; shed the ones that cannot start in time."""
+    lane = admission.lane_for(request.url.path)
+    if lane is None:
+        return await call_next(request)
+    try:
+        deadline = admission.deadline(request.headers.get(DEADLINE_HEADER), time.monotonic())
+    except ValueError as e:
+        return JSONResponse({"detail": str(e)}, status_code=400)
+    try:
+        async with admission.admit(lane, deadline):
+            return await call_next(request)
+    except Overloaded as e:
+        return JSONResponse({"detail": str(e)}, status_code=503,
+                            headers={"Retry-After": str(e.retry_after)})
+
+
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    timings = start_request()
+    IN_FLIGHT.inc()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        IN_FLIGHT.dec()
+        route = request.scope.get("route")
+        finish_request(timings, route.path if route is not None else "unmatched", status)
+    if settings.SERVER_TIMING:
+        response.headers["Server-Timing"] = timings.server_timing()
+    return response
+
+
+async def model_bundle(request: Request) -> ModelBundle:
+    """The bundle that scores this request: the run in the route or the X-Model-Run
+    header, otherwise a canary run or the active model."""
+    params = request.path_params
+    try:
+        if "run_id" in params:
+            key = parse_run(f"{params['experiment_id']}/{params['run_id']}")
+        elif request.headers.get(MODEL_HEADER):
+            key = parse_run(request.headers[MODEL_HEADER])
+        else:
+            key = router.choose()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if key is None:
+        try:
+            return registry.current()
+        except RuntimeError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+    bundle = registry.lookup(*key)
+    if bundle is not None:
+        return bundle
+    try:
+        return await run_in_threadpool(registry.get_or_load, *key)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Model run {key[0]}/{key[1]} not found.")
+
+
+async def predict_row(bundle, input_features):
+    """Score one row; returns the prediction and whether it came from the result cache."""
+    # The feature buffer is reused by the next request on this thread, and this coroutine
+    # can be suspended before scoring, so work on a copy from here on
+    row = input_features.copy()
+    shared = prediction_cache.enabled and prediction_cache.shared is not None
+    if prediction_cache.enabled:
+        values, found, digests = prediction_cache.lookup(bundle, row)
+        if found[0]:
+            return values, True
+    if shared:
+        # SQLite can wait on another worker's write lock, so keep it off the event loop
+        found = await run_in_threadpool(prediction_cache.lookup_shared, bundle, values, digests)
+        if found[0]:
+            return values, True
+    if micro_batcher.running:
+        prediction = await micro_batcher.predict(bundle, row)
+    else:
+        prediction = await run_in_threadpool(bundle.model.predict, row)
+    if prediction_cache.enabled:
+        prediction_cache.store(bundle, digests, prediction)
+    if shared:
+        # Written in the background: the response never waits for the write lock
+        asyncio.get_running_loop().run_in_executor(
+            None, prediction_cache.store_shared, bundle, digests, prediction)
+    return prediction, False
 
 @app.post("/predict")
-def predict(data: InputFeatures, credentials: HTTPBasicCredentials = Depends(authenticate)):
+@app.post("/models/{experiment_id}/{run_id}/predict")
+@timed_handler
+async def predict(data: InputFeatures, echo: bool = Query(True, alias="features"),
+                  fmt: str = Depends(response_format),
+                  credentials: HTTPBasicCredentials = Depends(authenticate),
+                  bundle: ModelBundle = Depends(model_bundle)):
     try:
-        zipcode_row = get_zipcode_features().loc[data.zipcode]
-        user_features = [
-            data.bedrooms, data.bathrooms, data.sqft_living, data.sqft_lot,
-            data.floors, data.sqft_above, data.sqft_basement
-        ]
-        input_features = np.array(user_features + zipcode_row.tolist()).reshape(1, -1)
-        prediction = get_model().predict(input_features)
+        with stage("features"):
+            input_features = bundle.zipcode_index.single(data)
+        ZIPCODE_LOOKUPS.inc(result="found")
+        with stage("predict"):
+            start = time.perf_counter()
+            prediction, cached = await predict_row(bundle, input_features)
+        if not cached:
+            record_live(bundle, [data], prediction.tolist(), time.perf_counter() - start)
 
         request_id = str(uuid.uuid4())
         timestamp = datetime.utcnow().isoformat()
 
 
-        return {
+        response = {
             "id": request_id,
             "timestamp": timestamp,
             "prediction": prediction.tolist(),
-            "model": {"experiment_id":settings.EXPERIMENT_ID,"run_id":settings.RUN_ID},
-            "features":data.dict()
+            "model": {"experiment_id":bundle.experiment_id,"run_id":bundle.run_id},
+            "features":data.model_dump()
         }
+        await log_prediction_async(input_data=response, full=False)
     except KeyError:
+        ZIPCODE_LOOKUPS.inc(result="unknown")
         raise HTTPException(status_code=404, detail=f"Zipcode {data.zipcode} not found.")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    if not echo:
+        del response["features"]
+    return encode_response(response, fmt)
 
 @app.post("/predict_full")
-def predict_full(data: FullInputFeatures, credentials: HTTPBasicCredentials = Depends(authenticate)):
+@app.post("/models/{experiment_id}/{run_id}/predict_full")
+@timed_handler
+async def predict_full(data: FullInputFeatures, echo: bool = Query(True, alias="features"),
+                       fmt: str = Depends(response_format),
+                       credentials: HTTPBasicCredentials = Depends(authenticate),
+                       bundle: ModelBundle = Depends(model_bundle)):
     try:
-        zipcode_row = get_zipcode_features().loc[data.zipcode]
-        selected_features = [
-            data.bedrooms, data.bathrooms, data.sqft_living, data.sqft_lot,
-            data.floors, data.sqft_above, data.sqft_basement
-        ]
-        input_features = np.array(selected_features + zipcode_row.tolist()).reshape(1, -1)
-        prediction = get_model().predict(input_features)
+        with stage("features"):
+            input_features = bundle.zipcode_index.single(data)
+        ZIPCODE_LOOKUPS.inc(result="found")
+        with stage("predict"):
+            start = time.perf_counter()
+            prediction, cached = await predict_row(bundle, input_features)
+        if not cached:
+            record_live(bundle, [data], prediction.tolist(), time.perf_counter() - start)
 
         request_id = str(uuid.uuid4())
         timestamp = datetime.utcnow().isoformat()
 
-        return {
+        response = {
             "id": request_id,
             "timestamp": timestamp,
             "prediction": prediction.tolist(),
-            "model": {"experiment_id": settings.EXPERIMENT_ID, "run_id": settings.RUN_ID},
-            "features": data.dict()
+            "model": {"experiment_id": bundle.experiment_id, "run_id": bundle.run_id},
+            "features": data.model_dump()
         }
+        await log_prediction_async(input_data=response, full=True)
     except KeyError:
+        ZIPCODE_LOOKUPS.inc(result="unknown")
         raise HTTPException(status_code=404, detail=f"Zipcode {data.zipcode} not found.")
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+    if not echo:
+        del response["features"]
+    return encode_response(response, fmt)
+
+
+@app.get("/health")
+def health():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready():
+    """Readiness: a model is loaded and warmed up. Unauthenticated, like `/health`, for probes."""
+    return JSONResponse(startup.info(), status_code=200 if startup.ready else 503)
+
+
+@app.get("/admin/model")
+def model_info(credentials: HTTPBasicCredentials = Depends(authenticate)):
+    try:
+        return registry.current().info()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@app.post("/admin/reload")
+def reload_model(credentials: HTTPBasicCredentials = Depends(authenticate)):
+    try:
+        bundle = registry.reload()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed, previous model kept: {e}")
+    return bundle.info()
+
+
+@app.get("/admin/models")
+def cached_models(credentials: HTTPBasicCredentials = Depends(authenticate)):
+    bundles = registry.bundles()
+    return {
+        "cache_bytes": registry.cache_bytes,
+        "used_bytes": sum(bundle.size_bytes for bundle in bundles),
+        "models": [bundle.info() for bundle in bundles],
+    }
+
+
+@app.get("/admin/admission")
+def admission_info(credentials: HTTPBasicCredentials = Depends(authenticate)):
+    return admission.info()
+
+
+@app.get("/admin/routing")
+def routing_info(credentials: HTTPBasicCredentials = Depends(authenticate)):
+    return {**router.routing.info(), "shadow_stats": shadow_scorer.stats()}
+
+
+@app.put("/admin/routing")
+def update_routing(update: RoutingUpdate, credentials: HTTPBasicCredentials = Depends(authenticate)):
+    try:
+        routing = Routing(
+            canary=parse_canary(",".join(f"{run}:{weight}" for run, weight in update.canary.items())),
+            shadow=parse_run(update.shadow) if update.shadow else None,
+            shadow_fraction=update.shadow_fraction,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        router.configure(routing)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=f"Model run not found: {e}")
+    return routing.info()
+
+
+def check_batch_size(rows: int):
+    if rows > settings.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {rows} rows exceeds the limit of {settings.MAX_BATCH_SIZE}.")
+
+
+@app.post("/predict_batch")
+@app.post("/models/{experiment_id}/{run_id}/predict_batch")
+@timed_handler
+def predict_batch(data: List[Union[FullInputFeatures, InputFeatures]],
+                  echo: bool = Query(True, alias="features"),
+                  fmt: str = Depends(response_format),
+                  credentials: HTTPBasicCredentials = Depends(authenticate),
+                  bundle: ModelBundle = Depends(model_bundle)):
+    check_batch_size(len(data))
+    try:
+        with stage("features"):
+            input_features, known_mask = bundle.zipcode_index.batch(data)
+        with stage("predict"):
+            start = time.perf_counter()
+            predictions = prediction_cache.predict(bundle, input_features) if len(input_features) else []
+            predict_seconds = time.perf_counter() - start
+        ZIPCODE_LOOKUPS.inc(len(input_features), result="found")
+        ZIPCODE_LOOKUPS.inc(len(data) - len(input_features), result="unknown")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    batch_id = str(uuid.uuid4())
+    timestamp = datetime.utcnow().isoformat()
+    model = {"experiment_id": bundle.experiment_id, "run_id": bundle.run_id}
+    results = []
+    live = []
+    scored = iter(predictions)
+    for index, (row, known) in enumerate(zip(data, known_mask)):
+        if not known:
+            results.append({
+                "index": index,
+                "error": {"status_code": 404, "detail": f"Zipcode {row.zipcode} not found."}
+            })
+            live.append(None)
+            continue
+        result = {
+            "index": index,
+            "id": str(uuid.uuid4()),
+            "timestamp": timestamp,
+            "prediction": [float(next(scored))],
+            "model": model,
+            "features": row.model_dump()
+        }
+        log_prediction(input_data=result, full=isinstance(row, FullInputFeatures))
+        live.append(result["prediction"][0])
+        if not echo:
+            del result["features"]
+        results.append(result)
+    record_live(bundle, data, live, predict_seconds)
+
+    return encode_response({"id": batch_id, "timestamp": timestamp, "model": model, "results": results}, fmt)
+
+
+def score_columns(data: ColumnarInputFeatures, bundle: ModelBundle) -> dict:
+    columns = data.columns()
+    with stage("features"):
+        input_features, known_mask = bundle.zipcode_index.columnar(columns)
+    with stage("predict"):
+        predictions = prediction_cache.predict(bundle, input_features) if len(input_features) else []
+    ZIPCODE_LOOKUPS.inc(len(input_features), result="found")
+    ZIPCODE_LOOKUPS.inc(len(data) - len(input_features), result="unknown")
+
+    timestamp = datetime.utcnow().isoformat()
+    model = {"experiment_id": bundle.experiment_id, "run_id": bundle.run_id}
+    names = list(columns)
+    full = data.is_full()
+    ids, values, errors = [], [], []
+    scored = iter(predictions)
+    for zipcode, known, row in zip(data.zipcode, known_mask, zip(*columns.values())):
+        if not known:
+            ids.append(None)
+            values.append(None)
+            errors.append(f"Zipcode {zipcode} not found.")
+            continue
+        request_id = str(uuid.uuid4())
+        prediction = float(next(scored))
+        log_prediction(input_data={
+            "id": request_id,
+            "timestamp": timestamp,
+            "prediction": [prediction],
+            "model": model,
+            "features": dict(zip(names, row)),
+        }, full=full)
+        ids.append(request_id)
+        values.append(prediction)
+        errors.append(None)
+    return {"id": str(uuid.uuid4()), "timestamp": timestamp, "model": model,
+            "ids": ids, "prediction": values, "error": errors}
+
+
+@app.post("/predict_columnar")
+@app.post("/models/{experiment_id}/{run_id}/predict_columnar")
+@timed_handler
+async def predict_columnar(request: Request, fmt: str = Depends(response_format),
+                           credentials: HTTPBasicCredentials = Depends(authenticate),
+                           bundle: ModelBundle = Depends(model_bundle)):
+    """Batch scoring with one array per feature in and one array per field out.
+
+    The body is JSON or MessagePack (by Content-Type) and input features are never
+    echoed back. Rows with an unknown zipcode get a null prediction and an error.
+    """
+    try:
+        data = ColumnarInputFeatures.model_validate(await read_body(request))
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    check_batch_size(len(data))
+    try:
+        response = await run_in_threadpool(score_columns, data, bundle)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return encode_response(response, fmt)
+
+
+def comparable_sales() -> ComparableSales:
+    if not comparables.enabled:
+        raise HTTPException(status_code=404, detail="Comparable sales are disabled.")
+    try:
+        return comparables.current()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+def check_comparables(queries: List[ComparablesQuery]):
+    for query in queries:
+        if query.k > settings.COMPARABLES_MAX_K:
+            raise HTTPException(
+                status_code=400,
+                detail=f"k of {query.k} exceeds the limit of {settings.COMPARABLES_MAX_K}.")
+
+
+@app.post("/comparables")
+@timed_handler
+async def find_comparables(query: ComparablesQuery, fmt: str = Depends(response_format),
+                           credentials: HTTPBasicCredentials = Depends(authenticate),
+                           index: ComparableSales = Depends(comparable_sales)):
+    """The k nearest past sales to (lat, long) by haversine distance, nearest first.
+
+    A query takes about 0.1 ms, so it runs on the event loop rather than a thread.
+    """
+    check_comparables([query])
+    with stage("comparables"):
+        sales = index.query(query)
+    return encode_response({"comparables": sales}, fmt)
+
+
+@app.post("/comparables/batch")
+@timed_handler
+def find_comparables_batch(queries: List[ComparablesQuery], fmt: str = Depends(response_format),
+                           credentials: HTTPBasicCredentials = Depends(authenticate),
+                           index: ComparableSales = Depends(comparable_sales)):
+    check_batch_size(len(queries))
+    check_comparables(queries)
+    with stage("comparables"):
+        results = index.query_many(queries)
+    return encode_response(
+        {"results": [{"index": i, "comparables": sales} for i, sales in enumerate(results)]}, fmt)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics(credentials: HTTPBasicCredentials = Depends(authenticate)):
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
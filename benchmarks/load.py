@@ -0,0 +1,84 @@
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+import httpx
+import pandas as pd
+from src.client import run_load
+from src.config import settings
+
+EXAMPLES_PATH = "data/future_unseen_examples.csv"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def local_server(workers: int = 1, startup_timeout: float = 60.0, prediction_cache: bool = False):
+    """Run `uvicorn api:app` on a free local port and yield its base URL once `/ready` answers 200.
+
+    The scenarios cycle over a fixed set of rows, so with the result cache on every
+    request after the first pass is a cache hit. It is off unless `prediction_cache`
+    is set, so the numbers measure model scoring.
+    """
+    port = _free_port()
+    env = os.environ.copy()
+    if not prediction_cache:
+        env["PREDICTION_CACHE_SIZE"] = "0"
+        env.pop("PREDICTION_CACHE_PATH", None)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env=env)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+            try:
+                # 503 until the models are loaded and warm, so nothing is measured before that
+                if httpx.get(f"{url}/ready", timeout=1.0).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("uvicorn did not become ready in time")
+            time.sleep(0.2)
+        yield url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def run_scenarios(url: str, concurrency_levels: List[int], requests_per_level: int = 2000,
+                  endpoint: str = "/predict_full") -> Dict[str, Dict[str, float]]:
+    """Latency percentiles and throughput of `endpoint` at each concurrency level."""
+    rows = pd.read_csv(EXAMPLES_PATH).to_dict(orient="records")
+    auth = httpx.BasicAuth(settings.USER, settings.PASSWORD)
+    results = {}
+    for concurrency in concurrency_levels:
+        # Warm connections and the server before measuring
+        asyncio.run(run_load(url + endpoint, rows[:concurrency], auth=auth, concurrency=concurrency))
+        payloads = itertools.islice(itertools.cycle(rows), requests_per_level)
+        report = asyncio.run(run_load(url + endpoint, payloads, auth=auth, concurrency=concurrency,
+                                      retries=0))
+        summary = report.summary()
+        results[f"concurrency_{concurrency}"] = {
+            key: summary[key] for key in ("p50_ms", "p95_ms", "p99_ms", "requests_per_s", "failed")
+        }
+    return results
+
+
+if __name__ == "__main__":
+    with local_server() as server_url:
+        print(json.dumps(run_scenarios(server_url, [1, 8, 32]), indent=2))
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import platform
+import sys
+from datetime import datetime
+from typing import Dict, List
+
+BASELINE_PATH = "benchmarks/baseline.json"
+RESULTS_PATH = "benchmarks/results.json"
+
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Return a message for every metric that got worse than the baseline by more than `tolerance`.
+
+    Latencies (`_us`, `_ms`) regress when they grow, throughputs (`_per_s`) when they shrink,
+    and any failed request counts as a regression.
+    """
+    regressions = []
+    baseline_flat = flatten({k: v for k, v in baseline.items() if k != "meta"})
+    for name, value in flatten({k: v for k, v in current.items() if k != "meta"}).items():
+        if name.endswith(".failed") and value > 0:
+            regressions.append(f"{name}: {value} failed requests")
+            continue
+        reference = baseline_flat.get(name)
+        if not reference:
+            continue
+        if name.endswith(("_us", "_ms")) and value > reference * (1 + tolerance):
+            regressions.append(f"{name}: {value} vs baseline {reference} (+{value / reference - 1:.0%})")
+        elif name.endswith("_per_s") and value < reference * (1 - tolerance):
+            regressions.append(f"{name}: {value} vs baseline {reference} ({value / reference - 1:.0%})")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the prediction service.")
+    parser.add_argument("--skip-stages", action="store_true", help="skip the per-stage microbenchmarks")
+    parser.add_argument("--skip-load", action="store_true", help="skip the end-to-end load scenario")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per concurrency level")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the load scenario")
+    parser.add_argument("--prediction-cache", action="store_true",
+                        help="keep the result cache on in the load scenario, so repeated rows are cache hits")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative slowdown before a metric counts as a regression")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="save this run as the new baseline instead of comparing")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if not args.update_baseline and not os.path.isfile(args.baseline):
+        # Saving a baseline silently would let a slow run pass as the reference
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one.", file=sys.stderr)
+        return 2
+    baseline = None
+    if not args.update_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        # Cache hits are far faster than scoring; baselines from before this setting was recorded had it on
+        cached = baseline.get("meta", {}).get("prediction_cache")
+        if cached != args.prediction_cache:
+            print(f"The baseline was recorded with prediction_cache={cached}; rerun with the same setting "
+                  f"or record a new baseline with --update-baseline.", file=sys.stderr)
+            return 2
+    results = {"meta": {
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "prediction_cache": args.prediction_cache,
+    }}
+    if not args.skip_stages:
+        from benchmarks.stages import run_stages
+        results["stages"] = run_stages()
+    if not args.skip_load:
+        from benchmarks.load import local_server, run_scenarios
+        with local_server(workers=args.workers, prediction_cache=args.prediction_cache) as url:
+            results["load"] = run_scenarios(url, args.concurrency, args.requests)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("Latency regressions against baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import json
+import time
+from typing import Callable, Dict
+import numpy as np
+import pandas as pd
+from fastapi.security import HTTPBasicCredentials
+from src.auth import authenticate
+from src.config import settings
+from src.registry import ModelRegistry
+from src.serialization import encode_response
+from src.validation import FullInputFeatures
+
+EXAMPLES_PATH = "data/future_unseen_examples.csv"
+
+
+def time_call(fn: Callable, min_time: float = 0.2, rounds: int = 20) -> Dict[str, float]:
+    """Median and p95 wall time of `fn()` in microseconds.
+
+    The number of calls per round is calibrated so that one round takes about
+    `min_time / rounds` seconds, which keeps timer resolution out of the result.
+    """
+    fn()
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / rounds or calls >= 1_000_000:
+            break
+        calls *= 2
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        samples.append((time.perf_counter() - start) / calls * 1e6)
+    return {
+        "median_us": round(float(np.median(samples)), 3),
+        "p95_us": round(float(np.percentile(samples, 95)), 3),
+    }
+
+
+def run_stages(batch_size: int = 100) -> Dict[str, Dict[str, float]]:
+    """Time each step of a /predict_full request in isolation against the real model."""
+    bundle = ModelRegistry().load()
+    rows = pd.read_csv(EXAMPLES_PATH).to_dict(orient="records")
+    row = rows[0]
+    data = FullInputFeatures(**row)
+    batch = [FullInputFeatures(**r) for r in (rows * (batch_size // len(rows) + 1))[:batch_size]]
+    credentials = HTTPBasicCredentials(username=settings.USER, password=settings.PASSWORD)
+    input_features = bundle.zipcode_index.single(data).copy()
+    batch_features, _ = bundle.zipcode_index.batch(batch)
+    response = {
+        "id": "00000000-0000-0000-0000-000000000000",
+        "timestamp": "2025-01-01T00:00:00",
+        "prediction": bundle.model.predict(input_features).tolist(),
+        "model": {"experiment_id": bundle.experiment_id, "run_id": bundle.run_id},
+        "features": data.model_dump(),
+    }
+
+    stages = {
+        "auth": lambda: authenticate(credentials),
+        "validation": lambda: FullInputFeatures(**row),
+        "zipcode_join": lambda: bundle.zipcode_index.row(data.zipcode),
+        "array_construction": lambda: bundle.zipcode_index.single(data),
+        "predict": lambda: bundle.model.predict(input_features),
+        "serialization": lambda: encode_response(response).body,
+        f"batch_{batch_size}_assembly": lambda: bundle.zipcode_index.batch(batch),
+        f"batch_{batch_size}_predict": lambda: bundle.model.predict(batch_features),
+    }
+    return {name: time_call(fn) for name, fn in stages.items()}
+
+
+if __name__ == "__main__":
+    print(json.dumps(run_stages(), indent=2))
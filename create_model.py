@@ -1,9 +1,16 @@
+import argparse
 import json
+import os
 import pathlib
 import pickle
+import time
+import warnings
 import mlflow
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
 from typing import List
 from typing import Tuple
+import numpy
 import pandas
 from sklearn import model_selection
 from sklearn import neighbors
@@ -11,15 +18,43 @@ from sklearn import pipeline
 from sklearn import preprocessing
 from sklearn import metrics
 from datetime import datetime
+from src.artifact import save_artifact
+from src.dataset import load_features
+from src.drift import build_baseline, save_sketches
+from src.neighbors import NeighborRegressor, is_euclidean, recall_at_k
 
 SALES_PATH = "data/kc_house_data.csv"  # path to CSV with home sale data
-DEMOGRAPHICS_PATH = "data/kc_house_data.csv"  # path to CSV with demographics
+DEMOGRAPHICS_PATH = "data/zipcode_demographics.csv"  # path to CSV with demographics
 # List of columns (subset) that will be taken from home sale data
 SALES_COLUMN_SELECTION = [
     'price', 'bedrooms', 'bathrooms', 'sqft_living', 'sqft_lot', 'floors',
     'sqft_above', 'sqft_basement', 'zipcode'
 ]
 OUTPUT_DIR = "model"  # Directory where output artifacts will be saved
+# Serving neighbour backends and the parameter sets tried for each one
+NEIGHBOR_BACKENDS = {
+    'brute': [{}],
+    'kd_tree': [{'leaf_size': size} for size in (10, 20, 40, 80)],
+    'ball_tree': [{'leaf_size': size} for size in (10, 20, 40, 80)],
+    'rp_forest': [{'n_trees': trees, 'leaf_size': 40} for trees in (5, 10, 20)],
+}
+MIN_NEIGHBOR_RECALL = 0.95  # Fastest parameter set reaching this recall@k is kept
+SCALERS = {
+    'robust': preprocessing.RobustScaler,
+    'standard': preprocessing.StandardScaler,
+    'minmax': preprocessing.MinMaxScaler,
+}
+# Hyperparameter grid for --search; leaf_size only matters for the tree algorithms
+SEARCH_SPACE = {
+    'scaler': ['robust', 'standard', 'minmax'],
+    'n_neighbors': [3, 5, 10, 15, 25],
+    'weights': ['uniform', 'distance'],
+    'algorithm': ['brute', 'kd_tree', 'ball_tree'],
+    'leaf_size': [15, 30, 60],
+    'p': [1, 2],
+}
+CV_FOLDS = 5  # Cross-validation folds per search candidate
+LATENCY_BUDGET_MS = 2.0  # Max single-row predict latency of the exported model
 run_name = f"KNN_HousePrice_Run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
 def load_data(
@@ -27,9 +62,12 @@ def load_data(
 ) -> Tuple[pandas.DataFrame, pandas.Series]:
     """Load the target and feature data by merging sales and demographics.
 
+    The merged data comes from the feature store (src.dataset), which is only
+    rebuilt when the contents of the source files change.
+
     Args:
         sales_path: path to CSV file with home sale data
-        demographics_path: path to CSV file with home sale data
+        demographics_path: path to CSV file with zipcode demographics
         sales_column_selection: list of columns from sales data to be used as
             features
 
@@ -39,40 +77,209 @@ def load_data(
         series contains the target variable (home sale price).
 
     """
-    data = pandas.read_csv(sales_path,
-                           usecols=sales_column_selection,
-                           dtype={'zipcode': str})
-    demographics = pandas.read_csv("data/zipcode_demographics.csv",
-                                   dtype={'zipcode': str})
-
-    merged_data = data.merge(demographics, how="left",
-                             on="zipcode").drop(columns="zipcode")
-    # Remove the target variable from the dataframe, features will remain
-    y = merged_data.pop('price')
-    x = merged_data
+    features, target, columns = load_features(sales_path, demographics_path, sales_column_selection)
+    # The store keeps float32; the model is fit in float64 like the serving path
+    x = pandas.DataFrame(numpy.asarray(features, dtype=numpy.float64), columns=columns)
+    y = pandas.Series(numpy.asarray(target, dtype=numpy.float64), name='price')
 
     return x, y
 
 
-def main():
+def evaluate_neighbor_backends(
+    model: pipeline.Pipeline, x_test: pandas.DataFrame, y_test: pandas.Series,
+    output_dir: pathlib.Path
+) -> Dict[str, NeighborRegressor]:
+    """Build each serving neighbour backend and compare it against exact search.
+
+    For every backend, recall@k, the RMSE difference against the exact pipeline and
+    the query time per row are logged to MLflow. The fastest parameter set that
+    reaches MIN_NEIGHBOR_RECALL (or the most accurate one, if none does) is pickled
+    as neighbors_<backend>.pkl next to model.pkl.
+
+    Args:
+        model: fitted RobustScaler + KNeighborsRegressor pipeline
+        x_test: held-out features
+        y_test: held-out target
+        output_dir: directory where model.pkl is saved
+
+    Returns:
+        Mapping of backend name to its selected regressor.
+
+    """
+    x = x_test.to_numpy(dtype=numpy.float64)
+    _, exact_indices = model[-1].kneighbors(model[0].transform(x_test))
+    exact_rmse = metrics.mean_squared_error(y_test, model.predict(x_test), squared=False)
+
+    selected = {}
+    for backend, candidates in NEIGHBOR_BACKENDS.items():
+        results = []
+        for params in candidates:
+            regressor = NeighborRegressor.from_pipeline(model, backend, **params)
+            start = time.perf_counter()
+            y_pred = regressor.predict(x)
+            query_ms = (time.perf_counter() - start) * 1000 / len(x)
+            _, indices = regressor.kneighbors(x)
+            results.append({
+                'params': params,
+                'regressor': regressor,
+                'query_ms': query_ms,
+                'recall': recall_at_k(exact_indices, indices),
+                'rmse': metrics.mean_squared_error(y_test, y_pred, squared=False),
+            })
+
+        accurate = [r for r in results if r['recall'] >= MIN_NEIGHBOR_RECALL]
+        if accurate:
+            best = min(accurate, key=lambda r: r['query_ms'])
+        else:
+            best = max(results, key=lambda r: r['recall'])
+
+        mlflow.log_param(f"{backend}_params", json.dumps(best['params']))
+        mlflow.log_metric(f"{backend}_recall_at_k", best['recall'])
+        mlflow.log_metric(f"{backend}_rmse_diff", best['rmse'] - exact_rmse)
+        mlflow.log_metric(f"{backend}_query_ms_per_row", best['query_ms'])
+
+        path = output_dir / f"neighbors_{backend}.pkl"
+        with open(path, 'wb') as f:
+            pickle.dump(best['regressor'], f)
+        mlflow.log_artifact(path.as_posix())
+        selected[backend] = best['regressor']
+
+    return selected
+
+
+def build_pipeline(params: Dict) -> pipeline.Pipeline:
+    """Scaler + KNeighborsRegressor pipeline for one set of search parameters."""
+    knn_params = {key: value for key, value in params.items() if key != 'scaler'}
+    scaler = SCALERS[params.get('scaler', 'robust')]()
+    return pipeline.make_pipeline(scaler, neighbors.KNeighborsRegressor(**knn_params))
+
+
+def search_candidates() -> List[Dict]:
+    candidates = []
+    for params in model_selection.ParameterGrid(SEARCH_SPACE):
+        if params['algorithm'] == 'brute' and params['leaf_size'] != SEARCH_SPACE['leaf_size'][0]:
+            continue
+        candidates.append(params)
+    return candidates
+
+
+_search_data = {}
+
+
+def _init_search_worker(x_train: numpy.ndarray, y_train: numpy.ndarray):
+    _search_data['x'] = x_train
+    _search_data['y'] = y_train
+    warnings.simplefilter('ignore')
+
+
+def measure_latency(model: pipeline.Pipeline, x: numpy.ndarray,
+                    single_rows: int = 200, batch_rows: int = 1000) -> Tuple[float, float]:
+    """Median single-row predict latency and per-row batch latency, in ms."""
+    rng = numpy.random.default_rng(0)
+    rows = x[rng.choice(len(x), size=single_rows)]
+    timings = []
+    for row in rows:
+        start = time.perf_counter()
+        model.predict(row.reshape(1, -1))
+        timings.append(time.perf_counter() - start)
+    batch = x[rng.choice(len(x), size=batch_rows)]
+    start = time.perf_counter()
+    model.predict(batch)
+    batch_ms = (time.perf_counter() - start) * 1000 / batch_rows
+    return float(numpy.median(timings)) * 1000, batch_ms
+
+
+def evaluate_candidate(params: Dict) -> Dict:
+    """Cross-validate one parameter set and time its inference, in a search worker."""
+    x, y = _search_data['x'], _search_data['y']
+    folds = model_selection.KFold(n_splits=CV_FOLDS, shuffle=True, random_state=42)
+    scores = model_selection.cross_val_score(
+        build_pipeline(params), x, y, cv=folds, scoring='neg_root_mean_squared_error', n_jobs=1)
+    model = build_pipeline(params).fit(x, y)
+    single_ms, batch_ms = measure_latency(model, x)
+    return {
+        'params': params,
+        'cv_rmse': float(-scores.mean()),
+        'cv_rmse_std': float(scores.std()),
+        'single_row_ms': single_ms,
+        'batch_ms_per_row': batch_ms,
+    }
+
+
+def search_hyperparameters(
+    x_train: pandas.DataFrame, y_train: pandas.Series, latency_budget_ms: float,
+    workers: int = None
+) -> Dict:
+    """Cross-validate every candidate in SEARCH_SPACE across a process pool.
+
+    Each candidate's CV RMSE and inference latency are logged to MLflow as a nested
+    run. Candidates are timed while the other workers are busy, so latencies are
+    best compared with each other rather than read as absolute serving numbers.
+
+    Args:
+        x_train: training features
+        y_train: training target
+        latency_budget_ms: maximum single-row predict latency of the selected model
+        workers: number of worker processes, defaults to every core
+
+    Returns:
+        Result of the candidate with the lowest CV RMSE within the latency budget,
+        or of the fastest candidate when none fits the budget.
+
+    """
+    candidates = search_candidates()
+    with ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(), initializer=_init_search_worker,
+            initargs=(x_train.to_numpy(dtype=numpy.float64), y_train.to_numpy())) as executor:
+        results = list(executor.map(evaluate_candidate, candidates))
+
+    for result in results:
+        with mlflow.start_run(run_name=f"candidate_{json.dumps(result['params'], sort_keys=True)}",
+                              nested=True):
+            mlflow.log_params(result['params'])
+            mlflow.log_metric('cv_rmse', result['cv_rmse'])
+            mlflow.log_metric('cv_rmse_std', result['cv_rmse_std'])
+            mlflow.log_metric('single_row_ms', result['single_row_ms'])
+            mlflow.log_metric('batch_ms_per_row', result['batch_ms_per_row'])
+
+    within_budget = [r for r in results if r['single_row_ms'] <= latency_budget_ms]
+    if within_budget:
+        return min(within_budget, key=lambda r: r['cv_rmse'])
+    print(f"No candidate within {latency_budget_ms} ms; using the fastest one.")
+    return min(results, key=lambda r: r['single_row_ms'])
+
+
+def main(search: bool = False, latency_budget_ms: float = LATENCY_BUDGET_MS, workers: int = None):
     """Load data, train model, and export artifacts."""
     x, y = load_data(SALES_PATH, DEMOGRAPHICS_PATH, SALES_COLUMN_SELECTION)
     x_train, _x_test, y_train, _y_test = model_selection.train_test_split(
         x, y, random_state=42)
 
-    scaler = preprocessing.RobustScaler()
-    regressor = neighbors.KNeighborsRegressor()
-
     mlflow.set_experiment("House_Pricemlflow server --host 127.0.0.1 --port 8080")
 
     with mlflow.start_run(run_name=run_name):
+        params = {}
+        if search:
+            best = search_hyperparameters(x_train, y_train, latency_budget_ms, workers)
+            params = best['params']
+            mlflow.log_param("latency_budget_ms", latency_budget_ms)
+            mlflow.log_metric("cv_rmse", best['cv_rmse'])
+            mlflow.log_metric("single_row_ms", best['single_row_ms'])
+            mlflow.log_metric("batch_ms_per_row", best['batch_ms_per_row'])
+
+        model = build_pipeline(params)
+        scaler, regressor = model[0], model[-1]
+
         # Log model parameters
         mlflow.log_param("model_type", "KNeighborsRegressor")
         mlflow.log_param("n_neighbors", regressor.n_neighbors)
         mlflow.log_param("scaler", scaler.__class__.__name__)
+        for name, value in params.items():
+            if name not in ('n_neighbors', 'scaler'):
+                mlflow.log_param(name, value)
 
         # Train model
-        model = pipeline.make_pipeline(scaler, regressor).fit(x_train, y_train)
+        model = model.fit(x_train, y_train)
 
         # Predict and evaluate
         y_pred = model.predict(_x_test)
@@ -97,9 +304,34 @@ def main():
         mlflow.log_artifact(pickle_path.as_posix())
         mlflow.log_artifact(json_path.as_posix())
 
+        # Reference distributions for the drift dashboard: training features, held-out predictions
+        baseline_path = output_dir / "drift_baseline.json"
+        baseline = {name: x_train[name].to_numpy() for name in x_train.columns}
+        baseline['prediction'] = y_pred
+        save_sketches(baseline_path.as_posix(), build_baseline(baseline))
+        mlflow.log_artifact(baseline_path.as_posix())
+
+        # Alternative neighbour search backends for serving (NEIGHBOR_BACKEND)
+        if is_euclidean(regressor):
+            regressors = evaluate_neighbor_backends(model, _x_test, _y_test, output_dir)
+            # Pickle-free, memory-mapped export of the same model (MODEL_ARTIFACT_DIR)
+            artifact_dir = output_dir / "artifact"
+            save_artifact(artifact_dir.as_posix(), regressors, list(x_train.columns))
+            mlflow.log_artifacts(artifact_dir.as_posix(), "artifact")
+        else:
+            print("Skipping neighbour backends: they only support euclidean distance (p=2).")
+
         # Log model with MLflow model registry (optional)
         mlflow.sklearn.log_model(model, "model")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Train and export the house price model.")
+    parser.add_argument("--search", action="store_true",
+                        help="run the parallel hyperparameter search before training")
+    parser.add_argument("--latency-budget-ms", type=float, default=LATENCY_BUDGET_MS,
+                        help="max single-row predict latency of the selected model")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="search worker processes (default: all cores)")
+    args = parser.parse_args()
+    main(search=args.search, latency_budget_ms=args.latency_budget_ms, workers=args.workers)
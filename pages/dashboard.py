@@ -1,29 +1,67 @@
+import os
+import time
+import numpy as np
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 from PIL import Image
+from src.drift import BASELINE_PATH, drift_report, load_sketches, load_windows, merge_windows
+from src.logger import LOG_DIR_ALL
+from src.monitoring import LogTail, box_stats, histogram, sample_rows
+
+MAX_ROWS = 500_000  # Most recent log records kept in memory
+MAX_POINTS = 5_000  # Points drawn in the scatter plot
+PSI_ALERT = 0.2  # Features with a PSI above this are flagged as drifted
 
 logo_bottom = Image.open("images/phData.png")
 
-df = pd.read_csv("data/prediction_logs_all_inputs.csv")
+
+@st.cache_resource
+def get_log_tail():
+    return LogTail(LOG_DIR_ALL, max_rows=MAX_ROWS)
+
+
+@st.cache_resource
+def get_baseline(mtime: float):
+    return load_sketches(BASELINE_PATH)
+
+
+@st.cache_data(ttl=30)
+def get_windows():
+    # The API saves merged sketches, never raw rows, so this is independent of the log size
+    return load_windows()
+
 
 # ----- Streamlit App -----
 st.set_page_config(page_title="Model Monitoring Dashboard", layout="wide")
 st.title("🏡 House Price Prediction Monitoring")
 
+# Only segments written since the previous rerun are read
+log_tail = get_log_tail()
+df = log_tail.refresh()
+
+if df.empty:
+    st.info("No predictions have been logged yet.")
+    st.stop()
+
+st.caption(f"Showing the latest {len(df):,} of {log_tail.total_rows:,} logged predictions.")
+
 # Define tabs
-tab1, tab2, tab3 = st.tabs(["📊 Distribution", "🔸 Scatter Plot", "🔹 Box Plot"])
+tab1, tab2, tab3, tab4 = st.tabs(["📊 Distribution", "🔸 Scatter Plot", "🔹 Box Plot", "📉 Drift"])
 
 # Tab 1: Histogram
 with tab1:
     st.subheader("Distribution of Predicted Prices")
-    fig_hist = px.histogram(
-        df,
-        x="prediction",
-        nbins=20,
+    bins = histogram(df["prediction"], bins=20)
+    fig_hist = px.bar(
+        bins,
+        x="bin_center",
+        y="count",
         title="Distribution of Predicted Prices",
-        labels={"predicted_price": "Predicted Price"}
+        labels={"bin_center": "Predicted Price", "count": "count"}
     )
+    fig_hist.update_traces(width=bins["bin_width"])
     st.plotly_chart(fig_hist, use_container_width=True)
 
 # Feature options
@@ -34,11 +72,11 @@ with tab2:
     st.subheader("Scatter Plot: Feature vs Predicted Price")
     scatter_feature = st.selectbox("Select a feature for the scatter plot:", features, key="scatter")
     fig_scatter = px.scatter(
-        df,
+        sample_rows(df[[scatter_feature, "prediction"]], max_points=MAX_POINTS),
         x=scatter_feature,
         y="prediction",
         title=f"{scatter_feature} vs Predicted Price",
-        labels={scatter_feature: scatter_feature, "predicted_price": "Predicted Price"}
+        labels={scatter_feature: scatter_feature, "prediction": "Predicted Price"}
     )
     st.plotly_chart(fig_scatter, use_container_width=True)
 
@@ -46,14 +84,64 @@ with tab2:
 with tab3:
     st.subheader("Box Plot: Feature vs Predicted Price")
     box_feature = st.selectbox("Select a feature for the box plot:", features, key="box")
-    fig_box = px.box(
-        df,
-        x=box_feature,
-        y="prediction",
+    stats = box_stats(df, box_feature)
+    fig_box = go.Figure(go.Box(
+        x=stats[box_feature],
+        q1=stats["q1"],
+        median=stats["median"],
+        q3=stats["q3"],
+        lowerfence=stats["lowerfence"],
+        upperfence=stats["upperfence"],
+    ))
+    fig_box.update_layout(
         title=f"Predicted Price by {box_feature}",
-        labels={"predicted_price": "Predicted Price"}
+        xaxis_title=box_feature,
+        yaxis_title="Predicted Price"
     )
     st.plotly_chart(fig_box, use_container_width=True)
 
+# Tab 4: Drift against the training baseline
+with tab4:
+    st.subheader("Drift: Live Traffic vs Training Data")
+    windows = get_windows()
+    if not os.path.exists(BASELINE_PATH):
+        st.info(f"No training baseline found at {BASELINE_PATH}. Run create_model.py to build it.")
+    elif not windows:
+        st.info("No prediction statistics have been saved yet.")
+    else:
+        baseline = get_baseline(os.path.getmtime(BASELINE_PATH))
+        hours = st.slider("Hours of traffic to compare", 1, 24, 24)
+        live = merge_windows(windows, since=time.time() - hours * 3600)
+        report = drift_report(baseline, live)
+        if report.empty:
+            st.info("No predictions in the selected period.")
+        else:
+            report["drifted"] = report["psi"] > PSI_ALERT
+            st.dataframe(report, use_container_width=True)
+
+            drift_feature = st.selectbox("Select a feature to compare:", list(report["feature"]), key="drift")
+            q = np.linspace(0.01, 0.99, 99)
+            fig_quantiles = go.Figure()
+            fig_quantiles.add_trace(go.Scatter(x=baseline[drift_feature].quantile(q), y=q, name="training"))
+            fig_quantiles.add_trace(go.Scatter(x=live[drift_feature].quantile(q), y=q, name="live"))
+            fig_quantiles.update_layout(
+                title=f"Cumulative distribution of {drift_feature}",
+                xaxis_title=drift_feature,
+                yaxis_title="Fraction of values below"
+            )
+            st.plotly_chart(fig_quantiles, use_container_width=True)
+
+            medians = pd.DataFrame([
+                {"window": pd.to_datetime(start, unit="s"),
+                 "median": float(sketches[drift_feature].quantile(0.5)),
+                 "count": sketches[drift_feature].n}
+                for start, sketches in sorted(windows.items()) if drift_feature in sketches
+            ])
+            fig_windows = px.line(medians, x="window", y="median", hover_data=["count"],
+                                  title=f"Median {drift_feature} per window", markers=True)
+            fig_windows.add_hline(y=float(baseline[drift_feature].quantile(0.5)), line_dash="dash",
+                                  annotation_text="training median")
+            st.plotly_chart(fig_windows, use_container_width=True)
+
 st.markdown("---")
-st.image(logo_bottom, width=200, caption="Powered by phData")
\ No newline at end of file
+st.image(logo_bottom, width=200, caption="Powered by phData")
@@ -3,11 +3,17 @@ import requests
 from requests.auth import HTTPBasicAuth
 from PIL import Image
 import pandas as pd
-from src.logger import log_prediction
+from src.client import deadline_headers, new_session, score_frame
 
 
 API_URL = "http://localhost:8000/predict"
 API_URL_FULL = "http://localhost:8000/predict_full"
+API_URL_BATCH = "http://localhost:8000/predict_batch"
+API_URL_COMPARABLES = "http://localhost:8000/comparables"
+CHUNK_SIZE = 500  # Rows per /predict_batch request
+CONCURRENCY = 4  # Batch requests in flight at once
+TIMEOUT = 5.0  # Seconds to wait for an interactive request; the API sheds it if it cannot answer in time
+BATCH_TIMEOUT = 60.0  # Seconds to wait for each /predict_batch request
 USERNAME = st.secrets["API_USERNAME"]
 PASSWORD = st.secrets["API_PASSWORD"]
 
@@ -42,6 +48,14 @@ if mode == "Manual Input":
         sqft_above = st.number_input("Sqft Above", min_value=0.0, value=1680.0)
         sqft_basement = st.number_input("Sqft Basement", min_value=0.0, value=1911.0)
 
+    show_comparables = st.checkbox("Show comparable sales")
+    if show_comparables:
+        col3, col4 = st.columns(2)
+        with col3:
+            lat = st.number_input("Latitude", min_value=-90.0, max_value=90.0, value=47.3656, format="%.4f")
+        with col4:
+            long = st.number_input("Longitude", min_value=-180.0, max_value=180.0, value=-122.1153, format="%.4f")
+
     if st.button("Predict"):
         input_data = {
             "zipcode": zipcode,
@@ -58,17 +72,41 @@ if mode == "Manual Input":
             response = requests.post(
                 API_URL,
                 json=input_data,
-                auth=HTTPBasicAuth(USERNAME, PASSWORD)
+                auth=HTTPBasicAuth(USERNAME, PASSWORD),
+                headers=deadline_headers(TIMEOUT),
+                timeout=TIMEOUT
             )
 
             if response.status_code == 200:
                 result = response.json()
-                log_prediction(input_data=result, full=False)
                 st.success(f"💰 Predicted Price: ${result['prediction'][0]:,.2f}")
                 st.caption(f"Request ID: {result['id']}")
+                if show_comparables:
+                    comparables = requests.post(
+                        API_URL_COMPARABLES,
+                        json={"lat": lat, "long": long, "k": 10, "sqft_living": sqft_living, "bedrooms": bedrooms},
+                        auth=HTTPBasicAuth(USERNAME, PASSWORD),
+                        headers=deadline_headers(TIMEOUT),
+                        timeout=TIMEOUT
+                    )
+                    if comparables.status_code == 200:
+                        df_comparables = pd.DataFrame(comparables.json()["comparables"])
+                        st.subheader("🏘️ Comparable sales")
+                        if df_comparables.empty:
+                            st.info("No past sales within the size and bedroom bands.")
+                        else:
+                            st.dataframe(df_comparables[["date", "price", "bedrooms", "bathrooms", "sqft_living",
+                                                         "zipcode", "distance_km"]])
+                            st.map(df_comparables.rename(columns={"long": "lon"})[["lat", "lon"]])
+                    else:
+                        st.warning(f"Comparable sales unavailable: {comparables.status_code}")
+            elif response.status_code == 503 and "Retry-After" in response.headers:
+                st.warning(f"⏳ The service is busy. Try again in {response.headers['Retry-After']} s.")
             else:
                 st.error(f"❌ Error: {response.status_code}")
                 st.json(response.json())
+        except requests.Timeout:
+            st.error(f"Request timed out after {TIMEOUT:.0f} s.")
         except Exception as e:
             st.error(f"Request failed: {e}")
 
@@ -85,25 +123,20 @@ else:
         st.dataframe(df.head())
 
         if st.button("Submit for Predictions"):
-            df_results = pd.DataFrame()
-            for idx, row in df.iterrows():
-                input_data = row.to_dict()
-                try:
-                    response = requests.post(
-                        API_URL_FULL,
-                        json=input_data,
-                        auth=HTTPBasicAuth(USERNAME, PASSWORD)
-                    )
-                    if response.status_code == 200:
-                        result = response.json()
-                        log_prediction(input_data=result, full=True)
-                    else:
-                        prediction = f"Error: {response.status_code}"
-                except Exception as e:
-                    prediction = f"Failed: {e}"
-                predictions = pd.json_normalize(result)
-                predictions = predictions.explode('prediction', ignore_index=True)
-                df_results = pd.concat([df_results,predictions], axis=0).reset_index(drop=True)
+            progress = st.progress(0.0, text="Scoring...")
+            throughput = st.empty()
+
+            def show_progress(done, total, elapsed):
+                progress.progress(done / total, text=f"Scored {done:,} of {total:,} rows")
+                throughput.caption(f"{done / max(elapsed, 1e-9):,.0f} rows/s")
+
+            session = new_session(auth=HTTPBasicAuth(USERNAME, PASSWORD), pool_size=CONCURRENCY)
+            df_results = score_frame(session, API_URL_BATCH, df, chunk_size=CHUNK_SIZE,
+                                     concurrency=CONCURRENCY, timeout=BATCH_TIMEOUT,
+                                     on_progress=show_progress)
+            failed = df_results["error"].notna().sum()
+            if failed:
+                st.warning(f"{failed:,} rows could not be scored; see the `error` column.")
 
             df = pd.concat([df_results, df], axis=1)
             st.success("✅ Predictions complete")
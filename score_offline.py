@@ -0,0 +1,43 @@
+import argparse
+import json
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from src.bulk import score_file
+from src.config import settings
+from src.registry import parse_run
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Score a CSV or Parquet file of listings with the model directly, without the API.")
+    parser.add_argument("--input", default="data/future_unseen_examples.csv")
+    parser.add_argument("--output", default="data/predictions.parquet")
+    parser.add_argument("--run", default="",
+                        help="experiment/run to score with; defaults to the EXPERIMENT_ID/RUN_ID model")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="scoring processes, each loading the model once; 1 scores in this process")
+    parser.add_argument("--chunksize", type=int, default=50_000, help="rows read and scored at a time")
+    parser.add_argument("--include-features", action="store_true",
+                        help="copy the input columns next to the predictions")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    summary = score_file(
+        args.input,
+        args.output,
+        settings.MODEL_PATH,
+        settings.ZIPCODE_PATH,
+        settings.MODEL_FEATURES_PATH,
+        run=parse_run(args.run) if args.run else None,
+        workers=args.workers,
+        chunksize=args.chunksize,
+        include_features=args.include_features,
+    )
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
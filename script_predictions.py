@@ -1,54 +1,66 @@
+import argparse
+import asyncio
+import json
 import os
 import pandas as pd
-import requests
-from requests.auth import HTTPBasicAuth
+import httpx
 from dotenv import load_dotenv
-from src.logger import log_prediction
+from src.client import run_load
 
 
 load_dotenv()
 USERNAME = 'admin'
 PASSWORD = os.getenv("PASSWORD")
 
-def get_prediction(url, input_data):
-    auth = HTTPBasicAuth(USERNAME, PASSWORD)
-    response = requests.post(url, json=input_data, auth=auth)
-    if response.status_code == 200:
-        log_prediction(input_data=response.json(), full=False)
-        print("Prediction: ", response.json())
-    else:
-        print("Error:", response.status_code, response.json())
+def iter_payloads(path, batch_size=0, read_chunksize=10000):
+    """Yield single rows, or lists of `batch_size` rows, streamed from a CSV file."""
+    chunksize = max(batch_size, read_chunksize) if batch_size else read_chunksize
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        if batch_size:
+            for start in range(0, len(chunk), batch_size):
+                yield chunk.iloc[start:start + batch_size].to_dict(orient="records")
+        else:
+            yield from chunk.to_dict(orient="records")
 
-def get_predictions_full_input(url, data):
-    auth = HTTPBasicAuth(USERNAME, PASSWORD)
-    for i in range(len(data)):
-        input_data = data.iloc[i].to_dict()
-        response = requests.post(url, json=input_data, auth=auth)
-        if response.status_code == 200:
-            log_prediction(input_data=response.json(), full=True)
-            print("Prediction: ", response.json())
+def print_response(payload, response):
+    if response.status_code != 200:
+        print("Error:", response.status_code, response.text)
+        return
+    body = response.json()
+    for result in body.get("results", [body]):
+        if "error" in result:
+            print("Error:", result["index"], result["error"])
         else:
-            print("Error:", response.status_code, response.json())
+            print("Prediction:", result["id"], result["prediction"][0])
 
-if __name__ == "__main__":
-    url = "http://127.0.0.1:8000/predict"
-    url_full = "http://127.0.0.1:8000/predict_full"
-    # url = "http://localhost:8000/predict"
-    # url_full = "http://localhost:8000/predict_full"
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV of listings against the prediction API.")
+    parser.add_argument("--input", default="data/future_unseen_examples.csv")
+    parser.add_argument("--url", default="http://127.0.0.1:8000",
+                        help="API base URL; rows go to /predict_full, batches to /predict_batch")
+    parser.add_argument("--batch-size", type=int, default=0,
+                        help="rows per /predict_batch request; 0 sends one row per request")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight")
+    parser.add_argument("--rate", type=float, default=0.0, help="max requests per second; 0 is unlimited")
+    parser.add_argument("--retries", type=int, default=3, help="retries for 5xx responses and timeouts")
+    parser.add_argument("--timeout", type=float, default=10.0, help="per-request timeout in seconds")
+    parser.add_argument("--verbose", action="store_true", help="print every prediction")
+    return parser.parse_args(argv)
 
-    # Single prediction
-    input_data = {
-      "zipcode": 98042,
-      "bedrooms": 4.0,
-      "bathrooms": 1.0,
-      "sqft_living": 1680.0,
-      "sqft_lot": 5043.0,
-      "floors": 1.5,
-      "sqft_above": 1680.0,
-      "sqft_basement": 1911.0
-    }
-    #get_prediction(url,input_data)
+def main(argv=None):
+    args = parse_args(argv)
+    endpoint = "/predict_batch" if args.batch_size else "/predict_full"
+    report = asyncio.run(run_load(
+        args.url.rstrip("/") + endpoint,
+        iter_payloads(args.input, args.batch_size),
+        auth=httpx.BasicAuth(USERNAME, PASSWORD),
+        concurrency=args.concurrency,
+        rate=args.rate,
+        retries=args.retries,
+        timeout=args.timeout,
+        on_response=print_response if args.verbose else None,
+    ))
+    print(json.dumps(report.summary(), indent=2))
 
-    # # Multiple predictions
-    unseen_data = pd.read_csv('data/future_unseen_examples.csv')
-    get_predictions_full_input(url_full, unseen_data)
+if __name__ == "__main__":
+    main()
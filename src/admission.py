@@ -0,0 +1,176 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+from src.config import settings
+from src.metrics import metrics
+
+# Milliseconds the client is willing to wait for the response, counted from arrival
+DEADLINE_HEADER = "X-Request-Deadline"
+
+ADMISSION_REQUESTS = metrics.counter(
+    "admission_requests_total",
+    "Requests per lane by admission result (admitted, queue_full, deadline or expired).", ("lane", "result"))
+ADMISSION_WAIT_SECONDS = metrics.histogram(
+    "admission_queue_wait_seconds", "Time admitted requests waited for a slot.", ("lane",))
+ADMISSION_QUEUED = metrics.gauge("admission_queued_requests", "Requests waiting for a slot.", ("lane",))
+
+
+class Overloaded(Exception):
+    """The request was shed; retry after `retry_after` seconds."""
+
+    def __init__(self, lane: str, reason: str, retry_after: int):
+        super().__init__(f"Server overloaded ({lane} lane): {reason}.")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Lane:
+    """At most `concurrency` requests at once, then up to `queue_size` waiting in FIFO order.
+
+    Service time is tracked as a moving average. A queued request that would not
+    finish by its deadline (estimated wait plus one service time) is rejected at
+    once, and one still waiting when only a service time is left gives up, instead
+    of being scored after the client has stopped waiting.
+    Only used from the event loop, so no locking is needed.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, service_seconds: float = 0.01):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.service_seconds = service_seconds
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def estimated_wait(self, position: int) -> float:
+        """Seconds until the request at queue `position` (0 is next) gets a slot."""
+        return (position + 1) * self.service_seconds / self.concurrency
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.estimated_wait(self.queued)))
+
+    def _reject(self, reason: str):
+        ADMISSION_REQUESTS.inc(lane=self.name, result=reason)
+        raise Overloaded(self.name, reason.replace("_", " "), self.retry_after())
+
+    async def acquire(self, deadline: Optional[float] = None):
+        """Take a slot, waiting at most until `deadline` (a `time.monotonic()` value)."""
+        start = time.monotonic()
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+        else:
+            if self.queued >= self.queue_size:
+                self._reject("queue_full")
+            if deadline is not None and start + self.estimated_wait(self.queued) + self.service_seconds > deadline:
+                self._reject("deadline")
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            ADMISSION_QUEUED.set(self.queued, lane=self.name)
+            try:
+                timeout = None if deadline is None else max(deadline - self.service_seconds - start, 0)
+                await asyncio.wait_for(waiter, timeout)
+            except BaseException as e:
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was handed over just as the wait ended; pass it on
+                    self._hand_over()
+                elif waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                ADMISSION_QUEUED.set(self.queued, lane=self.name)
+                if isinstance(e, asyncio.TimeoutError):
+                    self._reject("expired")
+                raise
+            ADMISSION_QUEUED.set(self.queued, lane=self.name)
+        ADMISSION_REQUESTS.inc(lane=self.name, result="admitted")
+        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - start, lane=self.name)
+
+    def release(self, seconds: float):
+        """Free the slot of a request that held it for `seconds`."""
+        self.service_seconds += 0.1 * (seconds - self.service_seconds)
+        self._hand_over()
+
+    def _hand_over(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def info(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "queued": self.queued,
+            "service_ms": self.service_seconds * 1000,
+        }
+
+
+class AdmissionController:
+    """Admission lanes for the scoring endpoints.
+
+    Interactive requests (single rows and comparables) and batch requests each have
+    their own lane, so a burst of large batches queues behind other batches and never
+    takes the slots interactive requests need. Bounding both lanes also bounds how
+    many requests hold a threadpool thread at once.
+    """
+
+    def __init__(self, lanes: Dict[str, Lane], default_deadline_ms: float = 0.0):
+        self.lanes = lanes
+        self.default_deadline_ms = default_deadline_ms
+
+    @classmethod
+    def from_settings(cls) -> "AdmissionController":
+        return cls({
+            "interactive": Lane("interactive", settings.ADMISSION_INTERACTIVE_CONCURRENCY,
+                                settings.ADMISSION_INTERACTIVE_QUEUE),
+            "batch": Lane("batch", settings.ADMISSION_BATCH_CONCURRENCY, settings.ADMISSION_BATCH_QUEUE),
+        }, settings.ADMISSION_DEFAULT_DEADLINE_MS)
+
+    @staticmethod
+    def lane_for(path: str) -> Optional[str]:
+        """The lane of a request path, or None for endpoints that are never limited."""
+        if path.endswith(("/predict_batch", "/predict_columnar", "/comparables/batch")):
+            return "batch"
+        if path.endswith(("/predict", "/predict_full", "/comparables")):
+            return "interactive"
+        return None
+
+    def deadline(self, header: Optional[str], arrived: float) -> Optional[float]:
+        """The `time.monotonic()` deadline from an X-Request-Deadline value in milliseconds."""
+        if not header:
+            return arrived + self.default_deadline_ms / 1000 if self.default_deadline_ms > 0 else None
+        try:
+            milliseconds = float(header)
+        except ValueError:
+            milliseconds = math.nan
+        if not math.isfinite(milliseconds) or milliseconds <= 0:
+            raise ValueError(f"{DEADLINE_HEADER} must be a positive number of milliseconds.")
+        return arrived + milliseconds / 1000
+
+    @asynccontextmanager
+    async def admit(self, lane_name: str, deadline: Optional[float] = None):
+        lane = self.lanes[lane_name]
+        if lane.concurrency <= 0:
+            yield
+            return
+        await lane.acquire(deadline)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            lane.release(time.monotonic() - start)
+
+    def info(self) -> dict:
+        return {name: lane.info() for name, lane in self.lanes.items()}
+
+
+admission = AdmissionController.from_settings()
@@ -0,0 +1,95 @@
+import json
+import os
+import shutil
+from typing import Dict, List
+import numpy as np
+from src.neighbors import NeighborRegressor, restore_index
+
+ARTIFACT_FORMAT = 1
+MANIFEST = "manifest.json"
+
+
+def save_artifact(directory: str, regressors: Dict[str, NeighborRegressor],
+                  feature_names: List[str] = None, default_backend: str = "brute"):
+    """Export regressors built from one fitted pipeline as `.npy` arrays plus a manifest.
+
+    The scaler parameters, scaled training matrix and targets are stored once; each
+    backend adds its parameters and any index arrays it can persist. The directory
+    is written next to the target and swapped in with a rename, so processes that
+    still map the previous files keep reading the old, unchanged pages.
+    """
+    default = regressors[default_backend]
+    arrays = {"center": default.center, "scale": default.scale, "fit_X": default.fit_X, "y": default.y}
+    indexes = {}
+    for backend, regressor in regressors.items():
+        index_arrays = {f"{backend}.{name}": array for name, array in regressor.index.get_arrays().items()}
+        arrays.update(index_arrays)
+        indexes[backend] = {"params": regressor.index.get_params(), "arrays": sorted(index_arrays)}
+
+    staging = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    specs = {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        np.save(os.path.join(staging, f"{name}.npy"), array, allow_pickle=False)
+        specs[name] = {"file": f"{name}.npy", "shape": list(array.shape), "dtype": str(array.dtype)}
+    manifest = {
+        "format": ARTIFACT_FORMAT,
+        "n_features": int(default.fit_X.shape[1]),
+        "feature_names": feature_names,
+        "n_neighbors": default.n_neighbors,
+        "weights": default.weights,
+        "default_backend": default_backend,
+        "arrays": specs,
+        "indexes": indexes,
+    }
+    with open(os.path.join(staging, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    previous = f"{directory}.old-{os.getpid()}"
+    if os.path.isdir(directory):
+        os.rename(directory, previous)
+    os.rename(staging, directory)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def read_manifest(directory: str) -> dict:
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"Unsupported artifact format {manifest.get('format')!r} in {directory}.")
+    return manifest
+
+
+def load_artifact(directory: str, backend: str = None, mmap: bool = True) -> NeighborRegressor:
+    """Load an exported artifact; with `mmap`, arrays are read-only views of the files.
+
+    Mapped pages live in the OS page cache, so every worker on a host shares one
+    copy of the training matrix and loading does not scale with its size. Backends
+    without saved index arrays (the sklearn trees) are rebuilt over the mapped matrix.
+    """
+    manifest = read_manifest(directory)
+    backend = backend or manifest["default_backend"]
+
+    def load(name: str) -> np.ndarray:
+        spec = manifest["arrays"][name]
+        array = np.load(os.path.join(directory, spec["file"]), mmap_mode="r" if mmap else None,
+                        allow_pickle=False)
+        if list(array.shape) != spec["shape"] or str(array.dtype) != spec["dtype"]:
+            raise ValueError(f"Artifact array {name!r} does not match the manifest.")
+        return array
+
+    fit_X = load("fit_X")
+    index_spec = manifest["indexes"].get(backend, {"params": {}, "arrays": []})
+    index_arrays = {name.split(".", 1)[1]: load(name) for name in index_spec["arrays"]}
+    return NeighborRegressor(
+        center=load("center"),
+        scale=load("scale"),
+        fit_X=fit_X,
+        y=load("y"),
+        n_neighbors=manifest["n_neighbors"],
+        weights=manifest["weights"],
+        index=restore_index(backend, fit_X, index_spec["params"], index_arrays),
+        backend=backend,
+    )
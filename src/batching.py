@@ -0,0 +1,121 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+import numpy as np
+from src.config import settings
+from src.metrics import metrics
+
+BATCH_SIZE = metrics.histogram(
+    "microbatch_size", "Rows scored per micro-batch model call.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+QUEUE_WAIT_SECONDS = metrics.histogram(
+    "microbatch_queue_wait_seconds", "Time a row waits before its micro-batch is scored.")
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row predictions into one vectorized `predict` call.
+
+    Callers await `predict(bundle, row)`. A collector task takes the first queued
+    row, waits up to `max_wait_ms` for more (or until `max_batch_size` rows are
+    queued), then scores each model bundle's rows with a single `predict` call on a
+    dedicated worker thread and resolves every caller's future with its own value.
+    Rows that arrive while a batch is being scored are picked up by the next one,
+    so batches grow with load.
+    """
+
+    def __init__(self, max_batch_size: int = None, max_wait_ms: float = None, workers: int = 1):
+        self.max_batch_size = max_batch_size or settings.MICROBATCH_MAX_SIZE
+        self.max_wait = (settings.MICROBATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="microbatch")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Fail anything still queued instead of leaving callers hanging
+        queued = []
+        while not self._queue.empty():
+            queued.append(self._queue.get_nowait())
+        _fail(queued)
+        self._executor.shutdown(wait=True)
+
+    async def predict(self, bundle, row: np.ndarray) -> np.ndarray:
+        """Score one (1, n_features) row; returns a (1,) array like `model.predict`."""
+        future = asyncio.get_running_loop().create_future()
+        # Copy now: the caller's buffer may be reused before the batch runs
+        self._queue.put_nowait((bundle, np.array(row[0], dtype=np.float64), future, time.perf_counter()))
+        return await future
+
+    async def _collect(self, batch: List[Tuple]):
+        """Fill `batch` in place, so rows already taken off the queue are never lost."""
+        batch.append(await self._queue.get())
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = []
+            try:
+                await self._collect(batch)
+                # A reload can land mid-batch; each bundle's rows are scored by that bundle
+                groups = {}
+                for item in batch:
+                    groups.setdefault(id(item[0]), []).append(item)
+                for items in groups.values():
+                    bundle = items[0][0]
+                    matrix = np.vstack([row for _, row, _, _ in items])
+                    scored_at = time.perf_counter()
+                    for _, _, _, queued_at in items:
+                        QUEUE_WAIT_SECONDS.observe(scored_at - queued_at)
+                    BATCH_SIZE.observe(len(items))
+                    try:
+                        predictions = await loop.run_in_executor(self._executor, bundle.model.predict, matrix)
+                    except Exception as e:
+                        _fail(items, e)
+                        continue
+                    for (_, _, future, _), prediction in zip(items, predictions):
+                        if not future.done():
+                            future.set_result(np.array([prediction]))
+            finally:
+                # Cancelled by `stop` while collecting or scoring: no caller may wait forever
+                _fail(batch)
+
+
+def _fail(items: List[Tuple], error: Exception = None):
+    for _, _, future, _ in items:
+        if not future.done():
+            future.set_exception(error or RuntimeError("Micro-batcher stopped."))
+
+
+micro_batcher = MicroBatcher()
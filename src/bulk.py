@@ -0,0 +1,167 @@
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+import numpy as np
+from src.engine import NativeKNN
+from src.features import USER_FEATURES
+from src.registry import ModelBundle, ModelRegistry, RunKey
+
+# Columns the model needs from every input row
+REQUIRED_COLUMNS = ["zipcode"] + USER_FEATURES
+
+_worker: Dict[str, ModelBundle] = {}
+
+
+def iter_chunks(path: str, chunksize: int) -> Iterator[Dict[str, np.ndarray]]:
+    """Stream a CSV or Parquet file as dicts of column arrays, `chunksize` rows at a time."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield {name: column.to_numpy(zero_copy_only=False)
+                   for name, column in zip(batch.schema.names, batch.columns)}
+    else:
+        import pandas as pd
+
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            yield {name: chunk[name].to_numpy() for name in chunk.columns}
+
+
+def load_bundle(model_path: str, zipcode_path: str, features_path: str, run: Optional[RunKey]) -> ModelBundle:
+    """Load a model the way the API does, including the native engine."""
+    registry = ModelRegistry(model_path, zipcode_path, features_path)
+    return registry.get_or_load(*run) if run else registry.load()
+
+
+def _init_worker(*args):
+    _worker["bundle"] = load_bundle(*args)
+
+
+def score_columns(bundle: ModelBundle, columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Predictions for one chunk (NaN where the zipcode is unknown) and the known mask.
+
+    Features are assembled by `ZipcodeIndex.columnar`, as for `/predict_columnar`.
+    The native engine sends inputs over MAX_NATIVE_ROWS rows to its sklearn fallback,
+    which differs slightly with 'distance' weights, so chunks are scored natively
+    like the single rows of `/predict` and `/predict_full`.
+    """
+    matrix, known = bundle.zipcode_index.columnar(columns)
+    predictions = np.full(len(known), np.nan)
+    if len(matrix):
+        model = bundle.model
+        predict = model.predict_native if isinstance(model, NativeKNN) else model.predict
+        predictions[known] = predict(matrix)
+    return predictions, known
+
+
+def _score_in_worker(columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    return score_columns(_worker["bundle"], columns)
+
+
+def _output_table(chunk: Dict[str, np.ndarray], first_row: int, predictions: np.ndarray,
+                  known: np.ndarray, bundle_key: RunKey, include_features: bool):
+    import pyarrow as pa
+
+    n = len(predictions)
+    errors = [None if ok else f"Zipcode {zipcode} not found." for ok, zipcode in zip(known, chunk["zipcode"])]
+    columns = {
+        "row": pa.array(np.arange(first_row, first_row + n, dtype=np.int64)),
+        "prediction": pa.array(predictions, mask=~known),
+        "error": pa.array(errors, type=pa.string()),
+        "experiment_id": pa.DictionaryArray.from_arrays(np.zeros(n, dtype=np.int32), [bundle_key[0]]),
+        "run_id": pa.DictionaryArray.from_arrays(np.zeros(n, dtype=np.int32), [bundle_key[1]]),
+    }
+    if include_features:
+        columns.update({name: pa.array(values) for name, values in chunk.items() if name not in columns})
+    return pa.table(columns)
+
+
+def score_file(input_path: str, output_path: str, model_path: str, zipcode_path: str, features_path: str,
+               run: Optional[RunKey] = None, workers: int = None, chunksize: int = 50_000,
+               include_features: bool = False) -> dict:
+    """Score a CSV or Parquet file into a Parquet file and return a run summary.
+
+    Chunks are read one at a time and scored on a process pool whose workers each
+    load the model once. At most two chunks per worker are in flight, and results
+    are written in input order as they complete, so memory stays bounded by the
+    chunk size rather than the file size. The run metadata is stored under the
+    "scoring_run" key of the Parquet schema metadata as well as in the
+    `experiment_id`/`run_id` columns.
+    """
+    import pyarrow.parquet as pq
+
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    bundle = load_bundle(model_path, zipcode_path, features_path, run)
+    model_args = (model_path, zipcode_path, features_path, run)
+    metadata = {"scoring_run": json.dumps({
+        "input": input_path,
+        "experiment_id": bundle.experiment_id,
+        "run_id": bundle.run_id,
+        "model_version": bundle.fingerprint,
+        "scored_at": datetime.utcnow().isoformat(),
+    })}
+    rows = scored = 0
+    writer = None
+    staging = f"{output_path}.tmp-{os.getpid()}"
+
+    def write(chunk, first_row, predictions, known):
+        nonlocal writer, rows, scored
+        table = _output_table(chunk, first_row, predictions, known, bundle.key, include_features)
+        if writer is None:
+            writer = pq.ParquetWriter(staging, table.schema.with_metadata(metadata))
+        writer.write_table(table)
+        rows += len(predictions)
+        scored += int(known.sum())
+
+    def chunks():
+        first_row = 0
+        for chunk in iter_chunks(input_path, chunksize):
+            missing = [name for name in REQUIRED_COLUMNS if name not in chunk]
+            if missing:
+                raise ValueError(f"Input is missing columns: {missing}")
+            yield chunk, first_row
+            first_row += len(chunk["zipcode"])
+
+    try:
+        if workers == 1:
+            for chunk, first_row in chunks():
+                write(chunk, first_row, *score_columns(bundle, chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=model_args) as executor:
+                pending = deque()
+                for chunk, first_row in chunks():
+                    features = {name: chunk[name] for name in REQUIRED_COLUMNS}
+                    pending.append((chunk, first_row, executor.submit(_score_in_worker, features)))
+                    while len(pending) >= 2 * workers:
+                        chunk, first_row, future = pending.popleft()
+                        write(chunk, first_row, *future.result())
+                while pending:
+                    chunk, first_row, future = pending.popleft()
+                    write(chunk, first_row, *future.result())
+        if writer is None:
+            write({"zipcode": np.empty(0, dtype=np.int64)}, 0, np.empty(0), np.empty(0, dtype=bool))
+        writer.close()
+        writer = None
+        os.replace(staging, output_path)
+        seconds = time.perf_counter() - start
+        return {
+            **json.loads(metadata["scoring_run"]),
+            "output": output_path,
+            "rows": rows,
+            "scored": scored,
+            "unknown_zipcode": rows - scored,
+            "workers": workers,
+            "seconds": seconds,
+            "rows_per_second": rows / seconds if seconds else None,
+        }
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(staging):
+            os.remove(staging)
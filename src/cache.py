@@ -0,0 +1,205 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+import numpy as np
+from src.config import settings
+from src.metrics import CACHE_REQUESTS
+from src.registry import ModelBundle, registry
+
+
+def row_digest(row: np.ndarray) -> bytes:
+    """Canonical hash of one model input row: float64 values in model column order."""
+    # Adding 0.0 turns -0.0 into 0.0, so equal values always hash alike
+    return hashlib.blake2b((np.asarray(row, dtype=np.float64) + 0.0).tobytes(), digest_size=16).digest()
+
+
+class SharedStore:
+    """Prediction cache shared by the workers on a host, in a SQLite file.
+
+    Each thread keeps its own connection. Writes go through WAL mode so readers in
+    other processes are not blocked, and every `prune_every` writes the expired rows
+    and, beyond `max_entries`, the rows closest to expiry are deleted.
+    """
+
+    def __init__(self, path: str, max_entries: int, prune_every: int = 1000):
+        self.path = path
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS predictions (key BLOB PRIMARY KEY, value REAL, expires REAL)")
+            # Pruning deletes by expiry and keeps the entries closest to it last
+            connection.execute("CREATE INDEX IF NOT EXISTS predictions_expires ON predictions (expires)")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: bytes, now: float) -> Optional[float]:
+        row = self._connection().execute(
+            "SELECT value FROM predictions WHERE key = ? AND expires > ?", (key, now)).fetchone()
+        return None if row is None else row[0]
+
+    def put(self, items, expires: float):
+        connection = self._connection()
+        connection.executemany(
+            "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)",
+            [(key, value, expires) for key, value in items])
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune(time.time())
+
+    def prune(self, now: float):
+        connection = self._connection()
+        connection.execute("DELETE FROM predictions WHERE expires <= ?", (now,))
+        connection.execute(
+            "DELETE FROM predictions WHERE key IN (SELECT key FROM predictions ORDER BY expires DESC "
+            "LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+
+class PredictionCache:
+    """Results of recent predictions, keyed by model bundle and canonical input row.
+
+    Keys hold the bundle's run and version next to the row digest, and a reload
+    drops the replaced bundle's entries, so a new model never serves an old result.
+    Entries expire after `ttl` seconds and the least recently used ones go beyond
+    `max_entries`. With `shared_path`, misses also check a SQLite store shared by
+    every worker. Its keys use the bundle fingerprint (run and artifact file) in
+    place of the per-process version. `lookup` and `store` only touch memory and
+    are safe on the event loop; `lookup_shared` and `store_shared` query SQLite,
+    which may wait on another worker's lock, so call them from a thread.
+    """
+
+    def __init__(self, max_entries: int = None, ttl: float = None, shared_path: str = None):
+        self.max_entries = settings.PREDICTION_CACHE_SIZE if max_entries is None else max_entries
+        self.ttl = settings.PREDICTION_CACHE_TTL if ttl is None else ttl
+        shared_path = settings.PREDICTION_CACHE_PATH if shared_path is None else shared_path
+        self.shared = SharedStore(shared_path, self.max_entries) if shared_path else None
+        self._entries: "OrderedDict[Tuple, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _shared_key(bundle: ModelBundle, digest: bytes) -> bytes:
+        return hashlib.blake2b(bundle.fingerprint.encode() + digest, digest_size=16).digest()
+
+    def lookup(self, bundle: ModelBundle, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray, list]:
+        """Predictions for a (n, n_features) matrix cached in this process.
+
+        Returns the predictions (NaN where missing), a mask of the rows that were
+        found and the row digests to pass to `lookup_shared` and `store`.
+        """
+        now = time.monotonic()
+        digests = [row_digest(row) for row in rows]
+        values = np.full(len(digests), np.nan)
+        with self._lock:
+            for i, digest in enumerate(digests):
+                key = (bundle.key, bundle.version, digest)
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[1] <= now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                values[i] = entry[0]
+        found = ~np.isnan(values)
+        self._count("prediction", found)
+        return values, found, digests
+
+    def lookup_shared(self, bundle: ModelBundle, values: np.ndarray, digests: list) -> np.ndarray:
+        """Fill the missing `values` from the shared store; returns the new found mask."""
+        found = ~np.isnan(values)
+        if self.shared is None or not bundle.fingerprint or found.all():
+            return found
+        missing = np.flatnonzero(~found)
+        now, wall = time.monotonic(), time.time()
+        for i in missing:
+            try:
+                value = self.shared.get(self._shared_key(bundle, digests[i]), wall)
+            except sqlite3.Error:
+                break
+            if value is not None:
+                values[i] = value
+                self._remember(bundle, digests[i], value, now)
+        found = ~np.isnan(values)
+        self._count("prediction_shared", found[missing])
+        return found
+
+    @staticmethod
+    def _count(cache: str, found: np.ndarray):
+        hits = int(found.sum())
+        CACHE_REQUESTS.inc(hits, cache=cache, result="hit")
+        CACHE_REQUESTS.inc(len(found) - hits, cache=cache, result="miss")
+
+    def _remember(self, bundle: ModelBundle, digest: bytes, value: float, now: float):
+        with self._lock:
+            self._entries[(bundle.key, bundle.version, digest)] = (value, now + self.ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def store(self, bundle: ModelBundle, digests, predictions):
+        now = time.monotonic()
+        for digest, value in zip(digests, predictions):
+            self._remember(bundle, digest, float(value), now)
+
+    def store_shared(self, bundle: ModelBundle, digests, predictions):
+        if self.shared is None or not bundle.fingerprint:
+            return
+        try:
+            self.shared.put([(self._shared_key(bundle, digest), float(value))
+                             for digest, value in zip(digests, predictions)], time.time() + self.ttl)
+        except sqlite3.Error as e:
+            # The shared store is an optimization; keep serving without it
+            print(f"Failed to write the shared prediction cache: {e}")
+
+    def invalidate(self, bundle: ModelBundle):
+        """Drop every entry of `bundle`'s run computed by another version of it."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == bundle.key and key[1] != bundle.version]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def predict(self, bundle: ModelBundle, rows: np.ndarray) -> np.ndarray:
+        """`bundle.model.predict(rows)`, with only the uncached rows sent to the model.
+
+        Uses the shared store too, so call it from a thread, not the event loop.
+        """
+        if not self.enabled or not len(rows):
+            return bundle.model.predict(rows)
+        values, found, digests = self.lookup(bundle, rows)
+        if not found.all():
+            found = self.lookup_shared(bundle, values, digests)
+        if found.all():
+            return values
+        missing = np.flatnonzero(~found)
+        scored = bundle.model.predict(rows[missing])
+        values[missing] = scored
+        missed = [digests[i] for i in missing]
+        self.store(bundle, missed, scored)
+        self.store_shared(bundle, missed, scored)
+        return values
+
+
+prediction_cache = PredictionCache()
+registry.listeners.append(prediction_cache.invalidate)
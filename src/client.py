@@ -0,0 +1,207 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Optional, Union
+import httpx
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+RESULT_COLUMNS = ["id", "timestamp", "prediction", "experiment_id", "run_id", "error"]
+# Tells the server how long we wait, so it sheds a request it cannot finish in time
+DEADLINE_HEADER = "X-Request-Deadline"
+
+
+def deadline_headers(timeout: float) -> dict:
+    return {DEADLINE_HEADER: str(int(timeout * 1000))}
+
+
+def new_session(auth=None, pool_size: int = 8) -> requests.Session:
+    """Session whose keep-alive connection pool is sized for `pool_size` concurrent requests."""
+    session = requests.Session()
+    session.auth = auth
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _score_chunk(session: requests.Session, url: str, chunk: pd.DataFrame, timeout: float) -> list:
+    # The caller already has the inputs, so skip echoing them back
+    response = session.post(url, json=chunk.to_dict(orient="records"), params={"features": "false"},
+                            headers=deadline_headers(timeout), timeout=timeout)
+    if response.status_code != 200:
+        return [{"error": f"Error: {response.status_code}"}] * len(chunk)
+    return response.json()["results"]
+
+
+def score_frame(session: requests.Session, url: str, df: pd.DataFrame, chunk_size: int = 500,
+                concurrency: int = 4, timeout: float = 30.0,
+                on_progress: Optional[Callable[[int, int, float], None]] = None) -> pd.DataFrame:
+    """Score `df` through the batch endpoint in concurrent chunks.
+
+    Returns a frame aligned to `df.index` with one row of RESULT_COLUMNS per input
+    row; rows that failed carry a message in `error` and no prediction.
+    `on_progress(rows_done, rows_total, elapsed_seconds)` is called from the calling
+    thread after each chunk.
+    """
+    results = {
+        "id": np.full(len(df), None, dtype=object),
+        "timestamp": np.full(len(df), None, dtype=object),
+        "prediction": np.full(len(df), np.nan),
+        "experiment_id": np.full(len(df), None, dtype=object),
+        "run_id": np.full(len(df), None, dtype=object),
+        "error": np.full(len(df), None, dtype=object),
+    }
+    starts = range(0, len(df), chunk_size)
+    start_time = time.perf_counter()
+    done = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(_score_chunk, session, url, df.iloc[start:start + chunk_size], timeout): start
+            for start in starts
+        }
+        for future in as_completed(futures):
+            start = futures[future]
+            size = min(chunk_size, len(df) - start)
+            try:
+                rows = future.result()
+            except Exception as e:
+                rows = [{"error": f"Failed: {e}"}] * size
+            for offset, row in enumerate(rows):
+                position = start + row.get("index", offset)
+                if "error" in row:
+                    error = row["error"]
+                    results["error"][position] = error["detail"] if isinstance(error, dict) else error
+                    continue
+                results["id"][position] = row["id"]
+                results["timestamp"][position] = row["timestamp"]
+                results["prediction"][position] = row["prediction"][0]
+                results["experiment_id"][position] = row["model"]["experiment_id"]
+                results["run_id"][position] = row["model"]["run_id"]
+            done += size
+            if on_progress is not None:
+                on_progress(done, len(df), time.perf_counter() - start_time)
+    return pd.DataFrame(results, index=df.index, columns=RESULT_COLUMNS)
+
+
+@dataclass
+class LoadReport:
+    requests: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    retried: int = 0
+    rows: int = 0
+    elapsed: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+
+    def summary(self) -> dict:
+        latencies_ms = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+        elapsed = max(self.elapsed, 1e-9)
+        return {
+            "requests": self.requests,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "rows": self.rows,
+            "elapsed_s": round(self.elapsed, 3),
+            "requests_per_s": round(self.requests / elapsed, 1),
+            "rows_per_s": round(self.rows / elapsed, 1),
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "max_ms": round(float(latencies_ms.max()), 2),
+        }
+
+
+class RateLimiter:
+    """Spaces request starts at `rate` per second across all workers; 0 disables it."""
+
+    def __init__(self, rate: float = 0.0):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        start = max(now, self._next)
+        self._next = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+def _retry_after(response: httpx.Response) -> float:
+    """Seconds from a Retry-After header; HTTP dates and missing headers give 0."""
+    try:
+        return float(response.headers.get("Retry-After", 0))
+    except ValueError:
+        return 0.0
+
+
+async def post_with_retries(client: httpx.AsyncClient, url: str, payload, retries: int = 3,
+                            backoff: float = 0.1, report: LoadReport = None) -> httpx.Response:
+    """POST `payload`, retrying timeouts, connection errors and 5xx with jittered backoff.
+
+    A shed request (503 with Retry-After) waits at least as long as the server asks.
+    """
+    for attempt in range(retries + 1):
+        retry_after = 0.0
+        try:
+            response = await client.post(url, json=payload)
+            if response.status_code < 500 or attempt == retries:
+                return response
+            retry_after = _retry_after(response)
+        except (httpx.TimeoutException, httpx.TransportError):
+            if attempt == retries:
+                raise
+        if report is not None:
+            report.retried += 1
+        # Full jitter keeps retrying clients from hitting the server in lockstep
+        await asyncio.sleep(max(retry_after, random.uniform(0, backoff * 2 ** attempt)))
+
+
+async def run_load(url: str, payloads: Iterable[Union[dict, list]], auth=None, concurrency: int = 16,
+                   rate: float = 0.0, retries: int = 3, timeout: float = 10.0,
+                   on_response: Optional[Callable[[Union[dict, list], httpx.Response], None]] = None
+                   ) -> LoadReport:
+    """Send every payload with at most `concurrency` requests in flight.
+
+    A payload is one row (dict) or a batch of rows (list). Payloads are pulled
+    lazily, so large inputs are never fully materialized. Returns throughput and
+    latency numbers for the whole run.
+    """
+    report = LoadReport()
+    limiter = RateLimiter(rate)
+    payloads = iter(payloads)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(auth=auth, timeout=timeout, limits=limits,
+                                 headers=deadline_headers(timeout)) as client:
+        async def worker():
+            for payload in payloads:
+                await limiter.wait()
+                start = time.perf_counter()
+                try:
+                    response = await post_with_retries(client, url, payload, retries, report=report)
+                except httpx.HTTPError as e:
+                    response = None
+                    print(f"Request failed: {e!r}")
+                report.latencies.append(time.perf_counter() - start)
+                report.requests += 1
+                report.rows += len(payload) if isinstance(payload, list) else 1
+                if response is not None and response.status_code == 200:
+                    report.succeeded += 1
+                else:
+                    report.failed += 1
+                if on_response is not None and response is not None:
+                    on_response(payload, response)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        report.elapsed = time.perf_counter() - start
+    return report
@@ -0,0 +1,137 @@
+import csv
+import threading
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from src.config import settings
+
+EARTH_RADIUS_KM = 6371.0088
+# Sale columns kept in memory and returned with each comparable
+NUMERIC_COLUMNS = ("price", "bedrooms", "bathrooms", "sqft_living", "sqft_lot", "floors", "grade",
+                   "yr_built", "lat", "long")
+# Candidates fetched per requested comparable before the band filters are applied
+OVERSAMPLE = 8
+
+
+def _sale_date(value: str) -> str:
+    """"20141013T000000" -> "2014-10-13"."""
+    return f"{value[:4]}-{value[4:6]}-{value[6:8]}"
+
+
+def read_sales(path: str) -> Dict[str, np.ndarray]:
+    """Columns of `kc_house_data.csv` needed to describe a comparable sale."""
+    with open(path, newline="") as f:
+        records = list(csv.DictReader(f))
+    sales = {name: np.array([float(record[name]) for record in records]) for name in NUMERIC_COLUMNS}
+    sales["id"] = np.array([record["id"] for record in records])
+    sales["date"] = np.array([_sale_date(record["date"]) for record in records])
+    sales["zipcode"] = np.array([int(record["zipcode"]) for record in records])
+    return sales
+
+
+class ComparableSales:
+    """Past sales in a haversine BallTree, for looking up the nearest ones to a house.
+
+    The tree is built once over (lat, long) in radians. With size or bedroom bands,
+    a query asks it for `OVERSAMPLE` times more neighbours than requested and drops
+    the ones outside the bands. When too few are left, it falls back to computing
+    the distance to every sale within the bands, which takes about a millisecond.
+    """
+
+    def __init__(self, sales: Dict[str, np.ndarray]):
+        # Imported here: sklearn is only needed once the index is built
+        from sklearn.neighbors import BallTree
+
+        self.sales = sales
+        self.tree = BallTree(np.radians(np.column_stack([sales["lat"], sales["long"]])), metric="haversine")
+
+    def __len__(self) -> int:
+        return len(self.sales["price"])
+
+    def _candidates(self, points: np.ndarray, k: int):
+        distances, indices = self.tree.query(np.radians(points), k=min(k, len(self)))
+        return distances * EARTH_RADIUS_KM, indices
+
+    def _keep(self, query, indices: np.ndarray = None) -> np.ndarray:
+        """Mask of the sales at `indices` (all of them by default) within the query's bands."""
+        sqft, bedrooms = self.sales["sqft_living"], self.sales["bedrooms"]
+        if indices is not None:
+            sqft, bedrooms = sqft[indices], bedrooms[indices]
+        keep = np.ones(len(sqft), dtype=bool)
+        if query.sqft_living is not None:
+            keep &= np.abs(sqft - query.sqft_living) <= query.size_band * query.sqft_living
+        if query.bedrooms is not None:
+            keep &= np.abs(bedrooms - query.bedrooms) <= query.bedrooms_band
+        return keep
+
+    def _scan(self, query, keep: np.ndarray):
+        """Haversine distances from the query to every sale in `keep`, nearest first."""
+        indices = np.flatnonzero(keep)
+        lat, long = np.radians(query.lat), np.radians(query.long)
+        sale_lat, sale_long = np.radians(self.sales["lat"][indices]), np.radians(self.sales["long"][indices])
+        a = (np.sin((sale_lat - lat) / 2) ** 2
+             + np.cos(lat) * np.cos(sale_lat) * np.sin((sale_long - long) / 2) ** 2)
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+        order = np.argsort(distances, kind="stable")
+        return distances[order], indices[order]
+
+    def _describe(self, index: int, distance: float) -> dict:
+        sales = self.sales
+        sale = {"id": str(sales["id"][index]), "date": str(sales["date"][index]),
+                "zipcode": int(sales["zipcode"][index])}
+        sale.update({name: float(sales[name][index]) for name in NUMERIC_COLUMNS})
+        sale["distance_km"] = round(float(distance), 4)
+        return sale
+
+    def _select(self, query, distances: np.ndarray, indices: np.ndarray) -> List[dict]:
+        keep = self._keep(query, indices)
+        if keep.sum() < query.k and len(indices) < len(self):
+            # Too selective for the candidates: scan every sale within the bands instead
+            distances, indices = self._scan(query, self._keep(query))
+            keep = np.ones(len(indices), dtype=bool)
+        if query.max_distance_km is not None:
+            keep &= distances <= query.max_distance_km
+        selected = np.flatnonzero(keep)[:query.k]
+        return [self._describe(indices[i], distances[i]) for i in selected]
+
+    def _fetch_size(self, query) -> int:
+        filtered = query.sqft_living is not None or query.bedrooms is not None
+        return query.k * OVERSAMPLE if filtered else query.k
+
+    def query(self, query) -> List[dict]:
+        """The `query.k` nearest sales to (lat, long) within its bands, nearest first."""
+        return self.query_many([query])[0]
+
+    def query_many(self, queries: Sequence) -> List[List[dict]]:
+        """`query` for each item, with one tree query for the whole batch."""
+        if not queries:
+            return []
+        fetch = max(self._fetch_size(query) for query in queries)
+        distances, indices = self._candidates(np.array([[query.lat, query.long] for query in queries]), fetch)
+        return [self._select(query, distances[i], indices[i]) for i, query in enumerate(queries)]
+
+
+class ComparablesIndex:
+    """Holds the index built from `path`; `current()` raises until `load()` has run."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._index: Optional[ComparableSales] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def load(self) -> ComparableSales:
+        with self._lock:
+            if self._index is None:
+                self._index = ComparableSales(read_sales(self.path))
+            return self._index
+
+    def current(self) -> ComparableSales:
+        if self._index is None:
+            raise RuntimeError("Comparable sales are not loaded yet.")
+        return self._index
+
+
+comparables = ComparablesIndex(settings.COMPARABLES_PATH)
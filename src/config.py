@@ -9,6 +9,66 @@ class Settings(BaseSettings):
     PASSWORD: str
     EXPERIMENT_ID: str
     RUN_ID: str
+    MODEL_PATH: str = "model/model.pkl"
+    MODEL_FEATURES_PATH: str = "model/model_features.json"
+    ZIPCODE_PATH: str = "data/zipcode_demographics.csv"
+    # Load and warm up models after the server starts listening; /ready reports when they are done
+    LOAD_IN_BACKGROUND: bool = False
+    # Seconds between checks of MODEL_PATH for a newer file; 0 disables the watcher
+    MODEL_WATCH_INTERVAL: float = 0.0
+    MAX_BATCH_SIZE: int = 1000
+    # Requests scored at once and requests queued behind them, per lane; 0 concurrency disables the lane's limit
+    ADMISSION_INTERACTIVE_CONCURRENCY: int = 16
+    ADMISSION_INTERACTIVE_QUEUE: int = 64
+    ADMISSION_BATCH_CONCURRENCY: int = 2
+    ADMISSION_BATCH_QUEUE: int = 8
+    # Deadline in milliseconds for requests without an X-Request-Deadline header; 0 means none
+    ADMISSION_DEFAULT_DEADLINE_MS: float = 0.0
+    # Other runs are loaded on demand from the MLflow file store, up to this much memory
+    MLRUNS_DIR: str = "mlruns"
+    MODEL_CACHE_MB: float = 2048.0
+    # Recent predictions per model and input row; 0 entries disables the cache
+    PREDICTION_CACHE_SIZE: int = 100000
+    PREDICTION_CACHE_TTL: float = 300.0
+    # SQLite file shared by all workers on the host as a second cache level, e.g. data/prediction_cache.db
+    PREDICTION_CACHE_PATH: str = ""
+    # Weighted traffic split "experiment/run:weight,..."; the rest goes to the active model
+    CANARY_RUNS: str = ""
+    # Score this fraction of requests with another run, off the request path
+    SHADOW_RUN: str = ""
+    SHADOW_FRACTION: float = 0.0
+    SHADOW_QUEUE_SIZE: int = 1000
+    # Past sales indexed for /comparables; empty disables the endpoint
+    COMPARABLES_PATH: str = "data/kc_house_data.csv"
+    COMPARABLES_MAX_K: int = 100
+    # Serve neighbors_<backend>.pkl (brute, kd_tree, ball_tree, rp_forest) instead of model.pkl
+    NEIGHBOR_BACKEND: str = ""
+    # Serve the memory-mapped export in this directory (model/artifact) instead of a pickle
+    MODEL_ARTIFACT_DIR: str = ""
+    # Score exact scaler + KNN models with the NumPy engine instead of sklearn
+    NATIVE_ENGINE: bool = True
+    # Server-side prediction log: queue bound, flush triggers
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_QUEUE_POLICY: str = "drop"
+    LOG_BATCH_SIZE: int = 1000
+    LOG_FLUSH_INTERVAL: float = 1.0
+    # Each worker merges its segments this often; files older than the retention are deleted,
+    # then the oldest ones while a directory is above LOG_MAX_MB (0 means no size cap)
+    LOG_COMPACT_INTERVAL: float = 3600.0
+    LOG_RETENTION_DAYS: float = 90.0
+    LOG_MAX_MB: float = 0.0
+    # Windowed quantile sketches of logged inputs and predictions, for the drift dashboard
+    STATS_ENABLED: bool = True
+    STATS_WINDOW_SECONDS: int = 900
+    STATS_MAX_WINDOWS: int = 96
+    STATS_SKETCH_K: int = 200
+    STATS_SAVE_INTERVAL: float = 30.0
+    # Coalesce concurrent single-row predictions into one model call
+    MICROBATCH_ENABLED: bool = False
+    MICROBATCH_MAX_SIZE: int = 64
+    MICROBATCH_MAX_WAIT_MS: float = 2.0
+    # Add a Server-Timing header with per-stage durations to every response
+    SERVER_TIMING: bool = False
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import shutil
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+from src.features import USER_FEATURES, ZipcodeIndex
+
+STORE_FORMAT = 1
+FEATURE_STORE_DIR = "data/feature_store"
+# Feature values in the training data are counts, areas and small fractions, all exact in float32
+FEATURE_DTYPE = np.float32
+
+
+def source_key(paths: List[str], columns: List[str], target: str) -> str:
+    """Hash of the source file contents and the selection; names the cached store."""
+    digest = hashlib.sha256(json.dumps(
+        {"format": STORE_FORMAT, "columns": columns, "target": target}).encode())
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def build_features(sales_path: str, demographics_path: str, sales_columns: List[str],
+                   target: str = "price", chunksize: int = 100_000) -> Tuple[np.ndarray, np.ndarray, List[str], int]:
+    """Stream the sales CSV in chunks and join each chunk to the zipcode demographics.
+
+    Returns the feature matrix, the target, the feature names and the number of
+    sales dropped because their zipcode has no demographics.
+    """
+    if [name for name in sales_columns if name not in (target, "zipcode")] != USER_FEATURES:
+        raise ValueError(f"Sales features must be {USER_FEATURES}.")
+    index = ZipcodeIndex(pd.read_csv(demographics_path).set_index("zipcode"))
+    dtypes = {name: np.int32 if name == "zipcode" else np.float64 for name in sales_columns}
+    features, targets, dropped = [], [], 0
+    for chunk in pd.read_csv(sales_path, usecols=sales_columns, dtype=dtypes, chunksize=chunksize):
+        matrix, known = index.columnar({name: chunk[name].to_numpy() for name in chunk.columns})
+        features.append(matrix.astype(FEATURE_DTYPE))
+        targets.append(chunk[target].to_numpy()[known])
+        dropped += int((~known).sum())
+    if not features:
+        return np.empty((0, index.n_features), dtype=FEATURE_DTYPE), np.empty(0), index.feature_names, 0
+    return np.concatenate(features), np.concatenate(targets), index.feature_names, dropped
+
+
+def load_features(sales_path: str, demographics_path: str, sales_columns: List[str],
+                  target: str = "price", cache_dir: str = FEATURE_STORE_DIR,
+                  chunksize: int = 100_000) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """Training features and target, from the feature store when the sources are unchanged.
+
+    The first run for a given set of source files builds the store with
+    `build_features` and writes it as `.npy` files under `cache_dir/<source hash>/`.
+    Later runs memory-map those files instead of parsing any CSV.
+    """
+    key = source_key([sales_path, demographics_path], sales_columns, target)
+    store = os.path.join(cache_dir, key)
+    if not os.path.isdir(store):
+        features, y, columns, dropped = build_features(
+            sales_path, demographics_path, sales_columns, target, chunksize)
+        if dropped:
+            print(f"Dropped {dropped} sales with unknown zipcodes.")
+        staging = f"{store}.tmp-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        np.save(os.path.join(staging, "features.npy"), features)
+        np.save(os.path.join(staging, "target.npy"), y)
+        with open(os.path.join(staging, "manifest.json"), "w") as f:
+            json.dump({"format": STORE_FORMAT, "columns": columns, "rows": len(y), "dropped": dropped,
+                       "sources": [sales_path, demographics_path]}, f, indent=2)
+        try:
+            os.rename(staging, store)
+        except OSError:
+            # Another run wrote the same store first
+            shutil.rmtree(staging, ignore_errors=True)
+
+    with open(os.path.join(store, "manifest.json")) as f:
+        columns = json.load(f)["columns"]
+    features = np.load(os.path.join(store, "features.npy"), mmap_mode="r")
+    y = np.load(os.path.join(store, "target.npy"), mmap_mode="r")
+    return features, y, columns
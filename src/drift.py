@@ -0,0 +1,181 @@
+import json
+import os
+import socket
+import threading
+import time
+from typing import Dict, Iterable, List, Mapping
+import numpy as np
+from src.sketches import KLLSketch
+
+STATS_DIR = "data/prediction_stats"
+BASELINE_PATH = "model/drift_baseline.json"
+# Record fields that are identifiers rather than distributions worth tracking
+NON_FEATURES = {"id", "timestamp", "experiment_id", "run_id", "zipcode"}
+
+Sketches = Dict[str, KLLSketch]
+
+
+class StreamingStats:
+    """Per-field quantile sketches of logged predictions, bucketed into time windows.
+
+    Each window holds one KLLSketch per numeric field, and only the latest
+    `max_windows` windows are kept, so memory is fixed however much traffic arrives.
+    Every worker process saves its own windows to `stats_dir`; readers merge the
+    files with `load_windows`, since sketches from different workers merge exactly
+    like sketches from one worker.
+    """
+
+    def __init__(self, stats_dir: str = STATS_DIR, window_seconds: int = 900,
+                 max_windows: int = 96, k: int = 200, save_interval: float = 30.0):
+        self.stats_dir = stats_dir
+        self.window_seconds = window_seconds
+        self.max_windows = max_windows
+        self.k = k
+        self.save_interval = save_interval
+        self.windows: Dict[int, Sketches] = {}
+        self._lock = threading.Lock()
+        self._last_save = time.monotonic()
+        self._dirty = False
+
+    def update(self, records: Iterable[dict], now: float = None):
+        start = window_start(time.time() if now is None else now, self.window_seconds)
+        with self._lock:
+            sketches = self.windows.setdefault(start, {})
+            for record in records:
+                for name, value in record.items():
+                    if name in NON_FEATURES or not isinstance(value, (int, float)) or isinstance(value, bool):
+                        continue
+                    sketch = sketches.get(name)
+                    if sketch is None:
+                        sketch = sketches[name] = KLLSketch(self.k)
+                    sketch.update(value)
+            oldest = start - (self.max_windows - 1) * self.window_seconds
+            for expired in [window for window in self.windows if window < oldest]:
+                del self.windows[expired]
+            self._dirty = True
+
+    def path(self) -> str:
+        # Resolved at save time: uvicorn workers are separate processes
+        return os.path.join(self.stats_dir, f"stats-{socket.gethostname()}-{os.getpid()}.json")
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            data = {
+                "window_seconds": self.window_seconds,
+                "windows": {
+                    str(start): {name: sketch.to_dict() for name, sketch in sketches.items()}
+                    for start, sketches in self.windows.items()
+                },
+            }
+        path = self.path()
+        self._last_save = time.monotonic()
+        try:
+            os.makedirs(self.stats_dir, exist_ok=True)
+            with open(path + ".tmp", "w") as f:
+                json.dump(data, f)
+            os.replace(path + ".tmp", path)
+        except Exception:
+            self._dirty = True
+            raise
+
+    def maybe_save(self):
+        if time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+
+def window_start(timestamp: float, window_seconds: int) -> int:
+    return int(timestamp // window_seconds * window_seconds)
+
+
+def load_windows(stats_dir: str = STATS_DIR) -> Dict[int, Sketches]:
+    """Merge the windows saved by every worker, keyed by window start (epoch seconds)."""
+    windows: Dict[int, Sketches] = {}
+    if not os.path.isdir(stats_dir):
+        return windows
+    for name in sorted(os.listdir(stats_dir)):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(stats_dir, name)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for start, sketches in data["windows"].items():
+            merged = windows.setdefault(int(start), {})
+            for field, sketch in sketches.items():
+                sketch = KLLSketch.from_dict(sketch)
+                merged[field] = merged[field].merge(sketch) if field in merged else sketch
+    return windows
+
+
+def merge_windows(windows: Dict[int, Sketches], since: float = None) -> Sketches:
+    merged: Sketches = {}
+    for start in sorted(windows):
+        if since is not None and start < since:
+            continue
+        for field, sketch in windows[start].items():
+            if field not in merged:
+                merged[field] = KLLSketch(sketch.k)
+            merged[field].merge(sketch)
+    return merged
+
+
+def build_baseline(columns: Mapping[str, np.ndarray], k: int = 200) -> Sketches:
+    """Reference sketches, one per column, for `drift_report` to compare live traffic against."""
+    sketches = {}
+    for name, values in columns.items():
+        sketches[name] = KLLSketch(k, seed=0)
+        sketches[name].update_many(values)
+    return sketches
+
+
+def save_sketches(path: str, sketches: Sketches):
+    with open(path, "w") as f:
+        json.dump({name: sketch.to_dict() for name, sketch in sketches.items()}, f)
+
+
+def load_sketches(path: str = BASELINE_PATH) -> Sketches:
+    with open(path) as f:
+        return {name: KLLSketch.from_dict(data) for name, data in json.load(f).items()}
+
+
+def psi(baseline: KLLSketch, live: KLLSketch, bins: int = 10) -> float:
+    """Population stability index of `live` over the baseline's quantile bins."""
+    edges = np.unique(baseline.quantile(np.linspace(0, 1, bins + 1)[1:-1]))
+    expected = np.diff(np.concatenate([[0.0], baseline.cdf(edges), [1.0]]))
+    actual = np.diff(np.concatenate([[0.0], live.cdf(edges), [1.0]]))
+    expected = np.clip(expected, 1e-4, None)
+    actual = np.clip(actual, 1e-4, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks_statistic(baseline: KLLSketch, live: KLLSketch) -> float:
+    """Largest gap between the two estimated CDFs."""
+    points = np.concatenate([baseline.quantile(np.linspace(0, 1, 101)), live.quantile(np.linspace(0, 1, 101))])
+    return float(np.max(np.abs(baseline.cdf(points) - live.cdf(points))))
+
+
+def drift_report(baseline: Sketches, live: Sketches) -> "pd.DataFrame":
+    """One row per field present in both: counts, medians, PSI and KS distance."""
+    import pandas as pd
+
+    rows: List[dict] = []
+    for field in sorted(set(baseline) & set(live)):
+        reference, current = baseline[field], live[field]
+        if not current.n or not reference.n:
+            continue
+        rows.append({
+            "feature": field,
+            "count": current.n,
+            "baseline_median": float(reference.quantile(0.5)),
+            "median": float(current.quantile(0.5)),
+            "baseline_mean": reference.mean,
+            "mean": current.mean,
+            "psi": psi(reference, current),
+            "ks": ks_statistic(reference, current),
+        })
+    return pd.DataFrame(rows, columns=["feature", "count", "baseline_median", "median",
+                                       "baseline_mean", "mean", "psi", "ks"])
@@ -0,0 +1,113 @@
+import threading
+import numpy as np
+from src.neighbors import NeighborRegressor, _unpack_pipeline, neighbor_average, scaler_params
+
+BLOCK_ROWS = 8  # Query rows scored per distance block; bounds the per-thread buffer
+TIE_CANDIDATES = 8  # Extra neighbours re-ranked exactly to break distance ties
+SAMPLE_STRIDE = 16  # Every n-th training row bounds the candidate threshold
+# Larger inputs go to the fallback model: sklearn's chunked GEMM + heap search wins there
+MAX_NATIVE_ROWS = 8
+
+
+class NativeKNN:
+    """Exact scaler + KNN regressor in plain NumPy, without sklearn's per-call overhead.
+
+    Training rows are ranked by `|f|^2 - 2 f.x`, which orders them like the squared
+    euclidean distance to x: the `|x|^2` term is the same for every row, and the
+    norms `|f|^2` are computed once. The nearest rows are picked with
+    `argpartition`, and their distances are recomputed directly so that 'distance'
+    weights do not pick up rounding error from the expansion. Distance blocks
+    are written into per-thread buffers that are reused across calls.
+
+    Predictions match sklearn exactly for 'uniform' weights and to a relative 1e-3 for
+    'distance' weights; the difference is sklearn's rounding near exact matches.
+    Inputs over MAX_NATIVE_ROWS rows are passed to `fallback`.
+    """
+
+    def __init__(self, center: np.ndarray, scale: np.ndarray, fit_X: np.ndarray, y: np.ndarray,
+                 n_neighbors: int, weights: str, fallback=None):
+        self.center = np.asarray(center, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.fit_X = np.ascontiguousarray(fit_X, dtype=np.float64)
+        self.norms = np.einsum("ij,ij->i", self.fit_X, self.fit_X)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.fallback = fallback
+        self.n_features = self.fit_X.shape[1]
+        n_candidates = min(n_neighbors + TIE_CANDIDATES, len(self.fit_X))
+        self._sample_stride = max(1, min(SAMPLE_STRIDE, len(self.fit_X) // n_candidates))
+        self._local = threading.local()
+
+    @classmethod
+    def from_pipeline(cls, model) -> "NativeKNN":
+        scaler, regressor = _unpack_pipeline(model)
+        center, scale = scaler_params(scaler, regressor.n_features_in_)
+        return cls(center, scale, regressor._fit_X, regressor._y, regressor.n_neighbors,
+                   regressor.weights, fallback=model)
+
+    @classmethod
+    def from_regressor(cls, regressor: NeighborRegressor) -> "NativeKNN":
+        return cls(regressor.center, regressor.scale, regressor.fit_X, regressor.y,
+                   regressor.n_neighbors, regressor.weights, fallback=regressor)
+
+    def _buffer(self) -> np.ndarray:
+        buffer = getattr(self._local, "scores", None)
+        if buffer is None:
+            buffer = self._local.scores = np.empty((BLOCK_ROWS, len(self.fit_X)))
+        return buffer
+
+    def kneighbors(self, X: np.ndarray):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input of shape (n, {self.n_features}), got {X.shape}.")
+        if not np.isfinite(X).all():
+            raise ValueError("Input contains NaN or infinity.")
+        scaled = (X - self.center) / self.scale
+        k = self.n_neighbors
+        # A few extra candidates so exact ties at the k-th place resolve like sklearn (lowest index)
+        n_candidates = min(k + TIE_CANDIDATES, len(self.fit_X))
+        buffer = self._buffer()
+        candidates = np.empty((len(X), n_candidates), dtype=np.int64)
+        for start in range(0, len(X), BLOCK_ROWS):
+            block = scaled[start:start + BLOCK_ROWS]
+            scores = buffer[:len(block)]
+            np.matmul(block, self.fit_X.T, out=scores)
+            scores *= -2.0
+            scores += self.norms
+            # The n-th smallest score of a strided subset bounds the n-th smallest overall,
+            # so only the few rows under it need a full selection
+            sample = scores[:, ::self._sample_stride]
+            thresholds = np.partition(sample, n_candidates - 1, axis=1)[:, n_candidates - 1]
+            for offset, (row_scores, threshold) in enumerate(zip(scores, thresholds)):
+                kept = np.flatnonzero(row_scores <= threshold)
+                nearest = np.argpartition(row_scores[kept], n_candidates - 1)[:n_candidates]
+                candidates[start + offset] = kept[nearest]
+        distances = np.sqrt(((self.fit_X[candidates] - scaled[:, None, :]) ** 2).sum(axis=2))
+        order = np.lexsort((candidates, distances), axis=1)[:, :k]
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(candidates, order, axis=1)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        if self.fallback is not None and len(X) > MAX_NATIVE_ROWS:
+            return self.fallback.predict(X)
+        return self.predict_native(X)
+
+    def predict_native(self, X: np.ndarray) -> np.ndarray:
+        """Score any number of rows natively, exactly as single rows are scored online."""
+        distances, indices = self.kneighbors(X)
+        return neighbor_average(self.y[indices], distances, self.weights)
+
+
+def compile_model(model):
+    """Native engine equivalent to `model`, or `model` itself when it has no exact equivalent.
+
+    Exact (brute or tree) scaler + euclidean KNN pipelines and brute-force
+    NeighborRegressors are compiled; approximate backends and any other model are
+    served as loaded.
+    """
+    if isinstance(model, NeighborRegressor):
+        return NativeKNN.from_regressor(model) if model.backend == "brute" else model
+    try:
+        return NativeKNN.from_pipeline(model)
+    except ValueError:
+        return model
@@ -0,0 +1,124 @@
+import threading
+from typing import Dict, List, Mapping, Optional, Tuple, Union
+import numpy as np
+
+# Sales columns the model uses, in training order; zipcode demographics follow them
+USER_FEATURES = [
+    'bedrooms', 'bathrooms', 'sqft_living', 'sqft_lot',
+    'floors', 'sqft_above', 'sqft_basement'
+]
+
+
+class ZipcodeIndex:
+    """Zipcode demographics compiled into a dense float64 matrix for request-time lookups.
+
+    Zipcodes map to matrix rows through a direct-indexed array over the zipcode range
+    (98001-98199 for King County), so a lookup is one subtraction and one array read.
+    The demographics are a DataFrame indexed by zipcode, or a mapping of column name
+    to array that includes a "zipcode" column (as read by `get_zipcode_features`).
+    """
+
+    def __init__(self, zipcode_features: Union["pd.DataFrame", Mapping[str, np.ndarray]],
+                 model_features: Optional[List[str]] = None):
+        if isinstance(zipcode_features, Mapping):
+            zipcodes = np.asarray(zipcode_features["zipcode"], dtype=np.int64)
+            columns = [name for name in zipcode_features if name != "zipcode"]
+        else:
+            zipcodes = zipcode_features.index.to_numpy(dtype=np.int64)
+            columns = list(zipcode_features.columns)
+        if model_features is not None:
+            columns = _check_column_order(columns, model_features)
+        self.columns = columns
+        self.feature_names = USER_FEATURES + columns
+        self.n_features = len(self.feature_names)
+        self.matrix = np.ascontiguousarray(np.column_stack(
+            [np.asarray(zipcode_features[name], dtype=np.float64) for name in columns]
+        ).reshape(len(zipcodes), len(columns)))
+
+        if len(np.unique(zipcodes)) != len(zipcodes):
+            raise ValueError("Zipcode demographics contain duplicate zipcodes.")
+        self.base = int(zipcodes.min())
+        self._rows = np.full(int(zipcodes.max()) - self.base + 1, -1, dtype=np.int64)
+        self._rows[zipcodes - self.base] = np.arange(len(zipcodes))
+        self._local = threading.local()
+
+    def __contains__(self, zipcode: int) -> bool:
+        return self.row(zipcode) >= 0
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def zipcodes(self) -> np.ndarray:
+        return np.flatnonzero(self._rows >= 0) + self.base
+
+    def row(self, zipcode: int) -> int:
+        offset = zipcode - self.base
+        if offset < 0 or offset >= len(self._rows):
+            return -1
+        return int(self._rows[offset])
+
+    def rows(self, zipcodes: np.ndarray) -> np.ndarray:
+        offsets = np.asarray(zipcodes, dtype=np.int64) - self.base
+        in_range = (offsets >= 0) & (offsets < len(self._rows))
+        rows = np.full(len(offsets), -1, dtype=np.int64)
+        rows[in_range] = self._rows[offsets[in_range]]
+        return rows
+
+    def single(self, data) -> np.ndarray:
+        """Write one validated row into this thread's (1, n_features) buffer.
+
+        The buffer is reused by the next call on the same thread, so callers must be
+        done with it (or copy it) before scoring another row.
+        """
+        row = self.row(data.zipcode)
+        if row < 0:
+            raise KeyError(data.zipcode)
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = np.empty((1, self.n_features), dtype=np.float64)
+        values = buffer[0]
+        for i, name in enumerate(USER_FEATURES):
+            values[i] = getattr(data, name)
+        values[len(USER_FEATURES):] = self.matrix[row]
+        return buffer
+
+    def batch(self, rows: List) -> Tuple[np.ndarray, np.ndarray]:
+        """Build the model input matrix for a batch of validated rows.
+
+        Returns the matrix for the rows whose zipcode is known, in input order, and a
+        boolean mask over `rows` marking which rows made it into the matrix.
+        """
+        zipcodes = np.fromiter((row.zipcode for row in rows), dtype=np.int64, count=len(rows))
+        row_index = self.rows(zipcodes)
+        known_mask = row_index >= 0
+
+        matrix = np.empty((int(known_mask.sum()), self.n_features), dtype=np.float64)
+        known_rows = [row for row, known in zip(rows, known_mask) if known]
+        for i, name in enumerate(USER_FEATURES):
+            matrix[:, i] = np.fromiter(
+                (getattr(row, name) for row in known_rows), dtype=np.float64, count=len(known_rows))
+        matrix[:, len(USER_FEATURES):] = self.matrix[row_index[known_mask]]
+        return matrix, known_mask
+
+    def columnar(self, columns: Dict[str, list]) -> Tuple[np.ndarray, np.ndarray]:
+        """Like `batch`, for a mapping of feature name to one value per row."""
+        row_index = self.rows(columns["zipcode"])
+        known_mask = row_index >= 0
+        matrix = np.empty((int(known_mask.sum()), self.n_features), dtype=np.float64)
+        for i, name in enumerate(USER_FEATURES):
+            matrix[:, i] = np.asarray(columns[name], dtype=np.float64)[known_mask]
+        matrix[:, len(USER_FEATURES):] = self.matrix[row_index[known_mask]]
+        return matrix, known_mask
+
+
+def _check_column_order(columns: List[str], model_features: List[str]) -> List[str]:
+    """Return the demographics columns in the order the model was trained on."""
+    n_user = len(USER_FEATURES)
+    if list(model_features[:n_user]) != USER_FEATURES:
+        raise ValueError(
+            f"Model features start with {model_features[:n_user]}, expected {USER_FEATURES}.")
+    expected = list(model_features[n_user:])
+    missing = sorted(set(expected) - set(columns))
+    if missing:
+        raise ValueError(f"Zipcode demographics are missing model features: {missing}")
+    return expected
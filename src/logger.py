@@ -1,14 +1,32 @@
+import asyncio
+import json
 import os
-import pandas as pd
-from datetime import datetime
-from uuid import uuid4
+import queue
+import threading
+import time
+from typing import Dict, List
 from src.config import settings
+from src.drift import StreamingStats
+from src.metrics import metrics
 
-LOG_FILE = "data/prediction_logs.csv"
-LOG_FILE_ALL = "data/prediction_logs_all_inputs.csv"
+# Each flush writes one Parquet segment into these directories
+LOG_DIR = "data/prediction_logs"
+LOG_DIR_ALL = "data/prediction_logs_all_inputs"
+# Suffix of the files that merge a worker's segments; their metadata lists the merged segments
+COMPACTED_SUFFIX = "-compact.parquet"
 
-def log_prediction(input_data: dict, full: bool = False):
-    log = {
+
+def is_compacted(name: str) -> bool:
+    return name.endswith(COMPACTED_SUFFIX)
+
+
+def segment_pid(name: str) -> str:
+    """Process id in a "part-<time_ns>-<pid>-<sequence>" log file name."""
+    return name.split("-")[2]
+
+
+def prediction_record(input_data: dict) -> dict:
+    return {
         'id': input_data['id'],
         'timestamp': input_data['timestamp'],
         'prediction': input_data['prediction'][0],
@@ -17,11 +35,233 @@ def log_prediction(input_data: dict, full: bool = False):
         **input_data['features']
     }
 
-    df = pd.DataFrame([log])
-    log_path = LOG_FILE_ALL if full else LOG_FILE
 
-    if not os.path.isfile(log_path):
-        df.to_csv(log_path, index=False)
-    else:
-        df.to_csv(log_path, mode='a', header=False, index=False)
+class PredictionLogSink:
+    """Non-blocking prediction log.
+
+    Requests put records on a bounded in-memory queue and return immediately. A
+    background thread drains the queue and writes a Parquet segment per log
+    directory whenever `batch_size` records are pending or `flush_interval` seconds
+    have passed. When the queue is full, records are dropped (policy "drop") or the
+    caller waits up to `block_timeout` seconds for space (policy "block"). Every
+    flushed batch also updates `stats`, when given, off the request path.
+
+    Every `compact_interval` seconds, and on stop, the writer merges the segments
+    its own process wrote into one compacted file and deletes files older than
+    `retention_days`, then the oldest ones while a directory is above `max_mb`.
+    """
+
+    def __init__(self, max_queue: int = None, batch_size: int = None,
+                 flush_interval: float = None, compact_interval: float = None,
+                 retention_days: float = None, max_mb: float = None,
+                 policy: str = None, block_timeout: float = 0.05, stats: StreamingStats = None):
+        self.batch_size = batch_size or settings.LOG_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.LOG_FLUSH_INTERVAL
+        self.compact_interval = settings.LOG_COMPACT_INTERVAL if compact_interval is None else compact_interval
+        self.retention_days = settings.LOG_RETENTION_DAYS if retention_days is None else retention_days
+        self.max_mb = settings.LOG_MAX_MB if max_mb is None else max_mb
+        self.policy = policy or settings.LOG_QUEUE_POLICY
+        if self.policy not in ("drop", "block"):
+            raise ValueError(f"Unknown log queue policy {self.policy!r}, expected 'drop' or 'block'")
+        self.block_timeout = block_timeout
+        self.stats_sink = stats
+        self._queue = queue.Queue(maxsize=max_queue or settings.LOG_QUEUE_SIZE)
+        self._stop = threading.Event()
+        self._thread = None
+        self._sequence = 0
+        self.submitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+
+    def submit(self, record: dict, full: bool = False) -> bool:
+        try:
+            if self.policy == "block":
+                self._queue.put((full, record), timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait((full, record))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    async def submit_async(self, record: dict, full: bool = False) -> bool:
+        """`submit` for the event loop: waiting for space (policy "block") runs on a thread."""
+        if self.policy != "block":
+            return self.submit(record, full)
+        try:
+            self._queue.put_nowait((full, record))
+        except queue.Full:
+            return await asyncio.get_running_loop().run_in_executor(None, self.submit, record, full)
+        self.submitted += 1
+        return True
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the writer after flushing everything already queued."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+        }
+
+    def _run(self):
+        pending: Dict[bool, List[dict]] = {False: [], True: []}
+        last_flush = last_housekeeping = time.monotonic()
+        while True:
+            stopping = self._stop.is_set()
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                full, record = self._queue.get(timeout=min(timeout, 0.1))
+                pending[full].append(record)
+            except queue.Empty:
+                pass
+            size_reached = any(len(records) >= self.batch_size for records in pending.values())
+            interval_reached = time.monotonic() - last_flush >= self.flush_interval
+            drained = stopping and self._queue.empty()
+            if size_reached or interval_reached or drained:
+                for full, records in pending.items():
+                    if records:
+                        self._flush(records, full)
+                        self._update_stats(records)
+                pending = {False: [], True: []}
+                last_flush = time.monotonic()
+            if drained or (self.compact_interval and time.monotonic() - last_housekeeping >= self.compact_interval):
+                for log_dir in (LOG_DIR, LOG_DIR_ALL):
+                    self._housekeep(log_dir)
+                last_housekeeping = time.monotonic()
+            if drained:
+                self._save_stats(force=True)
+                return
+            self._save_stats()
+
+    def _update_stats(self, records: List[dict]):
+        if self.stats_sink is None:
+            return
+        try:
+            self.stats_sink.update(records)
+        except Exception as e:
+            print(f"Failed to update prediction statistics: {e}")
+
+    def _save_stats(self, force: bool = False):
+        if self.stats_sink is None:
+            return
+        try:
+            if force:
+                self.stats_sink.save()
+            else:
+                self.stats_sink.maybe_save()
+        except Exception as e:
+            print(f"Failed to save prediction statistics: {e}")
+
+    def _flush(self, records: List[dict], full: bool):
+        # Imported on the writer thread: pyarrow is slow to import and requests never need it
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        log_dir = LOG_DIR_ALL if full else LOG_DIR
+        self._sequence += 1
+        # Segment names sort by write time and never collide across worker processes
+        segment = os.path.join(
+            log_dir, f"part-{time.time_ns():020d}-{os.getpid()}-{self._sequence:06d}.parquet")
+        try:
+            os.makedirs(log_dir, exist_ok=True)
+            pq.write_table(pa.Table.from_pylist(records), segment + ".tmp")
+            os.replace(segment + ".tmp", segment)
+            self.written += len(records)
+        except Exception as e:
+            self.failed += len(records)
+            print(f"Failed to write prediction log segment {segment}: {e}")
+
+    def _housekeep(self, log_dir: str):
+        if not os.path.isdir(log_dir):
+            return
+        try:
+            self._compact(log_dir)
+            self._expire(log_dir)
+        except Exception as e:
+            print(f"Failed to compact prediction logs in {log_dir}: {e}")
+
+    def _compact(self, log_dir: str):
+        """Merge the segments this process wrote into one file, then delete them."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        pid = str(os.getpid())
+        sources = sorted(name for name in os.listdir(log_dir)
+                         if name.endswith(".parquet") and not is_compacted(name) and segment_pid(name) == pid)
+        if len(sources) < 2:
+            return
+        tables = [pq.read_table(os.path.join(log_dir, name)) for name in sources]
+        table = pa.concat_tables(tables, promote_options="permissive")
+        # Readers that already loaded some of the segments skip their rows by this list
+        table = table.replace_schema_metadata({"segments": json.dumps(
+            [[name, source.num_rows] for name, source in zip(sources, tables)])})
+        self._sequence += 1
+        # Named after the first segment so files still sort by write time
+        compacted = os.path.join(log_dir, f"{sources[0][:-len('.parquet')]}-{self._sequence:06d}{COMPACTED_SUFFIX}")
+        pq.write_table(table, compacted + ".tmp")
+        os.replace(compacted + ".tmp", compacted)
+        for name in sources:
+            os.remove(os.path.join(log_dir, name))
+
+    def _expire(self, log_dir: str):
+        """Delete log files past the retention age, then the oldest beyond the size cap."""
+        files = []
+        for name in os.listdir(log_dir):
+            if not name.endswith(".parquet"):
+                continue
+            try:
+                stat = os.stat(os.path.join(log_dir, name))
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, name))
+        files.sort()
+        cutoff = time.time() - self.retention_days * 86400 if self.retention_days else None
+        total = sum(size for _, size, _ in files)
+        for mtime, size, name in files:
+            expired = cutoff is not None and mtime < cutoff
+            if not expired and not (self.max_mb and total > self.max_mb * 2 ** 20):
+                break
+            try:
+                os.remove(os.path.join(log_dir, name))
+            except FileNotFoundError:
+                # Another worker removed it first
+                pass
+            total -= size
+
+prediction_stats = StreamingStats(
+    window_seconds=settings.STATS_WINDOW_SECONDS, max_windows=settings.STATS_MAX_WINDOWS,
+    k=settings.STATS_SKETCH_K, save_interval=settings.STATS_SAVE_INTERVAL,
+) if settings.STATS_ENABLED else None
+prediction_sink = PredictionLogSink(stats=prediction_stats)
+
+metrics.gauge("prediction_log_queued", "Prediction log records waiting to be written.",
+              function=lambda: prediction_sink.stats()["queued"])
+metrics.counter("prediction_log_dropped_total", "Prediction log records dropped because the queue was full.",
+                function=lambda: prediction_sink.dropped)
+
+
+def log_prediction(input_data: dict, full: bool = False):
+    return prediction_sink.submit(prediction_record(input_data), full)
+
 
+async def log_prediction_async(input_data: dict, full: bool = False):
+    """`log_prediction` for async handlers; it never blocks the event loop."""
+    return await prediction_sink.submit_async(prediction_record(input_data), full)
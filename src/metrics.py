@@ -0,0 +1,274 @@
+import bisect
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Seconds, from 10us to 10s; covers both sub-millisecond stages and slow requests
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        # Reads a total kept elsewhere; it must only ever grow
+        self._function = function
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        if self._function is not None:
+            return self.header() + [f"{self.name} {self._function()}"]
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in values
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function = function
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        if self._function is not None:
+            return self.header() + [f"{self.name} {self._function()}"]
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in values
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (last is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][position] += 1
+            state[1] += value
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return sum(state[0]) if state else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = self.header()
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                function: Optional[Callable[[], float]] = None) -> Counter:
+        return self.register(Counter(name, documentation, labels, function))
+
+    def gauge(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+              function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labels, function))
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "End-to-end request latency.", ("route", "status"))
+STAGE_SECONDS = metrics.histogram(
+    "prediction_stage_duration_seconds", "Time spent in each stage of a request.", ("route", "stage"))
+IN_FLIGHT = metrics.gauge("http_requests_in_flight", "Requests currently being processed.")
+MODEL_LOAD_SECONDS = metrics.histogram(
+    "model_load_duration_seconds", "Time to load a model bundle.", ("kind",),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+MODEL_VERSION = metrics.gauge("model_version", "Version of the active model bundle.")
+CACHE_REQUESTS = metrics.counter(
+    "cache_requests_total", "Lookups per cache and result (hit or miss).", ("cache", "result"))
+# The zipcode table is complete, not a cache: an unknown zipcode is a client error
+ZIPCODE_LOOKUPS = metrics.counter(
+    "zipcode_lookups_total", "Zipcode demographics lookups by result (found or unknown).", ("result",))
+
+
+class RequestTimings:
+    """Stage durations collected for one request."""
+
+    __slots__ = ("start", "marks", "stages")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks: Dict[str, float] = {}
+        self.stages: List[Tuple[str, float]] = []
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages)
+
+
+_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    "request_timings", default=None)
+
+
+def start_request() -> RequestTimings:
+    timings = RequestTimings()
+    _timings.set(timings)
+    return timings
+
+
+def record_stage(name: str, seconds: float):
+    timings = _timings.get()
+    if timings is not None:
+        timings.stages.append((name, seconds))
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def _mark(name: str, overwrite: bool = True):
+    timings = _timings.get()
+    if timings is not None and (overwrite or name not in timings.marks):
+        timings.marks[name] = time.perf_counter()
+
+
+def mark_handler_end():
+    """For handlers that encode their own response: count the encoding as serialization."""
+    _mark("handler_end")
+
+
+def timed_handler(handler):
+    """Mark when an endpoint body starts and ends, so the middleware can split the
+    remaining request time into parsing (before) and serialization (after)."""
+    if inspect.iscoroutinefunction(handler):
+        @functools.wraps(handler)
+        async def async_wrapper(*args, **kwargs):
+            _mark("handler_start")
+            try:
+                return await handler(*args, **kwargs)
+            finally:
+                _mark("handler_end", overwrite=False)
+        return async_wrapper
+
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        _mark("handler_start")
+        try:
+            return handler(*args, **kwargs)
+        finally:
+            _mark("handler_end", overwrite=False)
+    return wrapper
+
+
+def finish_request(timings: RequestTimings, route: str, status: int) -> float:
+    """Derive parse/serialize stages, record every stage and return the total seconds."""
+    end = time.perf_counter()
+    handler_start = timings.marks.get("handler_start")
+    handler_end = timings.marks.get("handler_end")
+    if handler_start is not None:
+        auth = sum(seconds for name, seconds in timings.stages if name == "auth")
+        timings.stages.append(("parse", max(0.0, handler_start - timings.start - auth)))
+    if handler_end is not None:
+        timings.stages.append(("serialize", end - handler_end))
+    for name, seconds in timings.stages:
+        STAGE_SECONDS.observe(seconds, route=route, stage=name)
+    total = end - timings.start
+    REQUEST_SECONDS.observe(total, route=route, status=status)
+    timings.stages.append(("total", total))
+    return total
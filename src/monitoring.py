@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+
+class LogTail:
+    """Incrementally loaded view over a directory of prediction log segments.
+
+    Each `refresh()` reads only the Parquet segments that appeared since the last
+    call and appends them to a cached frame holding at most `max_rows` of the most
+    recent records. Numeric columns are stored as float32 to halve their footprint.
+    A compacted file lists the segments it merged, and rows of segments already
+    read are skipped, so compaction never duplicates records.
+    """
+
+    def __init__(self, log_dir: str, max_rows: int = 200_000):
+        self.log_dir = log_dir
+        self.max_rows = max_rows
+        self.total_rows = 0
+        self._seen = set()
+        self._frame = pd.DataFrame()
+        self._lock = threading.Lock()
+
+    def _segments(self):
+        if not os.path.isdir(self.log_dir):
+            return []
+        return sorted(name for name in os.listdir(self.log_dir) if name.endswith(".parquet"))
+
+    def refresh(self) -> pd.DataFrame:
+        with self._lock:
+            segments = self._segments()
+            new = [name for name in segments if name not in self._seen]
+            if not new:
+                self._seen.intersection_update(segments)
+                return self._frame
+            frames = []
+            for name in new:
+                # A compacted file read earlier in this loop may already cover this segment
+                if name in self._seen:
+                    continue
+                try:
+                    frame = self._read(name)
+                except FileNotFoundError:
+                    continue
+                frames.append(_compact(frame))
+                self._seen.add(name)
+            # Forget rotated-out segments so the seen set stays bounded
+            self._seen.intersection_update(segments)
+            if frames:
+                self.total_rows += sum(len(frame) for frame in frames)
+                frame = pd.concat([self._frame, *frames], ignore_index=True)
+                self._frame = frame.iloc[-self.max_rows:].reset_index(drop=True)
+            return self._frame
+
+    def _read(self, name: str) -> pd.DataFrame:
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(os.path.join(self.log_dir, name))
+        merged = (table.schema.metadata or {}).get(b"segments")
+        frame = table.to_pandas()
+        if merged is None:
+            return frame
+        keep, start = [], 0
+        for segment, rows in json.loads(merged):
+            if segment not in self._seen:
+                keep.extend(range(start, start + rows))
+            self._seen.add(segment)
+            start += rows
+        return frame.iloc[keep]
+
+
+def _compact(frame: pd.DataFrame) -> pd.DataFrame:
+    numeric = frame.select_dtypes(include="number").columns
+    return frame.astype({column: np.float32 for column in numeric})
+
+
+def histogram(values: pd.Series, bins: int = 20) -> pd.DataFrame:
+    counts, edges = np.histogram(values.dropna().to_numpy(), bins=bins)
+    return pd.DataFrame({
+        "bin_center": (edges[:-1] + edges[1:]) / 2,
+        "bin_width": np.diff(edges),
+        "count": counts,
+    })
+
+
+def sample_rows(frame: pd.DataFrame, max_points: int = 5000, seed: int = 0) -> pd.DataFrame:
+    if len(frame) <= max_points:
+        return frame
+    rows = np.random.default_rng(seed).choice(len(frame), size=max_points, replace=False)
+    return frame.iloc[np.sort(rows)]
+
+
+def box_stats(frame: pd.DataFrame, feature: str, value: str = "prediction",
+              max_groups: int = 30) -> pd.DataFrame:
+    """Quartiles and whiskers of `value` per `feature` group, for precomputed box plots.
+
+    Features with more than `max_groups` distinct values are grouped into quantile bins.
+    """
+    groups = frame[feature]
+    if groups.nunique() > max_groups:
+        groups = pd.qcut(groups, q=max_groups, duplicates="drop").map(lambda interval: interval.mid)
+    grouped = frame[value].groupby(groups, observed=True)
+    stats = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ["q1", "median", "q3"]
+    iqr = stats["q3"] - stats["q1"]
+    stats["lowerfence"] = np.maximum(grouped.min(), stats["q1"] - 1.5 * iqr)
+    stats["upperfence"] = np.minimum(grouped.max(), stats["q3"] + 1.5 * iqr)
+    stats["count"] = grouped.size()
+    return stats.reset_index(names=feature)
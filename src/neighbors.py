@@ -0,0 +1,253 @@
+from typing import Dict, Tuple
+import numpy as np
+from sklearn.neighbors import KNeighborsRegressor, NearestNeighbors
+from sklearn.preprocessing import MinMaxScaler, RobustScaler, StandardScaler
+
+
+class ExactIndex:
+    """Exact neighbour search through sklearn: brute force, KD-tree or BallTree."""
+
+    def __init__(self, algorithm: str = "brute", leaf_size: int = 30):
+        self.algorithm = algorithm
+        self.leaf_size = leaf_size
+
+    def fit(self, X: np.ndarray) -> "ExactIndex":
+        self._nn = NearestNeighbors(algorithm=self.algorithm, leaf_size=self.leaf_size).fit(X)
+        return self
+
+    def query(self, X: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self._nn.kneighbors(X, n_neighbors=k)
+
+    def get_params(self) -> Dict:
+        return {} if self.algorithm == "brute" else {"leaf_size": self.leaf_size}
+
+    def get_arrays(self) -> Dict[str, np.ndarray]:
+        # Nothing to persist: sklearn trees are rebuilt from the training matrix
+        return {}
+
+
+class RandomProjectionForest:
+    """Approximate neighbour search over a forest of random-projection trees.
+
+    Each tree splits its points at the median of their projection onto a random
+    direction until leaves hold at most `leaf_size` points. A query walks every tree
+    to one leaf and ranks the union of those leaves by exact distance, so cost grows
+    with `n_trees * leaf_size` rather than with the training set.
+    """
+
+    def __init__(self, n_trees: int = 10, leaf_size: int = 40, random_state: int = 42):
+        self.n_trees = n_trees
+        self.leaf_size = leaf_size
+        self.random_state = random_state
+
+    def fit(self, X: np.ndarray) -> "RandomProjectionForest":
+        self._X = np.ascontiguousarray(X, dtype=np.float64)
+        rng = np.random.default_rng(self.random_state)
+        self.trees = [self._build_tree(rng) for _ in range(self.n_trees)]
+        return self
+
+    def get_params(self) -> Dict:
+        return {"n_trees": self.n_trees, "leaf_size": self.leaf_size, "random_state": self.random_state}
+
+    def get_arrays(self) -> Dict[str, np.ndarray]:
+        return {f"{i}_{name}": array for i, tree in enumerate(self.trees) for name, array in tree.items()}
+
+    def restore(self, X: np.ndarray, arrays: Dict[str, np.ndarray]) -> "RandomProjectionForest":
+        """Reuse trees saved with `get_arrays` instead of rebuilding them over X."""
+        self._X = X
+        self.trees = [
+            {name: arrays[f"{i}_{name}"] for name in TREE_ARRAYS} for i in range(self.n_trees)
+        ]
+        return self
+
+    def _build_tree(self, rng: np.random.Generator) -> dict:
+        n, d = self._X.shape
+        directions, thresholds, children, leaf_ranges, indices = [], [], [], [], []
+
+        def new_node():
+            directions.append(np.zeros(d))
+            thresholds.append(0.0)
+            children.append((-1, -1))
+            leaf_ranges.append((0, 0))
+            return len(directions) - 1
+
+        offset = 0
+        stack = [(new_node(), np.arange(n))]
+        while stack:
+            node, points = stack.pop()
+            if len(points) > self.leaf_size:
+                direction = rng.standard_normal(d)
+                projection = self._X[points] @ direction
+                threshold = np.median(projection)
+                left = projection <= threshold
+                # Ties can put every point on one side; keep those as a leaf
+                if 0 < left.sum() < len(points):
+                    directions[node] = direction
+                    thresholds[node] = threshold
+                    children[node] = (new_node(), new_node())
+                    stack.append((children[node][0], points[left]))
+                    stack.append((children[node][1], points[~left]))
+                    continue
+            leaf_ranges[node] = (offset, offset + len(points))
+            offset += len(points)
+            indices.append(points)
+
+        return {
+            "directions": np.vstack(directions),
+            "thresholds": np.array(thresholds),
+            "children": np.array(children, dtype=np.int64),
+            "leaf_ranges": np.array(leaf_ranges, dtype=np.int64),
+            "indices": np.concatenate(indices),
+        }
+
+    def _leaves(self, tree: dict, X: np.ndarray) -> np.ndarray:
+        nodes = np.zeros(len(X), dtype=np.int64)
+        active = tree["children"][nodes, 0] >= 0
+        while active.any():
+            current = nodes[active]
+            projection = np.einsum("ij,ij->i", X[active], tree["directions"][current])
+            go_right = (projection > tree["thresholds"][current]).astype(np.int64)
+            nodes[active] = tree["children"][current, go_right]
+            active = tree["children"][nodes, 0] >= 0
+        return nodes
+
+    def query(self, X: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        X = np.asarray(X, dtype=np.float64)
+        leaves = [self._leaves(tree, X) for tree in self.trees]
+        distances = np.empty((len(X), k))
+        indices = np.empty((len(X), k), dtype=np.int64)
+        for i, x in enumerate(X):
+            candidates = np.unique(np.concatenate([
+                tree["indices"][slice(*tree["leaf_ranges"][leaf[i]])]
+                for tree, leaf in zip(self.trees, leaves)
+            ]))
+            if len(candidates) < k:
+                candidates = np.arange(len(self._X))
+            candidate_distances = np.sqrt(((self._X[candidates] - x) ** 2).sum(axis=1))
+            nearest = np.argpartition(candidate_distances, k - 1)[:k]
+            nearest = nearest[np.argsort(candidate_distances[nearest], kind="stable")]
+            distances[i] = candidate_distances[nearest]
+            indices[i] = candidates[nearest]
+        return distances, indices
+
+
+TREE_ARRAYS = ("directions", "thresholds", "children", "leaf_ranges", "indices")
+
+BACKENDS = {
+    "brute": lambda **params: ExactIndex("brute"),
+    "kd_tree": lambda leaf_size=30: ExactIndex("kd_tree", leaf_size),
+    "ball_tree": lambda leaf_size=30: ExactIndex("ball_tree", leaf_size),
+    "rp_forest": RandomProjectionForest,
+}
+
+
+def build_index(backend: str, X: np.ndarray, **params):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown neighbour backend {backend!r}, expected one of {list(BACKENDS)}")
+    return BACKENDS[backend](**params).fit(X)
+
+
+def restore_index(backend: str, X: np.ndarray, params: Dict, arrays: Dict[str, np.ndarray]):
+    """Index over X from saved `get_params`/`get_arrays`; only sklearn indexes are refit."""
+    if backend == "rp_forest" and arrays:
+        return RandomProjectionForest(**params).restore(X, arrays)
+    return build_index(backend, X, **params)
+
+
+class NeighborRegressor:
+    """Serving-time equivalent of a scaler + KNeighborsRegressor pipeline.
+
+    Scaling is done with the fitted center/scale vectors and the neighbour query is
+    delegated to a pluggable index, so the search strategy can change per deployment
+    without retraining.
+    """
+
+    def __init__(self, center: np.ndarray, scale: np.ndarray, fit_X: np.ndarray, y: np.ndarray,
+                 n_neighbors: int, weights: str, index, backend: str):
+        self.center = center
+        self.scale = scale
+        self.fit_X = fit_X
+        self.y = y
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.index = index
+        self.backend = backend
+
+    @classmethod
+    def from_pipeline(cls, model, backend: str = "brute", **params) -> "NeighborRegressor":
+        scaler, regressor = _unpack_pipeline(model)
+        center, scale = scaler_params(scaler, regressor.n_features_in_)
+        fit_X = np.asarray(regressor._fit_X, dtype=np.float64)
+        return cls(
+            center=center,
+            scale=scale,
+            fit_X=fit_X,
+            y=np.asarray(regressor._y, dtype=np.float64),
+            n_neighbors=regressor.n_neighbors,
+            weights=regressor.weights,
+            index=build_index(backend, fit_X, **params),
+            backend=backend,
+        )
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        return (np.asarray(X, dtype=np.float64) - self.center) / self.scale
+
+    def kneighbors(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return self.index.query(self.transform(X), self.n_neighbors)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        distances, indices = self.kneighbors(X)
+        return neighbor_average(self.y[indices], distances, self.weights)
+
+
+def neighbor_average(neighbor_y: np.ndarray, distances: np.ndarray, weights: str) -> np.ndarray:
+    if weights == "uniform":
+        return neighbor_y.mean(axis=1)
+    # Same rule as sklearn: an exact match takes all the weight
+    with np.errstate(divide="ignore"):
+        inverse = 1.0 / distances
+    exact = np.isinf(inverse)
+    exact_rows = exact.any(axis=1)
+    inverse[exact_rows] = exact[exact_rows]
+    return (neighbor_y * inverse).sum(axis=1) / inverse.sum(axis=1)
+
+
+def scaler_params(scaler, n_features: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Express a fitted scaler as `(x - center) / scale`."""
+    if isinstance(scaler, RobustScaler):
+        center = scaler.center_ if scaler.center_ is not None else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+    elif isinstance(scaler, StandardScaler):
+        center = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+    elif isinstance(scaler, MinMaxScaler) and not scaler.clip:
+        # x * scale_ + min_ == (x - (-min_ / scale_)) / (1 / scale_)
+        center = -scaler.min_ / scaler.scale_
+        scale = 1.0 / scaler.scale_
+    else:
+        raise ValueError(f"Unsupported scaler {scaler.__class__.__name__}.")
+    return np.asarray(center, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+
+
+def _unpack_pipeline(model):
+    steps = [step for _, step in getattr(model, "steps", [])]
+    if len(steps) != 2 or not isinstance(steps[0], SCALERS) \
+            or not isinstance(steps[1], KNeighborsRegressor):
+        raise ValueError("Expected a scaler + KNeighborsRegressor pipeline.")
+    regressor = steps[1]
+    if not is_euclidean(regressor) or callable(regressor.weights):
+        raise ValueError("Only euclidean KNN with 'uniform' or 'distance' weights is supported.")
+    return steps[0], regressor
+
+
+SCALERS = (RobustScaler, StandardScaler, MinMaxScaler)
+
+
+def is_euclidean(regressor: KNeighborsRegressor) -> bool:
+    return regressor.metric == "euclidean" or (regressor.metric == "minkowski" and regressor.p == 2)
+
+
+def recall_at_k(exact_indices: np.ndarray, approx_indices: np.ndarray) -> float:
+    k = exact_indices.shape[1]
+    hits = sum(len(np.intersect1d(e, a)) for e, a in zip(exact_indices, approx_indices))
+    return hits / (len(exact_indices) * k)
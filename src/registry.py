@@ -0,0 +1,307 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, FrozenSet, List, Optional, Tuple
+import numpy as np
+
+from src.config import settings
+from src.features import ZipcodeIndex
+from src.metrics import MODEL_LOAD_SECONDS, MODEL_VERSION, metrics
+from src.utils import (get_model, get_model_features, get_run_model, get_zipcode_features,
+                       model_artifact_path, run_artifact_path)
+
+RunKey = Tuple[str, str]
+# MLflow ids are numeric or hex; anything else could point outside MLRUNS_DIR
+RUN_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def parse_run(spec: str) -> RunKey:
+    """Parse "experiment_id/run_id", or a bare run_id of the configured experiment."""
+    experiment_id, _, run_id = spec.strip().rpartition("/")
+    experiment_id = experiment_id or settings.EXPERIMENT_ID
+    if not (RUN_ID_PATTERN.fullmatch(experiment_id) and RUN_ID_PATTERN.fullmatch(run_id)):
+        raise ValueError(f"Invalid model run {spec!r}, expected 'experiment_id/run_id'.")
+    return experiment_id, run_id
+
+
+def artifact_fingerprint(path: str, backend: str = "") -> Optional[str]:
+    """Identify the artifact file a model was loaded from, or None when it is missing.
+
+    An exported artifact is identified by its manifest: the digest of its content
+    and the backend read from it change with every export, even one that keeps
+    the same sizes. Pickles are identified by their modification time and size.
+    """
+    # src.artifact imports sklearn, which the API only needs once a model loads
+    from src.artifact import MANIFEST
+
+    try:
+        stat = os.stat(path)
+        fingerprint = f"{path}:{stat.st_mtime_ns}:{stat.st_size}"
+        if os.path.basename(path) == MANIFEST:
+            with open(path, "rb") as f:
+                digest = hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+            fingerprint = f"{fingerprint}:{digest}:{backend}"
+    except OSError:
+        return None
+    return fingerprint
+
+
+def estimate_nbytes(obj: Any, _seen: set = None) -> int:
+    """Approximate memory held by a model: the arrays reachable from its attributes."""
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen or obj is None or isinstance(obj, (str, bytes, int, float, bool)):
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        # Views of another array hold no memory of their own
+        return 0 if isinstance(obj.base, np.ndarray) and not isinstance(obj, np.memmap) else obj.nbytes
+    if isinstance(obj, dict):
+        return sum(estimate_nbytes(value, seen) for value in obj.values())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sum(estimate_nbytes(value, seen) for value in obj)
+    # sklearn's KDTree and BallTree keep their arrays in C attributes
+    if type(obj).__name__ in ("KDTree", "BallTree"):
+        return estimate_nbytes(obj.get_arrays(), seen)
+    return estimate_nbytes(getattr(obj, "__dict__", None), seen)
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """Everything a request needs to score, loaded together and swapped as one unit."""
+    experiment_id: str
+    run_id: str
+    version: int
+    model: Any
+    zipcode_index: ZipcodeIndex
+    loaded_at: str
+    load_seconds: float
+    size_bytes: int = 0
+    # Identifies the artifact file across workers and restarts; None when it has none
+    fingerprint: Optional[str] = None
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.experiment_id, self.run_id
+
+    def info(self) -> dict:
+        return {
+            "experiment_id": self.experiment_id,
+            "run_id": self.run_id,
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+            "engine": type(self.model).__name__,
+            "size_bytes": self.size_bytes,
+        }
+
+
+class ModelRegistry:
+    """In-memory registry of loaded models keyed by (experiment_id, run_id).
+
+    Readers take a reference to the active bundle with `current()` and use it for
+    the whole request. Reloads build a complete new bundle first and only then
+    replace the reference, so a request never sees a partially loaded model.
+
+    Other runs are loaded from the MLflow file store on first use with `get_or_load`
+    and kept in an LRU cache. When the cached bundles take more than `cache_bytes`,
+    the least recently used ones are dropped, except the active bundle and the
+    `pinned` runs (the canary and shadow targets).
+    """
+
+    def __init__(self, model_path: str = None, zipcode_path: str = None,
+                 features_path: str = None, cache_bytes: int = None):
+        self.model_path = model_path or settings.MODEL_PATH
+        self.features_path = features_path or settings.MODEL_FEATURES_PATH
+        self.zipcode_path = zipcode_path or settings.ZIPCODE_PATH
+        self.cache_bytes = int(settings.MODEL_CACHE_MB * 2 ** 20) if cache_bytes is None else cache_bytes
+        self.pinned: FrozenSet[RunKey] = frozenset()
+        # Called with each bundle that replaces the active one
+        self.listeners: List[Callable[[ModelBundle], None]] = []
+        self._bundles: "OrderedDict[RunKey, ModelBundle]" = OrderedDict()
+        self._active: Optional[ModelBundle] = None
+        self._version = 0
+        self._loaded_mtime: Optional[float] = None
+        self._reload_lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._stop_watch = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    def _build(self, experiment_id: str, run_id: str, load_model: Callable[[], Any],
+               features_path: str, source_path: str) -> ModelBundle:
+        start = time.perf_counter()
+        # Taken before loading, so a file replaced meanwhile reads as changed next time
+        fingerprint = artifact_fingerprint(source_path, settings.NEIGHBOR_BACKEND)
+        model = load_model()
+        if settings.NATIVE_ENGINE:
+            # Imported here: src.engine pulls in sklearn, which only loaded models need
+            from src.engine import compile_model
+
+            model = compile_model(model)
+        zipcode_index = ZipcodeIndex(
+            get_zipcode_features(self.zipcode_path),
+            get_model_features(features_path))
+        self._version += 1
+        return ModelBundle(
+            experiment_id=experiment_id,
+            run_id=run_id,
+            version=self._version,
+            model=model,
+            zipcode_index=zipcode_index,
+            loaded_at=datetime.utcnow().isoformat(),
+            load_seconds=time.perf_counter() - start,
+            size_bytes=estimate_nbytes(model),
+            fingerprint=fingerprint and f"{experiment_id}/{run_id}:{fingerprint}:{type(model).__name__}",
+        )
+
+    def _store(self, bundle: ModelBundle):
+        with self._cache_lock:
+            self._bundles[bundle.key] = bundle
+            self._bundles.move_to_end(bundle.key)
+            self._evict(bundle.key)
+
+    def _evict(self, keep: RunKey):
+        """Drop least recently used bundles until the cache fits, never the one just stored.
+
+        Evicting `keep` would make every request for it load the run again, so a cache
+        that cannot hold it stays over budget and says so instead.
+        """
+        active = self._active.key if self._active is not None else None
+        total = sum(bundle.size_bytes for bundle in self._bundles.values())
+        for key in list(self._bundles):
+            if total <= self.cache_bytes:
+                break
+            if key in (keep, active) or key in self.pinned:
+                continue
+            total -= self._bundles.pop(key).size_bytes
+            CACHED_MODELS.inc(result="evicted")
+        if total > self.cache_bytes:
+            print(f"Cached models take {total / 2 ** 20:.1f} MB, over the {self.cache_bytes / 2 ** 20:.1f} MB "
+                  f"budget; raise MODEL_CACHE_MB to hold the active, pinned and requested runs.")
+
+    def load(self, experiment_id: str = None, run_id: str = None) -> ModelBundle:
+        experiment_id = experiment_id or settings.EXPERIMENT_ID
+        run_id = run_id or settings.RUN_ID
+        # Only one reload builds at a time; readers never take this lock
+        with self._reload_lock:
+            mtime = self._model_mtime()
+            bundle = self._build(
+                experiment_id, run_id, lambda: get_model(self.model_path), self.features_path,
+                self.artifact_path())
+            kind = "load" if self._active is None else "reload"
+            self._active = bundle
+            self._store(bundle)
+            self._loaded_mtime = mtime
+            MODEL_LOAD_SECONDS.observe(bundle.load_seconds, kind=kind)
+            MODEL_VERSION.set(bundle.version)
+            for listener in self.listeners:
+                listener(bundle)
+            return bundle
+
+    def reload(self) -> ModelBundle:
+        active = self._active
+        if active is None:
+            return self.load()
+        return self.load(active.experiment_id, active.run_id)
+
+    def current(self) -> ModelBundle:
+        bundle = self._active
+        if bundle is None:
+            raise RuntimeError("No model loaded.")
+        return bundle
+
+    def get(self, experiment_id: str, run_id: str) -> ModelBundle:
+        return self._bundles[(experiment_id, run_id)]
+
+    def lookup(self, experiment_id: str, run_id: str) -> Optional[ModelBundle]:
+        """The cached bundle for a run, marked as recently used, or None."""
+        key = (experiment_id, run_id)
+        with self._cache_lock:
+            bundle = self._bundles.get(key)
+            if bundle is not None:
+                self._bundles.move_to_end(key)
+                CACHED_MODELS.inc(result="hit")
+        return bundle
+
+    def get_or_load(self, experiment_id: str, run_id: str) -> ModelBundle:
+        """The bundle for a run, loading its artifacts from the MLflow store on a miss.
+
+        Raises FileNotFoundError when the run has no `model.pkl`.
+        """
+        bundle = self.lookup(experiment_id, run_id)
+        if bundle is not None:
+            return bundle
+        key = (experiment_id, run_id)
+        with self._reload_lock:
+            # Another request may have loaded it while this one waited
+            bundle = self._bundles.get(key)
+            if bundle is not None:
+                return bundle
+            CACHED_MODELS.inc(result="miss")
+            bundle = self._build(
+                experiment_id, run_id, lambda: get_run_model(experiment_id, run_id),
+                run_artifact_path(experiment_id, run_id, "model_features.json"),
+                run_artifact_path(experiment_id, run_id, "model.pkl"))
+            MODEL_LOAD_SECONDS.observe(bundle.load_seconds, kind="run")
+            self._store(bundle)
+            return bundle
+
+    def keys(self):
+        return list(self._bundles)
+
+    def bundles(self):
+        return list(self._bundles.values())
+
+    def artifact_path(self) -> str:
+        """The file `load` reads the model from: the export manifest when one is configured."""
+        if settings.MODEL_ARTIFACT_DIR:
+            from src.artifact import MANIFEST
+
+            return os.path.join(settings.MODEL_ARTIFACT_DIR, MANIFEST)
+        return model_artifact_path(self.model_path)
+
+    def _model_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.artifact_path()).st_mtime
+        except OSError:
+            return None
+
+    def changed_on_disk(self) -> bool:
+        mtime = self._model_mtime()
+        return mtime is not None and mtime != self._loaded_mtime
+
+    def start_watcher(self, interval: float):
+        if self._watcher is not None:
+            return
+        self._stop_watch.clear()
+        self._watcher = threading.Thread(
+            target=self._watch, args=(interval,), name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop_watch.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self, interval: float):
+        while not self._stop_watch.wait(interval):
+            if not self.changed_on_disk():
+                continue
+            try:
+                self.reload()
+            except Exception as e:
+                # Keep serving the previous bundle; the next tick retries
+                print(f"Model reload failed: {e}")
+
+
+CACHED_MODELS = metrics.counter(
+    "model_cache_requests_total", "Model cache lookups by result (hit, miss or evicted).", ("result",))
+metrics.gauge("model_cache_bytes", "Estimated memory held by cached model bundles.",
+              function=lambda: sum(bundle.size_bytes for bundle in registry.bundles()))
+
+registry = ModelRegistry()
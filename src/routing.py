@@ -0,0 +1,213 @@
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from src.config import settings
+from src.metrics import metrics
+from src.registry import ModelBundle, ModelRegistry, RunKey, parse_run, registry
+
+MODEL_PREDICT_SECONDS = metrics.histogram(
+    "model_predict_duration_seconds", "Model call time per run, for live and shadow scoring.",
+    ("run", "role"))
+SHADOW_REQUESTS = metrics.counter(
+    "shadow_requests_total", "Shadow scoring jobs by result (scored, dropped or failed).", ("result",))
+SHADOW_DIFFERENCE = metrics.histogram(
+    "shadow_prediction_relative_difference", "|shadow - live| / |live| per scored row.", ("run",),
+    buckets=(0.001, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0))
+
+
+def run_label(key: RunKey) -> str:
+    return "/".join(key)
+
+
+def parse_canary(spec: str) -> Tuple[Tuple[RunKey, float], ...]:
+    """Parse "experiment/run:weight,..." into (run, weight) pairs."""
+    routes = []
+    for part in filter(None, (part.strip() for part in spec.split(","))):
+        run, _, weight = part.rpartition(":")
+        routes.append((parse_run(run), float(weight)))
+    return tuple(routes)
+
+
+@dataclass(frozen=True)
+class Routing:
+    """Which runs get live traffic besides the active model, and which one shadows it."""
+    canary: Tuple[Tuple[RunKey, float], ...] = ()
+    shadow: Optional[RunKey] = None
+    shadow_fraction: float = 0.0
+
+    def __post_init__(self):
+        if any(weight < 0 for _, weight in self.canary) or sum(w for _, w in self.canary) > 1:
+            raise ValueError("Canary weights must be non-negative and sum to at most 1.")
+        if not 0 <= self.shadow_fraction <= 1:
+            raise ValueError("Shadow fraction must be between 0 and 1.")
+
+    def runs(self) -> List[RunKey]:
+        runs = [key for key, _ in self.canary]
+        return runs + [self.shadow] if self.shadow else runs
+
+    def info(self) -> dict:
+        return {
+            "canary": {run_label(key): weight for key, weight in self.canary},
+            "shadow": run_label(self.shadow) if self.shadow else None,
+            "shadow_fraction": self.shadow_fraction,
+        }
+
+
+class Router:
+    """Picks the run that serves a request and samples requests for shadow scoring.
+
+    The routing is replaced as a whole by `configure`, and its runs are pinned in the
+    registry so the LRU never evicts a model that is receiving traffic.
+    """
+
+    def __init__(self, models: ModelRegistry = registry):
+        self.models = models
+        self.routing = Routing()
+
+    def configure(self, routing: Routing, preload: bool = True):
+        if preload:
+            # Fail here, not on the first routed request, when a run does not exist
+            for key in routing.runs():
+                self.models.get_or_load(*key)
+        self.models.pinned = frozenset(routing.runs())
+        self.routing = routing
+
+    def configure_from_settings(self):
+        self.configure(Routing(
+            canary=parse_canary(settings.CANARY_RUNS),
+            shadow=parse_run(settings.SHADOW_RUN) if settings.SHADOW_RUN else None,
+            shadow_fraction=settings.SHADOW_FRACTION,
+        ))
+
+    def choose(self) -> Optional[RunKey]:
+        """A canary run for this request, or None for the active model."""
+        canary = self.routing.canary
+        if not canary:
+            return None
+        point = random.random()
+        for key, weight in canary:
+            if point < weight:
+                return key
+            point -= weight
+        return None
+
+    def shadow_target(self, live: ModelBundle) -> Optional[RunKey]:
+        routing = self.routing
+        if routing.shadow is None or routing.shadow == live.key:
+            return None
+        if random.random() >= routing.shadow_fraction:
+            return None
+        return routing.shadow
+
+
+class ShadowScorer:
+    """Scores sampled requests with a second model on a background thread.
+
+    Jobs carry the validated rows and the live predictions. The worker rebuilds the
+    features with the shadow bundle's own zipcode index (runs may use different
+    features), records its model call time next to the live one and the relative
+    difference of the predictions. A full queue drops jobs rather than slowing down
+    requests.
+    """
+
+    def __init__(self, models: ModelRegistry = registry, max_queue: int = None):
+        self.models = models
+        self._queue = queue.Queue(maxsize=max_queue or settings.SHADOW_QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._summary = {}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def submit(self, target: RunKey, live: ModelBundle, rows: Sequence, predictions: Sequence,
+               live_seconds: float) -> bool:
+        """Queue rows scored by `live`; `predictions` has None for rows it could not score."""
+        try:
+            self._queue.put_nowait((target, live.key, rows, predictions, live_seconds))
+        except queue.Full:
+            SHADOW_REQUESTS.inc(result="dropped")
+            return False
+        return True
+
+    def join(self):
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._score(*job)
+                SHADOW_REQUESTS.inc(result="scored")
+            except Exception as e:
+                SHADOW_REQUESTS.inc(result="failed")
+                print(f"Shadow scoring failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _score(self, target: RunKey, live_key: RunKey, rows: Sequence, predictions: Sequence,
+               live_seconds: float):
+        bundle = self.models.get_or_load(*target)
+        features, known = bundle.zipcode_index.batch(rows)
+        if not len(features):
+            return
+        start = time.perf_counter()
+        shadow = bundle.model.predict(features)
+        seconds = time.perf_counter() - start
+        live = np.array([np.nan if value is None else value for value in predictions], dtype=np.float64)[known]
+        difference = np.abs(shadow - live) / np.maximum(np.abs(live), 1e-9)
+        difference = difference[~np.isnan(difference)]
+
+        label = run_label(target)
+        MODEL_PREDICT_SECONDS.observe(seconds, run=label, role="shadow")
+        for value in difference:
+            SHADOW_DIFFERENCE.observe(value, run=label)
+        with self._lock:
+            summary = self._summary.setdefault((live_key, target), {
+                "live": run_label(live_key), "shadow": label, "jobs": 0, "rows": 0,
+                "live_seconds": 0.0, "shadow_seconds": 0.0, "relative_difference": 0.0})
+            summary["jobs"] += 1
+            summary["rows"] += len(difference)
+            summary["live_seconds"] += live_seconds
+            summary["shadow_seconds"] += seconds
+            summary["relative_difference"] += float(difference.sum())
+
+    def stats(self) -> List[dict]:
+        """Per (live, shadow) pair: mean model call time of each and mean relative difference."""
+        with self._lock:
+            summaries = [dict(summary) for summary in self._summary.values()]
+        for summary in summaries:
+            jobs, rows = summary.pop("jobs"), summary["rows"]
+            summary["jobs"] = jobs
+            summary["live_ms"] = summary.pop("live_seconds") / jobs * 1000
+            summary["shadow_ms"] = summary.pop("shadow_seconds") / jobs * 1000
+            summary["mean_relative_difference"] = summary.pop("relative_difference") / rows if rows else None
+        return summaries
+
+
+router = Router()
+shadow_scorer = ShadowScorer()
+
+
+def record_live(bundle: ModelBundle, rows: Sequence, predictions: Sequence, seconds: float):
+    """Record the live model time and, for sampled requests, queue the rows for the shadow run."""
+    MODEL_PREDICT_SECONDS.observe(seconds, run=run_label(bundle.key), role="live")
+    target = router.shadow_target(bundle)
+    if target is not None:
+        shadow_scorer.submit(target, bundle, rows, predictions, seconds)
@@ -0,0 +1,55 @@
+import orjson
+from fastapi import HTTPException, Request
+from fastapi.responses import ORJSONResponse, Response
+from src.metrics import mark_handler_end
+
+try:
+    import msgpack
+except ImportError:  # Optional: only needed for application/msgpack requests and responses
+    msgpack = None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def _is_msgpack(header: str) -> bool:
+    return any(media_type in header for media_type in MSGPACK_TYPES)
+
+
+class MsgPackResponse(Response):
+    media_type = "application/msgpack"
+
+    def render(self, content) -> bytes:
+        return msgpack.packb(content)
+
+
+def response_format(request: Request) -> str:
+    """Dependency picking the response encoding from the Accept header, before any scoring."""
+    if not _is_msgpack(request.headers.get("accept", "")):
+        return "json"
+    if msgpack is None:
+        raise HTTPException(status_code=406, detail="MessagePack responses need the msgpack package.")
+    return "msgpack"
+
+
+def encode_response(content, response_format: str = "json", status_code: int = 200) -> Response:
+    """Encode with orjson (or MessagePack), skipping FastAPI's jsonable_encoder pass."""
+    mark_handler_end()
+    if response_format == "msgpack":
+        return MsgPackResponse(content, status_code=status_code)
+    return ORJSONResponse(content, status_code=status_code)
+
+
+async def read_body(request: Request):
+    """Decode a JSON or MessagePack request body according to its Content-Type."""
+    body = await request.body()
+    if _is_msgpack(request.headers.get("content-type", "")):
+        if msgpack is None:
+            raise HTTPException(status_code=415, detail="MessagePack requests need the msgpack package.")
+        try:
+            return msgpack.unpackb(body)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid MessagePack body: {e}")
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
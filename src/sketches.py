@@ -0,0 +1,131 @@
+import math
+import random
+from typing import Tuple
+import numpy as np
+
+
+class KLLSketch:
+    """Mergeable streaming quantile sketch (Karnin, Lang and Liberty).
+
+    Values are appended to level 0. When the sketch outgrows its capacity, the lowest
+    full level is sorted and every other item (from a random offset) moves one level
+    up, where each item stands for twice as many values. Capacities shrink
+    geometrically towards the lower levels, so memory stays around `3k` items no matter
+    how many values are added, and rank error stays around `1/k`. Two sketches merge
+    by concatenating their levels and compacting again.
+    """
+
+    def __init__(self, k: int = 200, seed: int = None):
+        self.k = k
+        self.n = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.levels = [[]]
+        self._size = 0
+        self._limit = self._max_size()
+        self._rng = random.Random(seed)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(level) for level in range(len(self.levels)))
+
+    def update(self, value: float):
+        value = float(value)
+        if value != value:
+            return
+        self.levels[0].append(value)
+        self._size += 1
+        self.n += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if self._size >= self._limit:
+            self._compress()
+
+    def update_many(self, values):
+        for value in np.asarray(values, dtype=np.float64).ravel():
+            self.update(value)
+
+    def _compress(self):
+        while self._size >= self._limit:
+            for level, items in enumerate(self.levels):
+                if len(items) < self._capacity(level):
+                    continue
+                if level + 1 == len(self.levels):
+                    self.levels.append([])
+                    self._limit = self._max_size()
+                items.sort()
+                # An odd item out stays behind so weights keep summing to n
+                kept = [items.pop()] if len(items) % 2 else []
+                promoted = items[self._rng.getrandbits(1)::2]
+                self.levels[level + 1].extend(promoted)
+                self.levels[level] = kept
+                self._size -= len(items) - len(promoted)
+                break
+            else:
+                return
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        self._limit = self._max_size()
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self._size += other._size
+        self.n += other.n
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted(self) -> Tuple[np.ndarray, np.ndarray]:
+        values = np.fromiter((v for items in self.levels for v in items), dtype=np.float64, count=self._size)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        return values[order], np.cumsum(weights[order])
+
+    def cdf(self, x) -> np.ndarray:
+        """Estimated fraction of values <= x."""
+        if not self.n:
+            return np.zeros(np.shape(x))
+        values, cumulative = self._weighted()
+        positions = np.searchsorted(values, x, side="right")
+        ranks = np.where(positions > 0, cumulative[np.maximum(positions - 1, 0)], 0.0)
+        return ranks / cumulative[-1]
+
+    def quantile(self, q) -> np.ndarray:
+        if not self.n:
+            return np.full(np.shape(q), np.nan)
+        values, cumulative = self._weighted()
+        positions = np.searchsorted(cumulative, np.asarray(q) * cumulative[-1], side="left")
+        return values[np.clip(positions, 0, len(values) - 1)]
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.n if self.n else math.nan
+
+    def to_dict(self) -> dict:
+        return {"k": self.k, "n": self.n, "total": self.total, "min": self.min, "max": self.max,
+                "levels": self.levels}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "KLLSketch":
+        sketch = cls(data["k"])
+        sketch.n = data["n"]
+        sketch.total = data["total"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        sketch.levels = [list(items) for items in data["levels"]] or [[]]
+        sketch._size = sum(len(items) for items in sketch.levels)
+        sketch._limit = sketch._max_size()
+        return sketch
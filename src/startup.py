@@ -0,0 +1,81 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+import numpy as np
+from src.features import USER_FEATURES
+from src.metrics import metrics
+from src.validation import InputFeatures
+
+STARTUP_SECONDS = metrics.gauge("startup_seconds", "Duration of each startup phase.", ("phase",))
+READY = metrics.gauge("model_ready", "1 once the model is loaded and warmed up.")
+# Typical King County sale, used to exercise the model before taking traffic
+WARMUP_HOUSE = dict(zip(USER_FEATURES, (3.0, 2.0, 1900.0, 7500.0, 1.0, 1600.0, 300.0)))
+WARMUP_BATCH = 64  # Big enough to also take the sklearn path behind the native engine
+
+
+class Startup:
+    """Startup phase timings and the readiness flag served by `/ready`.
+
+    Liveness only means the process answers; readiness means a model is loaded and
+    has already scored the warm-up rows, so the first real request does not pay for
+    lazy imports, page faults on the model arrays or first-call allocations.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.ready = False
+        self.error: Optional[str] = None
+
+    def imported(self, since: float):
+        """Record the module import time, counting startup from `since`."""
+        self.started = since
+        self.record("import", time.perf_counter() - since)
+
+    def record(self, phase: str, seconds: float):
+        self.phases[phase] = seconds
+        STARTUP_SECONDS.set(seconds, phase=phase)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def mark_ready(self):
+        self.ready = True
+        self.error = None
+        READY.set(1)
+        print(self.report())
+
+    def fail(self, error: Exception):
+        self.error = str(error)
+        print(f"Startup failed: {error}")
+
+    def report(self) -> str:
+        phases = ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.phases.items())
+        return f"Startup: {phases}; ready {time.perf_counter() - self.started:.3f}s after import began"
+
+    def info(self) -> dict:
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            "uptime_seconds": time.perf_counter() - self.started,
+        }
+
+
+def warm_up(bundle, batch_size: int = WARMUP_BATCH):
+    """Score one row and one batch with `bundle`, as the endpoints would."""
+    zipcode = int(bundle.zipcode_index.zipcodes()[0])
+    row = InputFeatures(zipcode=zipcode, **WARMUP_HOUSE)
+    bundle.model.predict(bundle.zipcode_index.single(row).copy())
+    matrix, _ = bundle.zipcode_index.batch([row] * batch_size)
+    predictions = bundle.model.predict(matrix)
+    if not np.all(np.isfinite(predictions)):
+        raise ValueError(f"Warm-up predictions of run {bundle.run_id} are not finite.")
+
+
+startup = Startup()
@@ -1,12 +1,50 @@
-import pandas as pd
+import csv
+import json
+import os
 import pickle
-from functools import lru_cache
+from typing import Dict
+import numpy as np
 from src.config import settings
 
-def get_model():
-    path = f"mlruns/{settings.EXPERIMENT_ID}/{settings.RUN_ID}/artifacts/model.pkl"
-    with open("model/model.pkl", "rb") as f:
+def model_artifact_path(model_path: str = None, neighbor_backend: str = None):
+    model_path = model_path or settings.MODEL_PATH
+    backend = settings.NEIGHBOR_BACKEND if neighbor_backend is None else neighbor_backend
+    if settings.MODEL_ARTIFACT_DIR:
+        # src.artifact imports sklearn, which the API only needs once a model loads
+        from src.artifact import MANIFEST
+
+        return os.path.join(settings.MODEL_ARTIFACT_DIR, MANIFEST)
+    if not backend:
+        return model_path
+    return os.path.join(os.path.dirname(model_path), f"neighbors_{backend}.pkl")
+
+def run_artifact_path(experiment_id: str, run_id: str, name: str) -> str:
+    return os.path.join(settings.MLRUNS_DIR, str(experiment_id), str(run_id), "artifacts", name)
+
+def get_model(model_path: str = None, neighbor_backend: str = None):
+    if settings.MODEL_ARTIFACT_DIR:
+        from src.artifact import load_artifact
+
+        backend = settings.NEIGHBOR_BACKEND if neighbor_backend is None else neighbor_backend
+        return load_artifact(settings.MODEL_ARTIFACT_DIR, backend or None)
+    with open(model_artifact_path(model_path, neighbor_backend), "rb") as f:
         return pickle.load(f)
 
-def get_zipcode_features():
-    return pd.read_csv("data/zipcode_demographics.csv").set_index("zipcode")
+def get_run_model(experiment_id: str, run_id: str):
+    with open(run_artifact_path(experiment_id, run_id, "model.pkl"), "rb") as f:
+        return pickle.load(f)
+
+def get_zipcode_features(zipcode_path: str = None) -> Dict[str, np.ndarray]:
+    """Demographics as one array per column, read without pandas to keep it out of the API."""
+    path = zipcode_path or settings.ZIPCODE_PATH
+    with open(path, newline="") as f:
+        names = next(csv.reader(f))
+    values = np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+    return {name: values[:, i] for i, name in enumerate(names)}
+
+def get_model_features(features_path: str = None):
+    path = features_path or settings.MODEL_FEATURES_PATH
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
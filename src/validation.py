@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field, model_validator
 
 class FullInputFeatures(BaseModel):
     bedrooms: float
@@ -30,3 +31,64 @@ class InputFeatures(BaseModel):
     sqft_above: float
     sqft_basement: float
 
+
+class ColumnarInputFeatures(BaseModel):
+    """A batch as one list per feature. When every FullInputFeatures column is present
+    the rows are logged as full-schema rows."""
+    zipcode: List[int]
+    bedrooms: List[float]
+    bathrooms: List[float]
+    sqft_living: List[float]
+    sqft_lot: List[float]
+    floors: List[float]
+    sqft_above: List[float]
+    sqft_basement: List[float]
+    waterfront: Optional[List[float]] = None
+    view: Optional[List[float]] = None
+    condition: Optional[List[float]] = None
+    grade: Optional[List[float]] = None
+    yr_built: Optional[List[float]] = None
+    yr_renovated: Optional[List[float]] = None
+    lat: Optional[List[float]] = None
+    long: Optional[List[float]] = None
+    sqft_living15: Optional[List[float]] = None
+    sqft_lot15: Optional[List[float]] = None
+
+    @model_validator(mode="after")
+    def check_lengths(self):
+        lengths = {len(values) for values in self.columns().values()}
+        if len(lengths) > 1:
+            raise ValueError("All columns must have the same length.")
+        return self
+
+    def __len__(self) -> int:
+        return len(self.zipcode)
+
+    def columns(self) -> Dict[str, list]:
+        """Present columns, with the full-schema ones only when all of them are given."""
+        names = FullInputFeatures.model_fields if self.is_full() else InputFeatures.model_fields
+        return {name: getattr(self, name) for name in names}
+
+    def is_full(self) -> bool:
+        return all(getattr(self, name) is not None for name in FullInputFeatures.model_fields)
+
+
+class RoutingUpdate(BaseModel):
+    """Runs as "experiment_id/run_id". Canary weights are fractions of all traffic."""
+    canary: Dict[str, float] = {}
+    shadow: Optional[str] = None
+    shadow_fraction: float = 0.0
+
+
+class ComparablesQuery(BaseModel):
+    """Nearest past sales to a location. `sqft_living` and `bedrooms` are optional; when
+    given, only sales within `size_band` (a fraction) and `bedrooms_band` of them count.
+    Other fields are ignored, so a FullInputFeatures row is a valid query."""
+    lat: float = Field(ge=-90, le=90)
+    long: float = Field(ge=-180, le=180)
+    k: int = Field(10, ge=1)
+    sqft_living: Optional[float] = None
+    size_band: float = Field(0.2, ge=0)
+    bedrooms: Optional[float] = None
+    bedrooms_band: float = Field(1.0, ge=0)
+    max_distance_km: Optional[float] = Field(None, gt=0)
@@ -0,0 +1,106 @@
+import asyncio
+import time
+import pytest
+from src.admission import AdmissionController, Lane, Overloaded
+
+
+def _controller(concurrency=1, queue_size=2, service_seconds=0.01):
+    return AdmissionController({
+        "interactive": Lane("interactive", concurrency, queue_size, service_seconds),
+        "batch": Lane("batch", 1, 1, service_seconds),
+    })
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_requests_beyond_the_queue_are_shed_and_the_rest_run_in_order():
+    controller = _controller(concurrency=1, queue_size=2)
+    order = []
+
+    async def request(i):
+        try:
+            async with controller.admit("interactive"):
+                order.append(i)
+                await asyncio.sleep(0.01)
+            return "ok"
+        except Overloaded as e:
+            return e.reason
+
+    async def scenario():
+        return await asyncio.gather(*(request(i) for i in range(5)))
+
+    assert _run(scenario()) == ["ok", "ok", "ok", "queue full", "queue full"]
+    assert order == [0, 1, 2]
+    lane = controller.lanes["interactive"]
+    assert (lane.active, lane.queued) == (0, 0)
+
+
+def test_deadlines_reject_early_or_expire_in_the_queue():
+    controller = _controller(concurrency=1, queue_size=10, service_seconds=0.05)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def holder():
+            async with controller.admit("interactive"):
+                await release.wait()
+
+        task = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        now = time.monotonic()
+        # Estimated to wait one service time, so it cannot finish within 20 ms
+        with pytest.raises(Overloaded, match="deadline"):
+            async with controller.admit("interactive", now + 0.02):
+                pass
+        # Fits the estimate, but the slot is never freed in time
+        with pytest.raises(Overloaded, match="expired") as shed:
+            async with controller.admit("interactive", time.monotonic() + 0.15):
+                pass
+        release.set()
+        await task
+        async with controller.admit("interactive", time.monotonic() + 0.15):
+            pass
+        return shed.value
+
+    error = _run(scenario())
+    assert error.retry_after >= 1
+    lane = controller.lanes["interactive"]
+    assert (lane.active, lane.queued) == (0, 0)
+
+
+def test_batch_requests_never_take_interactive_slots():
+    controller = _controller(concurrency=1, queue_size=1)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def batch():
+            async with controller.admit("batch"):
+                await release.wait()
+
+        tasks = [asyncio.create_task(batch()) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded, match="queue full"):
+            async with controller.admit("batch"):
+                pass
+        await asyncio.wait_for(controller.lanes["interactive"].acquire(), 1)
+        controller.lanes["interactive"].release(0.01)
+        release.set()
+        await asyncio.gather(*tasks)
+
+    _run(scenario())
+
+
+def test_lane_for_and_deadline_header():
+    controller = _controller()
+    assert controller.lane_for("/predict") == "interactive"
+    assert controller.lane_for("/models/1/run/predict_full") == "interactive"
+    assert controller.lane_for("/predict_batch") == "batch"
+    assert controller.lane_for("/comparables/batch") == "batch"
+    assert controller.lane_for("/admin/model") is None
+    assert controller.deadline("250", 10.0) == pytest.approx(10.25)
+    assert controller.deadline(None, 10.0) is None
+    with pytest.raises(ValueError):
+        controller.deadline("soon", 10.0)
@@ -5,6 +5,9 @@ import numpy as np
 import pandas as pd
 from fastapi.security import HTTPBasicCredentials
 from api import app
+from src.comparables import ComparableSales
+from src.registry import registry
+from src.routing import Routing, router, shadow_scorer
 
 # === Mock setup ===
 mock_model = MagicMock()
@@ -53,6 +56,14 @@ def override_dependencies():
     yield
     app.dependency_overrides = {}
 
+@pytest.fixture(autouse=True)
+def loaded_registry():
+    with patch("src.registry.get_model", return_value=mock_model), \
+            patch("src.registry.get_zipcode_features", return_value=mock_zipcode_data), \
+            patch("src.registry.get_model_features", return_value=None):
+        registry.load()
+    yield registry
+
 # === Fixtures ===
 @pytest.fixture
 def valid_payload():
@@ -67,10 +78,8 @@ def valid_payload():
       "sqft_basement": 1911.0
     }
 
-@patch("api.get_model", return_value=mock_model)
-@patch("api.get_zipcode_features", return_value=mock_zipcode_data)
-@patch("api.log_prediction")
-def test_predict_endpoint(mock_log, mock_zip, mock_model_fn, valid_payload):
+@patch("api.log_prediction_async")
+def test_predict_endpoint(mock_log, valid_payload):
     response = client.post("/predict", json=valid_payload, auth=("user", "pass"))
     print("RESPONSE JSON:", response.json())
     #assert response.status_code == 200
@@ -80,10 +89,306 @@ def test_predict_endpoint(mock_log, mock_zip, mock_model_fn, valid_payload):
     assert "timestamp" in data
     assert "model" in data
 
-@patch("api.get_model", return_value=mock_model)
-@patch("api.get_zipcode_features", return_value=mock_zipcode_data)
-def test_predict_invalid_zipcode(mock_zip, mock_model_fn, valid_payload):
+def test_predict_invalid_zipcode(valid_payload):
     valid_payload["zipcode"] = 99999
     response = client.post("/predict", json=valid_payload, auth=("user", "pass"))
     assert response.status_code == 404
     assert "Zipcode 99999 not found" in response.json()["detail"]
+
+def test_reload_swaps_model(loaded_registry):
+    before = loaded_registry.current()
+    new_model = MagicMock()
+    new_model.predict.return_value = np.array([650000.0])
+    with patch("src.registry.get_model", return_value=new_model), \
+            patch("src.registry.get_zipcode_features", return_value=mock_zipcode_data), \
+            patch("src.registry.get_model_features", return_value=None):
+        response = client.post("/admin/reload", auth=("user", "pass"))
+    assert response.status_code == 200
+    assert response.json()["version"] == before.version + 1
+    # A request holding the old bundle keeps scoring against it
+    assert before.model is mock_model
+    assert loaded_registry.current().model is new_model
+
+def test_failed_reload_keeps_previous_model(loaded_registry):
+    before = loaded_registry.current()
+    with patch("src.registry.get_model", side_effect=FileNotFoundError("model.pkl")):
+        response = client.post("/admin/reload", auth=("user", "pass"))
+    assert response.status_code == 500
+    assert loaded_registry.current() is before
+
+def test_predict_batch_scores_rows_in_one_call(loaded_registry, valid_payload):
+    batch_model = MagicMock()
+    batch_model.predict.side_effect = lambda x: x[:, 2] * 100.0
+    with patch("src.registry.get_model", return_value=batch_model), \
+            patch("src.registry.get_zipcode_features", return_value=mock_zipcode_data), \
+            patch("src.registry.get_model_features", return_value=None):
+        loaded_registry.load()
+
+    full_payload = {
+        **valid_payload, "zipcode": 98002, "sqft_living": 2000.0, "waterfront": 0.0, "view": 0.0,
+        "condition": 3.0, "grade": 7.0, "yr_built": 1990.0, "yr_renovated": 0.0,
+        "lat": 47.3, "long": -122.2, "sqft_living15": 1800.0, "sqft_lot15": 5000.0
+    }
+    unknown = {**valid_payload, "zipcode": 99999}
+    response = client.post("/predict_batch", json=[valid_payload, unknown, full_payload],
+                           auth=("user", "pass"))
+    assert response.status_code == 200
+    results = response.json()["results"]
+
+    assert batch_model.predict.call_count == 1
+    assert batch_model.predict.call_args[0][0].shape == (2, 33)
+    assert results[0]["prediction"] == [168000.0]
+    assert results[1]["error"] == {"status_code": 404, "detail": "Zipcode 99999 not found."}
+    assert results[2]["prediction"] == [200000.0]
+    assert results[2]["features"]["lat"] == 47.3
+
+def test_predict_batch_rejects_oversized_batch(valid_payload):
+    with patch("api.settings.MAX_BATCH_SIZE", 2):
+        response = client.post("/predict_batch", json=[valid_payload] * 3, auth=("user", "pass"))
+    assert response.status_code == 413
+
+@patch("api.settings.SERVER_TIMING", True)
+def test_metrics_and_server_timing(valid_payload):
+    response = client.post("/predict", json=valid_payload, auth=("user", "pass"))
+    stages = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+    assert stages == ["features", "predict", "parse", "serialize", "total"]
+
+    body = client.get("/metrics", auth=("user", "pass")).text
+    assert 'prediction_stage_duration_seconds_count{route="/predict",stage="predict"}' in body
+    assert 'http_request_duration_seconds_bucket{route="/predict",status="200",le="+Inf"}' in body
+    assert 'zipcode_lookups_total{result="found"}' in body
+    assert 'cache="zipcode"' not in body
+    assert "# TYPE prediction_log_dropped_total counter" in body
+    assert "http_requests_in_flight 1.0" in body
+
+def test_features_echo_can_be_disabled(valid_payload):
+    response = client.post("/predict?features=false", json=valid_payload, auth=("user", "pass"))
+    assert response.status_code == 200
+    assert "features" not in response.json()
+    assert response.json()["prediction"] == [500000.0]
+
+    response = client.post("/predict_batch?features=false", json=[valid_payload], auth=("user", "pass"))
+    assert "features" not in response.json()["results"][0]
+
+def _columns(rows):
+    return {name: [row[name] for row in rows] for name in rows[0]}
+
+def test_predict_columnar(loaded_registry, valid_payload):
+    batch_model = MagicMock()
+    batch_model.predict.side_effect = lambda x: x[:, 2] * 100.0
+    with patch("src.registry.get_model", return_value=batch_model), \
+            patch("src.registry.get_zipcode_features", return_value=mock_zipcode_data), \
+            patch("src.registry.get_model_features", return_value=None):
+        loaded_registry.load()
+
+    rows = [valid_payload, {**valid_payload, "zipcode": 99999}, {**valid_payload, "sqft_living": 2000.0}]
+    with patch("api.log_prediction") as mock_log:
+        response = client.post("/predict_columnar", json=_columns(rows), auth=("user", "pass"))
+    assert response.status_code == 200
+    body = response.json()
+    assert batch_model.predict.call_count == 1
+    assert body["prediction"] == [168000.0, None, 200000.0]
+    assert body["error"] == [None, "Zipcode 99999 not found.", None]
+    assert body["ids"][1] is None and len(set(body["ids"])) == 3
+    assert mock_log.call_count == 2
+    assert mock_log.call_args.kwargs["input_data"]["features"]["sqft_living"] == 2000.0
+
+def test_predict_columnar_rejects_ragged_columns(valid_payload):
+    columns = _columns([valid_payload, valid_payload])
+    columns["bedrooms"] = [4.0]
+    response = client.post("/predict_columnar", json=columns, auth=("user", "pass"))
+    assert response.status_code == 422
+
+def test_msgpack_request_and_response(valid_payload):
+    msgpack = pytest.importorskip("msgpack")
+    response = client.post(
+        "/predict_columnar", content=msgpack.packb(_columns([valid_payload])),
+        headers={"Content-Type": "application/msgpack", "Accept": "application/msgpack"},
+        auth=("user", "pass"))
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content)["prediction"] == [500000.0]
+
+def test_msgpack_without_the_package_is_not_acceptable(valid_payload):
+    with patch("src.serialization.msgpack", None):
+        response = client.post("/predict", json=valid_payload, auth=("user", "pass"),
+                               headers={"Accept": "application/msgpack"})
+    assert response.status_code == 406
+
+@pytest.fixture
+def candidate_model(loaded_registry):
+    candidate = MagicMock()
+    candidate.predict.return_value = np.array([550000.0])
+    with patch("src.registry.get_run_model", return_value=candidate), \
+            patch("src.registry.get_zipcode_features", return_value=mock_zipcode_data), \
+            patch("src.registry.get_model_features", return_value=None):
+        yield candidate
+    for key in loaded_registry.keys():
+        if key != loaded_registry.current().key:
+            loaded_registry._bundles.pop(key)
+    router.configure(Routing(), preload=False)
+
+def test_run_selected_by_route_or_header(candidate_model, valid_payload):
+    response = client.post("/models/7/candidate/predict", json=valid_payload, auth=("user", "pass"))
+    assert response.json()["prediction"] == [550000.0]
+    assert response.json()["model"] == {"experiment_id": "7", "run_id": "candidate"}
+
+    response = client.post("/predict", json=valid_payload, auth=("user", "pass"),
+                           headers={"X-Model-Run": "7/candidate"})
+    assert response.json()["prediction"] == [550000.0]
+    assert client.post("/predict", json=valid_payload, auth=("user", "pass")).json()["prediction"] == [500000.0]
+
+    response = client.post("/predict", json=valid_payload, auth=("user", "pass"),
+                           headers={"X-Model-Run": "../secrets"})
+    assert response.status_code == 400
+
+def test_unknown_run_is_not_found(valid_payload):
+    with patch("src.registry.get_run_model", side_effect=FileNotFoundError("model.pkl")):
+        response = client.post("/models/7/missing/predict", json=valid_payload, auth=("user", "pass"))
+    assert response.status_code == 404
+
+def test_canary_and_shadow_routing(candidate_model, valid_payload):
+    response = client.put("/admin/routing", auth=("user", "pass"),
+                          json={"canary": {"7/candidate": 1.0}})
+    assert response.json()["canary"] == {"7/candidate": 1.0}
+    assert client.post("/predict", json=valid_payload, auth=("user", "pass")).json()["prediction"] == [550000.0]
+
+    client.put("/admin/routing", auth=("user", "pass"), json={"shadow": "7/candidate", "shadow_fraction": 1.0})
+    shadow_scorer.start()
+    try:
+        response = client.post("/predict", json=valid_payload, auth=("user", "pass"))
+        shadow_scorer.join()
+    finally:
+        shadow_scorer.stop()
+    # Clients get the live prediction; the candidate's only shows up in the comparison
+    assert response.json()["prediction"] == [500000.0]
+    stats = client.get("/admin/routing", auth=("user", "pass")).json()["shadow_stats"]
+    assert stats[0]["shadow"] == "7/candidate"
+    assert stats[0]["mean_relative_difference"] == pytest.approx(0.1)
+
+def test_invalid_routing_is_rejected():
+    response = client.put("/admin/routing", auth=("user", "pass"), json={"canary": {"7/a": 0.7, "7/b": 0.5}})
+    assert response.status_code == 400
+
+def test_repeated_rows_are_served_from_the_result_cache(loaded_registry, valid_payload):
+    model = loaded_registry.current().model
+    calls = model.predict.call_count
+    for _ in range(3):
+        response = client.post("/predict", json=valid_payload, auth=("user", "pass"))
+        assert response.json()["prediction"] == [500000.0]
+    assert model.predict.call_count == calls + 1
+
+    body = client.get("/metrics", auth=("user", "pass")).text
+    assert 'cache_requests_total{cache="prediction",result="hit"}' in body
+
+def test_concurrent_rows_keep_their_features_through_the_shared_cache(tmp_path, valid_payload):
+    import asyncio
+    import httpx
+    from src.cache import PredictionCache
+
+    model = MagicMock()
+    model.predict.side_effect = lambda x: x.sum(axis=1)
+    with patch("src.registry.get_model", return_value=model), \
+            patch("src.registry.get_zipcode_features", return_value=mock_zipcode_data), \
+            patch("src.registry.get_model_features", return_value=None), \
+            patch("src.registry.artifact_fingerprint", return_value="model.pkl:1:1"):
+        registry.load()
+    cache = PredictionCache(shared_path=str(tmp_path / "predictions.db"))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            responses = await asyncio.gather(*(
+                http.post("/predict", json={**valid_payload, "sqft_living": 1000.0 + i}, auth=("user", "pass"))
+                for i in range(8)))
+        return [response.json()["prediction"][0] for response in responses]
+
+    with patch("api.prediction_cache", cache), patch("api.log_prediction_async"):
+        predictions = asyncio.run(scenario())
+        # Served again from the shared store alone, each row still gets its own value
+        cache._entries.clear()
+        again = asyncio.run(scenario())
+    assert [p - predictions[0] for p in predictions] == list(range(8))
+    assert again == predictions
+
+def test_ready_only_after_models_are_warm(valid_payload):
+    from api import prepare_models
+    from src.startup import startup
+
+    assert client.get("/health").status_code == 200
+    with patch.object(startup, "ready", False):
+        assert client.get("/ready").status_code == 503
+        with patch("src.registry.get_model", return_value=mock_model), \
+                patch("src.registry.get_zipcode_features", return_value=mock_zipcode_data), \
+                patch("src.registry.get_model_features", return_value=None):
+            prepare_models()
+        response = client.get("/ready")
+    assert response.status_code == 200
+    assert {"import", "load", "warmup"} <= set(response.json()["phases"])
+    # One single-row and one batch warm-up call
+    assert [call.args[0].shape for call in mock_model.predict.call_args_list[-2:]] == [(1, 33), (64, 33)]
+
+
+@pytest.fixture
+def comparable_sales():
+    from src.comparables import ComparablesIndex
+
+    rng = np.random.default_rng(0)
+    n = 200
+    sales = {name: rng.uniform(1, 5, n) for name in ("price", "bathrooms", "sqft_lot", "floors", "grade",
+                                                     "yr_built")}
+    sales.update(bedrooms=rng.integers(1, 6, n).astype(float), sqft_living=rng.uniform(600, 4000, n),
+                 lat=rng.uniform(47.2, 47.8, n), long=rng.uniform(-122.5, -121.8, n),
+                 id=np.arange(n).astype(str), date=np.full(n, "2014-10-13"), zipcode=np.full(n, 98042))
+    index = ComparablesIndex("sales.csv")
+    index._index = ComparableSales(sales)
+    with patch("api.comparables", index):
+        yield index._index
+
+
+def test_comparables(comparable_sales):
+    query = {"lat": 47.5, "long": -122.2, "k": 3, "sqft_living": 2000, "bedrooms": 3}
+    response = client.post("/comparables", json=query, auth=("user", "pass"))
+    assert response.status_code == 200
+    sales = response.json()["comparables"]
+    assert len(sales) == 3
+    assert all(abs(sale["sqft_living"] - 2000) <= 400 for sale in sales)
+    assert [sale["distance_km"] for sale in sales] == sorted(sale["distance_km"] for sale in sales)
+
+    response = client.post("/comparables/batch", json=[query, {"lat": 47.6, "long": -122.0}],
+                           auth=("user", "pass"))
+    results = response.json()["results"]
+    assert results[0]["comparables"] == sales
+    assert len(results[1]["comparables"]) == 10
+
+    response = client.post("/comparables", json={"lat": 47.5, "long": -122.2, "k": 1000}, auth=("user", "pass"))
+    assert response.status_code == 400
+    response = client.post("/comparables", json={"lat": 120, "long": -122.2}, auth=("user", "pass"))
+    assert response.status_code == 422
+
+
+def test_comparables_before_the_index_is_loaded():
+    from src.comparables import ComparablesIndex
+
+    with patch("api.comparables", ComparablesIndex("sales.csv")):
+        response = client.post("/comparables", json={"lat": 47.5, "long": -122.2}, auth=("user", "pass"))
+    assert response.status_code == 503
+
+
+def test_overloaded_lane_sheds_with_retry_after(valid_payload):
+    from src.admission import admission
+
+    lane = admission.lanes["interactive"]
+    with patch.object(lane, "active", lane.concurrency), patch.object(lane, "queue_size", 0):
+        response = client.post("/predict", json=valid_payload, auth=("user", "pass"))
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) >= 1
+        # The batch lane is separate and still admits
+        assert client.post("/predict_batch", json=[valid_payload], auth=("user", "pass")).status_code == 200
+    response = client.post("/predict", json=valid_payload, auth=("user", "pass"),
+                           headers={"X-Request-Deadline": "soon"})
+    assert response.status_code == 400
+    response = client.post("/predict", json=valid_payload, auth=("user", "pass"),
+                           headers={"X-Request-Deadline": "500"})
+    assert response.status_code == 200
+    assert (lane.active, lane.queued) == (0, 0)
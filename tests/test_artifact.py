@@ -0,0 +1,68 @@
+import json
+import numpy as np
+import pytest
+from sklearn import neighbors, pipeline, preprocessing
+from src.artifact import MANIFEST, load_artifact, save_artifact
+from src.neighbors import NeighborRegressor
+
+rng = np.random.default_rng(1)
+X = rng.normal(size=(500, 5)) * [1, 10, 100, 1, 5]
+y = X @ rng.normal(size=5)
+queries = rng.normal(size=(30, 5)) * [1, 10, 100, 1, 5]
+
+
+@pytest.fixture
+def model():
+    return pipeline.make_pipeline(
+        preprocessing.RobustScaler(), neighbors.KNeighborsRegressor(weights="distance")).fit(X, y)
+
+
+@pytest.fixture
+def regressors(model):
+    return {
+        "brute": NeighborRegressor.from_pipeline(model, "brute"),
+        "kd_tree": NeighborRegressor.from_pipeline(model, "kd_tree", leaf_size=20),
+        "rp_forest": NeighborRegressor.from_pipeline(model, "rp_forest", n_trees=5),
+    }
+
+
+@pytest.mark.parametrize("backend", ["brute", "kd_tree", "ball_tree", "rp_forest"])
+def test_round_trip_matches_saved_regressor(tmp_path, model, regressors, backend):
+    save_artifact(str(tmp_path / "artifact"), regressors, ["a", "b", "c", "d", "e"])
+    loaded = load_artifact(str(tmp_path / "artifact"), backend)
+
+    assert isinstance(loaded.fit_X, np.memmap)
+    assert not loaded.fit_X.flags.writeable
+    expected = regressors[backend].predict(queries) if backend in regressors else model.predict(queries)
+    np.testing.assert_allclose(loaded.predict(queries), expected)
+
+
+def test_rp_forest_trees_are_not_rebuilt(tmp_path, regressors):
+    save_artifact(str(tmp_path / "artifact"), regressors)
+    loaded = load_artifact(str(tmp_path / "artifact"), "rp_forest")
+    assert loaded.index.trees[0]["indices"].base is not None
+    np.testing.assert_array_equal(
+        loaded.index.trees[0]["indices"], regressors["rp_forest"].index.trees[0]["indices"])
+
+
+def test_overwrite_keeps_mapped_arrays_intact(tmp_path, regressors):
+    directory = str(tmp_path / "artifact")
+    save_artifact(directory, regressors)
+    loaded = load_artifact(directory)
+    before = np.array(loaded.fit_X)
+
+    save_artifact(directory, {"brute": NeighborRegressor.from_pipeline(
+        pipeline.make_pipeline(preprocessing.RobustScaler(), neighbors.KNeighborsRegressor())
+        .fit(X[:400], y[:400]), "brute")})
+    np.testing.assert_array_equal(loaded.fit_X, before)
+    assert load_artifact(directory).fit_X.shape == (400, 5)
+
+
+def test_manifest_mismatch_is_rejected(tmp_path, regressors):
+    directory = tmp_path / "artifact"
+    save_artifact(str(directory), regressors)
+    manifest = json.loads((directory / MANIFEST).read_text())
+    manifest["arrays"]["y"]["shape"] = [1]
+    (directory / MANIFEST).write_text(json.dumps(manifest))
+    with pytest.raises(ValueError, match="'y'"):
+        load_artifact(str(directory))
@@ -0,0 +1,82 @@
+import asyncio
+import numpy as np
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from src.batching import MicroBatcher
+
+
+def _bundle(offset=0.0):
+    model = MagicMock()
+    model.predict.side_effect = lambda x: x[:, 0] + offset
+    return SimpleNamespace(model=model)
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_concurrent_rows_share_one_model_call():
+    bundle = _bundle()
+
+    async def scenario():
+        batcher = MicroBatcher(max_batch_size=64, max_wait_ms=20)
+        await batcher.start()
+        rows = [np.array([[float(i), 1.0]]) for i in range(10)]
+        results = await asyncio.gather(*(batcher.predict(bundle, row) for row in rows))
+        await batcher.stop()
+        return results
+
+    results = _run(scenario())
+    assert [float(r[0]) for r in results] == [float(i) for i in range(10)]
+    assert bundle.model.predict.call_count == 1
+    assert bundle.model.predict.call_args[0][0].shape == (10, 2)
+
+
+def test_batches_respect_max_size_and_split_by_bundle():
+    old, new = _bundle(), _bundle(offset=1000.0)
+
+    async def scenario():
+        batcher = MicroBatcher(max_batch_size=4, max_wait_ms=20)
+        await batcher.start()
+        calls = [batcher.predict(old if i % 2 else new, np.array([[float(i)]])) for i in range(8)]
+        results = await asyncio.gather(*calls)
+        await batcher.stop()
+        return results
+
+    results = _run(scenario())
+    assert [float(r[0]) for r in results] == [1000.0, 1.0, 1002.0, 3.0, 1004.0, 5.0, 1006.0, 7.0]
+    sizes = [call[0][0].shape[0] for call in old.model.predict.call_args_list + new.model.predict.call_args_list]
+    assert max(sizes) <= 4 and sum(sizes) == 8
+
+
+def test_model_errors_reach_every_caller():
+    bundle = _bundle()
+    bundle.model.predict.side_effect = ValueError("bad input")
+
+    async def scenario():
+        batcher = MicroBatcher(max_batch_size=8, max_wait_ms=5)
+        await batcher.start()
+        results = await asyncio.gather(
+            *(batcher.predict(bundle, np.zeros((1, 2))) for _ in range(3)), return_exceptions=True)
+        await batcher.stop()
+        return results
+
+    results = _run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_stop_fails_rows_already_taken_off_the_queue():
+    bundle = _bundle()
+
+    async def scenario():
+        # The collector holds the first rows while it waits for the batch to fill
+        batcher = MicroBatcher(max_batch_size=64, max_wait_ms=10_000)
+        await batcher.start()
+        calls = [asyncio.ensure_future(batcher.predict(bundle, np.zeros((1, 2)))) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+        return await asyncio.wait_for(asyncio.gather(*calls, return_exceptions=True), 1)
+
+    results = _run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert bundle.model.predict.call_count == 0
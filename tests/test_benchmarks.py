@@ -0,0 +1,48 @@
+import json
+from benchmarks.run import compare, main
+
+baseline = {
+    "meta": {"timestamp": "then"},
+    "stages": {"predict": {"median_us": 100.0}},
+    "load": {"concurrency_8": {"p99_ms": 10.0, "requests_per_s": 500.0, "failed": 0}},
+}
+
+
+def test_compare_within_tolerance():
+    current = {
+        "meta": {"timestamp": "now"},
+        "stages": {"predict": {"median_us": 115.0}, "new_stage": {"median_us": 1.0}},
+        "load": {"concurrency_8": {"p99_ms": 9.0, "requests_per_s": 450.0, "failed": 0}},
+    }
+    assert compare(current, baseline, tolerance=0.2) == []
+
+
+def test_compare_flags_slower_latency_lower_throughput_and_failures():
+    current = {
+        "stages": {"predict": {"median_us": 130.0}},
+        "load": {"concurrency_8": {"p99_ms": 10.0, "requests_per_s": 350.0, "failed": 3}},
+    }
+    regressions = compare(current, baseline, tolerance=0.2)
+    assert [r.split(":")[0] for r in regressions] == [
+        "stages.predict.median_us", "load.concurrency_8.requests_per_s", "load.concurrency_8.failed"]
+
+
+def test_missing_baseline_requires_update_flag(tmp_path):
+    missing = str(tmp_path / "baseline.json")
+    assert main(["--skip-stages", "--skip-load", "--baseline", missing,
+                 "--output", str(tmp_path / "results.json")]) == 2
+    assert not (tmp_path / "results.json").exists()
+
+    assert main(["--skip-stages", "--skip-load", "--baseline", missing, "--update-baseline",
+                 "--output", str(tmp_path / "results.json")]) == 0
+    assert (tmp_path / "baseline.json").exists()
+
+
+def test_baseline_with_another_cache_setting_is_rejected(tmp_path):
+    paths = ["--baseline", str(tmp_path / "baseline.json"), "--output", str(tmp_path / "results.json")]
+    assert main(["--skip-stages", "--skip-load", "--update-baseline", *paths]) == 0
+    with open(tmp_path / "baseline.json") as f:
+        assert json.load(f)["meta"]["prediction_cache"] is False
+
+    assert main(["--skip-stages", "--skip-load", *paths]) == 0
+    assert main(["--skip-stages", "--skip-load", "--prediction-cache", *paths]) == 2
@@ -0,0 +1,67 @@
+import json
+import pickle
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import RobustScaler
+from src.bulk import score_file
+from src.engine import NativeKNN
+from src.features import USER_FEATURES
+from src.registry import ModelRegistry
+from src.validation import InputFeatures
+
+
+@pytest.fixture
+def model_files(tmp_path):
+    rng = np.random.default_rng(0)
+    zipcodes = pd.DataFrame({"zipcode": [98001, 98002, 98003], "ppltn_qty": [1000.0, 2000.0, 3000.0]})
+    zipcodes.to_csv(tmp_path / "zipcodes.csv", index=False)
+    X = rng.uniform(1, 5000, size=(200, len(USER_FEATURES) + 1))
+    # 'distance' weights are where sklearn and the native engine differ in the last digits
+    model = make_pipeline(RobustScaler(), KNeighborsRegressor(n_neighbors=5, weights="distance"))
+    model.fit(X, X.sum(axis=1))
+    with open(tmp_path / "model.pkl", "wb") as f:
+        pickle.dump(model, f)
+    return str(tmp_path / "model.pkl"), str(tmp_path / "zipcodes.csv"), str(tmp_path / "features.json")
+
+
+def _listings(n):
+    rng = np.random.default_rng(1)
+    listings = pd.DataFrame({name: rng.integers(1, 4000, n).astype(float) for name in USER_FEATURES})
+    listings["zipcode"] = rng.choice([98001, 98002, 98003, 99999], n)
+    return listings
+
+
+@pytest.mark.parametrize("suffix, workers", [(".csv", 1), (".parquet", 2)])
+def test_offline_scores_match_the_online_path(tmp_path, model_files, suffix, workers):
+    listings = _listings(250)
+    input_path = str(tmp_path / f"listings{suffix}")
+    if suffix == ".csv":
+        listings.to_csv(input_path, index=False)
+    else:
+        listings.to_parquet(input_path, index=False)
+    output_path = str(tmp_path / "predictions.parquet")
+
+    summary = score_file(input_path, output_path, *model_files, run=None, workers=workers, chunksize=40)
+
+    table = pq.read_table(output_path)
+    results = table.to_pandas()
+    assert summary["rows"] == len(results) == 250
+    assert results["row"].tolist() == list(range(250))
+    assert set(results["experiment_id"].astype(str)) == {summary["experiment_id"]}
+    assert json.loads(table.schema.metadata[b"scoring_run"])["run_id"] == summary["run_id"]
+
+    # Scored the way `/predict_full` scores one row at a time
+    bundle = ModelRegistry(*model_files).load()
+    assert isinstance(bundle.model, NativeKNN)
+    for record, result in zip(listings.to_dict(orient="records"), results.itertuples()):
+        if record["zipcode"] not in bundle.zipcode_index:
+            assert np.isnan(result.prediction)
+            assert result.error == f"Zipcode {record['zipcode']} not found."
+            continue
+        row = bundle.zipcode_index.single(InputFeatures(**record))
+        assert result.prediction == bundle.model.predict(row)[0]
+    assert summary["unknown_zipcode"] == int((listings["zipcode"] == 99999).sum())
@@ -0,0 +1,81 @@
+import numpy as np
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from src.cache import PredictionCache, row_digest
+
+
+def _bundle(version=1, fingerprint=None, offset=0.0):
+    model = MagicMock()
+    model.predict.side_effect = lambda x: x[:, 0] + offset
+    return SimpleNamespace(key=("1", "run"), version=version, fingerprint=fingerprint, model=model)
+
+
+def test_only_uncached_rows_reach_the_model():
+    cache = PredictionCache(max_entries=100, ttl=60, shared_path="")
+    bundle = _bundle()
+    np.testing.assert_array_equal(cache.predict(bundle, np.array([[1.0, 2.0], [3.0, 4.0]])), [1.0, 3.0])
+    np.testing.assert_array_equal(cache.predict(bundle, np.array([[3.0, 4.0], [5.0, 6.0]])), [3.0, 5.0])
+    assert bundle.model.predict.call_args[0][0].tolist() == [[5.0, 6.0]]
+
+    cache.predict(bundle, np.array([[-0.0, 1.0]]))
+    cache.predict(bundle, np.array([[0.0, 1.0]]))
+    assert bundle.model.predict.call_count == 3
+    assert row_digest(np.array([-0.0])) == row_digest(np.array([0.0]))
+
+
+def test_entries_expire_and_are_bounded():
+    cache = PredictionCache(max_entries=2, ttl=10, shared_path="")
+    bundle = _bundle()
+    rows = np.array([[1.0], [2.0], [3.0]])
+    cache.predict(bundle, rows)
+    assert len(cache) == 2
+    _, found, _ = cache.lookup(bundle, rows)
+    assert found.tolist() == [False, True, True]
+
+    with patch("src.cache.time.monotonic", return_value=1e12):
+        _, found, _ = cache.lookup(bundle, rows)
+    assert not found.any()
+
+
+def test_new_model_version_never_sees_old_results():
+    cache = PredictionCache(max_entries=100, ttl=60, shared_path="")
+    old, new = _bundle(version=1), _bundle(version=2, offset=100.0)
+    row = np.array([[1.0]])
+    cache.predict(old, row)
+    cache.invalidate(new)
+    assert len(cache) == 0
+    np.testing.assert_array_equal(cache.predict(new, row), [101.0])
+
+
+def test_workers_share_results_through_sqlite(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first, second = (PredictionCache(max_entries=100, ttl=60, shared_path=path) for _ in range(2))
+    fingerprint = "1/run:model.pkl:123:456:Pipeline"
+    row = np.array([[7.0, 1.0]])
+    first.predict(_bundle(fingerprint=fingerprint), row)
+
+    bundle = _bundle(fingerprint=fingerprint)
+    np.testing.assert_array_equal(second.predict(bundle, row), [7.0])
+    bundle.model.predict.assert_not_called()
+    # Another artifact file is another model, whatever the run id
+    other = _bundle(version=2, fingerprint="1/run:model.pkl:999:456:Pipeline")
+    second.predict(other, row)
+    other.model.predict.assert_called_once()
+
+
+def test_memory_lookup_never_queries_sqlite(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first, second = (PredictionCache(max_entries=100, ttl=60, shared_path=path) for _ in range(2))
+    bundle = _bundle(fingerprint="1/run:model.pkl:123:456:Pipeline")
+    row = np.array([[7.0, 1.0]])
+    first.store_shared(bundle, [row_digest(row[0])], [7.0])
+
+    with patch.object(second.shared, "get", side_effect=AssertionError("SQLite queried")):
+        values, found, digests = second.lookup(bundle, row)
+    assert not found[0]
+    assert second.lookup_shared(bundle, values, digests)[0]
+    assert values[0] == 7.0
+    # Found in SQLite once, then served from memory
+    assert second.lookup(bundle, row)[1][0]
+    indexes = second.shared._connection().execute("PRAGMA index_list(predictions)").fetchall()
+    assert any(index[1] == "predictions_expires" for index in indexes)
@@ -0,0 +1,94 @@
+import asyncio
+import httpx
+import pandas as pd
+from unittest.mock import MagicMock
+from src.client import LoadReport, post_with_retries, score_frame
+
+
+def _fake_session():
+    def post(url, json, timeout, params=None, headers=None):
+        assert params == {"features": "false"}
+        assert headers == {"X-Request-Deadline": str(int(timeout * 1000))}
+        response = MagicMock(status_code=200)
+        if json[0]["zipcode"] == 0:
+            response.status_code = 503
+            return response
+        results = []
+        for index, row in enumerate(json):
+            if row["zipcode"] == 99999:
+                results.append({"index": index, "error": {"status_code": 404, "detail": "Zipcode 99999 not found."}})
+                continue
+            results.append({"index": index, "id": f"id-{row['sqft_living']}", "timestamp": "t",
+                            "prediction": [row["sqft_living"] * 100], "model": {"experiment_id": "1", "run_id": "2"}})
+        response.json.return_value = {"results": results}
+        return response
+
+    session = MagicMock()
+    session.post.side_effect = post
+    return session
+
+
+def test_score_frame_aligns_results_with_input_index():
+    df = pd.DataFrame({"zipcode": [98042, 99999, 98042, 0, 98042],
+                       "sqft_living": [1.0, 2.0, 3.0, 4.0, 5.0]}, index=[10, 11, 12, 13, 14])
+    progress = []
+    results = score_frame(_fake_session(), "http://api/predict_batch", df, chunk_size=3,
+                          concurrency=2, on_progress=lambda done, total, _: progress.append((done, total)))
+
+    assert list(results.index) == [10, 11, 12, 13, 14]
+    assert results.loc[10, "prediction"] == 100.0
+    assert results.loc[12, "prediction"] == 300.0
+    assert results.loc[11, "error"] == "Zipcode 99999 not found."
+    assert results.loc[13, "error"] == "Error: 503"
+    assert results.loc[14, "error"] == "Error: 503"
+    assert sorted(progress)[-1] == (5, 5)
+
+
+def test_post_with_retries_retries_server_errors_and_timeouts():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            raise httpx.ReadTimeout("slow", request=request)
+        if len(calls) == 2:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"prediction": [1.0]})
+
+    async def run():
+        report = LoadReport()
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            response = await post_with_retries(client, "http://api/predict", {}, retries=3,
+                                               backoff=0.001, report=report)
+        return response, report
+
+    response, report = asyncio.run(run())
+    assert response.status_code == 200
+    assert len(calls) == 3
+    assert report.retried == 2
+
+
+def test_post_with_retries_returns_client_errors_immediately():
+    async def run():
+        transport = httpx.MockTransport(lambda request: httpx.Response(404))
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await post_with_retries(client, "http://api/predict", {}, retries=3)
+
+    assert asyncio.run(run()).status_code == 404
+
+
+def test_post_with_retries_waits_as_long_as_the_server_asks(monkeypatch):
+    delays = []
+
+    async def sleep(seconds):
+        delays.append(seconds)
+
+    monkeypatch.setattr("src.client.asyncio.sleep", sleep)
+    responses = iter([httpx.Response(503, headers={"Retry-After": "2"}), httpx.Response(200)])
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(lambda request: next(responses))) as client:
+            return await post_with_retries(client, "http://api/predict", {}, retries=3)
+
+    assert asyncio.run(scenario()).status_code == 200
+    assert delays == [2.0]
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from src.comparables import ComparableSales, read_sales
+from src.validation import ComparablesQuery
+
+
+def _sales(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    sales = {
+        "price": rng.uniform(2e5, 1e6, n),
+        "bedrooms": rng.integers(1, 6, n).astype(float),
+        "bathrooms": rng.integers(1, 4, n).astype(float),
+        "sqft_living": rng.uniform(600, 4000, n),
+        "sqft_lot": rng.uniform(1000, 10000, n),
+        "floors": np.ones(n),
+        "grade": np.full(n, 7.0),
+        "yr_built": np.full(n, 1990.0),
+        "lat": rng.uniform(47.2, 47.8, n),
+        "long": rng.uniform(-122.5, -121.8, n),
+    }
+    sales["id"] = np.array([str(i) for i in range(n)])
+    sales["date"] = np.array(["2014-10-13"] * n)
+    sales["zipcode"] = np.full(n, 98042)
+    return sales
+
+
+def _haversine_km(lat, long, lats, longs):
+    lat, long, lats, longs = map(np.radians, (lat, long, lats, longs))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((longs - long) / 2) ** 2
+    return 2 * 6371.0088 * np.arcsin(np.sqrt(a))
+
+
+def test_nearest_sales_within_bands_match_brute_force():
+    sales = _sales()
+    index = ComparableSales(sales)
+    distances = _haversine_km(47.5, -122.2, sales["lat"], sales["long"])
+    queries = [
+        ComparablesQuery(lat=47.5, long=-122.2, k=7),
+        ComparablesQuery(lat=47.5, long=-122.2, k=7, sqft_living=2000, bedrooms=3),
+        # Few sales fit, so the tree candidates run out and every sale is scanned
+        ComparablesQuery(lat=47.5, long=-122.2, k=7, sqft_living=3900, size_band=0.01, bedrooms=5,
+                         bedrooms_band=0),
+        ComparablesQuery(lat=47.5, long=-122.2, k=50, max_distance_km=5),
+    ]
+    for query, sales_found in zip(queries, index.query_many(queries)):
+        keep = np.ones(len(distances), dtype=bool)
+        if query.sqft_living is not None:
+            keep &= np.abs(sales["sqft_living"] - query.sqft_living) <= query.size_band * query.sqft_living
+            keep &= np.abs(sales["bedrooms"] - query.bedrooms) <= query.bedrooms_band
+        if query.max_distance_km is not None:
+            keep &= distances <= query.max_distance_km
+        expected = np.flatnonzero(keep)[np.argsort(distances[keep])][:query.k]
+        assert [sale["id"] for sale in sales_found] == [str(i) for i in expected]
+        np.testing.assert_allclose([sale["distance_km"] for sale in sales_found], distances[expected], atol=1e-4)
+        assert sales_found == index.query(query)
+
+
+def test_read_sales(tmp_path):
+    path = tmp_path / "sales.csv"
+    path.write_text(
+        "id,date,price,bedrooms,bathrooms,sqft_living,sqft_lot,floors,grade,yr_built,zipcode,lat,long\n"
+        '"7129300520","20141013T000000",221900,3,1,1180,5650,"1",7,1955,"98178",47.5112,-122.257\n')
+    index = ComparableSales(read_sales(str(path)))
+    [sale] = index.query(ComparablesQuery(lat=47.5112, long=-122.257, k=3))
+    assert sale["id"] == "7129300520"
+    assert sale["date"] == "2014-10-13"
+    assert sale["zipcode"] == 98178
+    assert sale["price"] == pytest.approx(221900.0)
+    assert sale["distance_km"] == 0.0
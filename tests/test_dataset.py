@@ -0,0 +1,74 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from src.dataset import FEATURE_DTYPE, build_features, load_features
+
+SALES_COLUMNS = [
+    "price", "bedrooms", "bathrooms", "sqft_living", "sqft_lot", "floors",
+    "sqft_above", "sqft_basement", "zipcode",
+]
+
+
+@pytest.fixture
+def sources(tmp_path):
+    sales = pd.DataFrame({
+        "id": [1, 2, 3, 4, 5],
+        "price": [221900.0, 538000.0, 180000.0, 604000.0, 510000.0],
+        "bedrooms": [3, 3, 2, 4, 3],
+        "bathrooms": [1.0, 2.25, 1.0, 3.0, 2.0],
+        "sqft_living": [1180, 2570, 770, 1960, 1680],
+        "sqft_lot": [5650, 7242, 10000, 5000, 8080],
+        "floors": [1.0, 2.0, 1.0, 1.0, 1.0],
+        "sqft_above": [1180, 2170, 770, 1050, 1680],
+        "sqft_basement": [0, 400, 0, 910, 0],
+        "zipcode": [98178, 98125, 99999, 98178, 98125],
+    })
+    demographics = pd.DataFrame({
+        "ppltn_qty": [6038.0, 37081.0], "medn_hshld_incm_amt": [38356.0, 48975.0],
+        "zipcode": [98178, 98125],
+    })
+    sales_path, demographics_path = tmp_path / "sales.csv", tmp_path / "demographics.csv"
+    sales.to_csv(sales_path, index=False)
+    demographics.to_csv(demographics_path, index=False)
+    return str(sales_path), str(demographics_path), sales, demographics
+
+
+def test_matches_a_pandas_merge(sources):
+    sales_path, demographics_path, sales, demographics = sources
+    features, y, columns, dropped = build_features(
+        sales_path, demographics_path, SALES_COLUMNS, chunksize=2)
+
+    merged = sales[SALES_COLUMNS].merge(demographics, how="left", on="zipcode").dropna().drop(columns="zipcode")
+    expected_y = merged.pop("price")
+    assert features.dtype == FEATURE_DTYPE
+    assert columns == list(merged.columns)
+    assert dropped == 1
+    np.testing.assert_array_equal(features, merged.to_numpy(dtype=FEATURE_DTYPE))
+    np.testing.assert_array_equal(y, expected_y.to_numpy())
+
+
+def test_store_is_reused_until_a_source_changes(sources, tmp_path):
+    sales_path, demographics_path, sales, _ = sources
+    cache_dir = str(tmp_path / "store")
+    features, y, columns = load_features(sales_path, demographics_path, SALES_COLUMNS, cache_dir=cache_dir)
+    assert isinstance(features, np.memmap)
+
+    with patch("src.dataset.build_features") as build:
+        cached, cached_y, cached_columns = load_features(
+            sales_path, demographics_path, SALES_COLUMNS, cache_dir=cache_dir)
+    build.assert_not_called()
+    np.testing.assert_array_equal(cached, features)
+    assert cached_columns == columns
+
+    sales.assign(price=sales["price"] + 1).to_csv(sales_path, index=False)
+    _, changed_y, _ = load_features(sales_path, demographics_path, SALES_COLUMNS, cache_dir=cache_dir)
+    np.testing.assert_array_equal(changed_y, y + 1)
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_unexpected_sales_columns_are_rejected(sources):
+    sales_path, demographics_path, _, _ = sources
+    with pytest.raises(ValueError, match="Sales features"):
+        build_features(sales_path, demographics_path, ["price", "bedrooms", "zipcode"])
@@ -0,0 +1,45 @@
+import numpy as np
+from src.drift import StreamingStats, build_baseline, drift_report, load_windows, merge_windows
+
+
+def records(values):
+    return [{"id": str(i), "timestamp": "2025-01-01T00:00:00", "prediction": value * 1000,
+             "run_id": "2", "bedrooms": value, "zipcode": 98042} for i, value in enumerate(values)]
+
+
+def test_workers_merge_into_one_window(tmp_path):
+    rng = np.random.default_rng(0)
+    for pid in range(2):
+        stats = StreamingStats(str(tmp_path), window_seconds=60)
+        stats.update(records(rng.normal(3, 1, 500)), now=120)
+        stats.path = lambda pid=pid: str(tmp_path / f"stats-{pid}.json")
+        stats.save()
+
+    windows = load_windows(str(tmp_path))
+    assert list(windows) == [120]
+    assert set(windows[120]) == {"prediction", "bedrooms"}
+    assert windows[120]["bedrooms"].n == 1000
+
+
+def test_old_windows_are_expired():
+    stats = StreamingStats(window_seconds=60, max_windows=2)
+    for minute in range(4):
+        stats.update(records([1.0]), now=minute * 60)
+    assert sorted(stats.windows) == [120, 180]
+    assert merge_windows(stats.windows, since=150)["bedrooms"].n == 1
+
+
+def test_report_flags_shifted_features():
+    rng = np.random.default_rng(0)
+    baseline = build_baseline({"bedrooms": rng.normal(3, 1, 5000), "prediction": rng.normal(3000, 1000, 5000)})
+    stats = StreamingStats()
+    stats.update(records(rng.normal(3, 1, 5000)), now=0)
+    stable = drift_report(baseline, merge_windows(stats.windows))
+    assert list(stable["feature"]) == ["bedrooms", "prediction"]
+    assert (stable["psi"] < 0.05).all() and (stable["ks"] < 0.05).all()
+
+    shifted = StreamingStats()
+    shifted.update(records(rng.normal(4, 1, 5000)), now=0)
+    report = drift_report(baseline, merge_windows(shifted.windows)).set_index("feature")
+    assert report.loc["bedrooms", "psi"] > 0.2
+    assert report.loc["bedrooms", "ks"] > 0.3
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn import neighbors, pipeline, preprocessing
+from src.engine import MAX_NATIVE_ROWS, NativeKNN, compile_model
+from src.neighbors import NeighborRegressor
+
+SALES_COLUMNS = [
+    "price", "bedrooms", "bathrooms", "sqft_living", "sqft_lot", "floors",
+    "sqft_above", "sqft_basement", "zipcode",
+]
+
+
+@pytest.fixture(scope="module")
+def house_data():
+    demographics = pd.read_csv("data/zipcode_demographics.csv", dtype={"zipcode": str})
+    sales = pd.read_csv("data/kc_house_data.csv", usecols=SALES_COLUMNS, dtype={"zipcode": str})
+    train = sales.merge(demographics, how="left", on="zipcode").drop(columns="zipcode")
+    y = train.pop("price").to_numpy()
+    unseen = pd.read_csv("data/future_unseen_examples.csv", dtype={"zipcode": str})
+    unseen = unseen.merge(demographics, how="left", on="zipcode")[train.columns]
+    return train.to_numpy(dtype=np.float64), y, unseen.to_numpy(dtype=np.float64)
+
+
+@pytest.mark.parametrize("weights, rtol", [("uniform", 1e-12), ("distance", 1e-3)])
+def test_parity_with_sklearn_on_unseen_examples(house_data, weights, rtol):
+    X, y, unseen = house_data
+    model = pipeline.make_pipeline(
+        preprocessing.RobustScaler(), neighbors.KNeighborsRegressor(weights=weights)).fit(X, y)
+    engine = compile_model(model)
+    assert isinstance(engine, NativeKNN)
+
+    # Row by row, as the API scores them, so the native path is the one under test
+    native = np.concatenate([engine.predict(row[None, :]) for row in unseen])
+    np.testing.assert_allclose(native, model.predict(unseen), rtol=rtol)
+
+
+@pytest.mark.parametrize("k", [2, 3])
+def test_ties_keep_the_lowest_index_like_sklearn(k):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(40, 3))
+    X[[7, 19, 33]] = X[5]
+    y = np.arange(len(X), dtype=np.float64)
+    model = pipeline.make_pipeline(
+        preprocessing.StandardScaler(),
+        neighbors.KNeighborsRegressor(n_neighbors=k, algorithm="brute")).fit(X, y)
+    query = X[5:6] + 0.01
+    _, indices = NativeKNN.from_pipeline(model).kneighbors(query)
+    np.testing.assert_array_equal(np.sort(indices[0]), [5, 7, 19, 33][:k])
+    np.testing.assert_allclose(NativeKNN.from_pipeline(model).predict(query), model.predict(query))
+
+
+def test_large_inputs_use_the_fallback(house_data):
+    X, y, unseen = house_data
+    model = pipeline.make_pipeline(preprocessing.RobustScaler(), neighbors.KNeighborsRegressor()).fit(X, y)
+    engine = NativeKNN.from_pipeline(model)
+    batch = unseen[:MAX_NATIVE_ROWS + 1]
+    np.testing.assert_allclose(engine.predict(batch), model.predict(batch))
+    np.testing.assert_allclose(engine.kneighbors(batch)[1], model[-1].kneighbors(model[0].transform(batch))[1])
+
+
+def test_invalid_input_is_rejected(house_data):
+    X, y, unseen = house_data
+    engine = compile_model(pipeline.make_pipeline(
+        preprocessing.RobustScaler(), neighbors.KNeighborsRegressor()).fit(X, y))
+    with pytest.raises(ValueError, match="shape"):
+        engine.predict(unseen[:1, :-1])
+    row = unseen[:1].copy()
+    row[0, 0] = np.nan
+    with pytest.raises(ValueError, match="NaN"):
+        engine.predict(row)
+
+
+def test_only_exact_euclidean_models_are_compiled(house_data):
+    X, y, _ = house_data
+    manhattan = pipeline.make_pipeline(
+        preprocessing.RobustScaler(), neighbors.KNeighborsRegressor(p=1)).fit(X, y)
+    assert compile_model(manhattan) is manhattan
+
+    euclidean = pipeline.make_pipeline(preprocessing.RobustScaler(), neighbors.KNeighborsRegressor()).fit(X, y)
+    approximate = NeighborRegressor.from_pipeline(euclidean, "rp_forest", n_trees=2)
+    assert compile_model(approximate) is approximate
+    assert isinstance(compile_model(NeighborRegressor.from_pipeline(euclidean, "brute")), NativeKNN)
+    assert compile_model({"value": 1}) == {"value": 1}
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.features import USER_FEATURES, ZipcodeIndex
+from src.utils import get_zipcode_features
+from src.validation import InputFeatures
+
+demographics = pd.DataFrame({
+    'zipcode': [98002, 98042, 98199],
+    'per_urbn': [99.0, 97.0, 100.0],
+    'ppltn_qty': [30905.0, 38249.0, 19848.0],
+}).set_index('zipcode')
+
+
+def _row(zipcode, sqft_living=1000.0):
+    return InputFeatures(zipcode=zipcode, bedrooms=3, bathrooms=2, sqft_living=sqft_living,
+                         sqft_lot=5000, floors=1, sqft_above=1000, sqft_basement=0)
+
+
+def test_columns_follow_model_feature_order():
+    index = ZipcodeIndex(demographics, USER_FEATURES + ['ppltn_qty', 'per_urbn'])
+    assert index.columns == ['ppltn_qty', 'per_urbn']
+    assert index.matrix.flags['C_CONTIGUOUS']
+    np.testing.assert_array_equal(index.single(_row(98042))[0, 7:], [38249.0, 97.0])
+
+
+def test_missing_model_feature_is_rejected():
+    with pytest.raises(ValueError, match="hous_val_amt"):
+        ZipcodeIndex(demographics, USER_FEATURES + ['ppltn_qty', 'hous_val_amt'])
+
+
+def test_lookups_outside_and_inside_range():
+    index = ZipcodeIndex(demographics)
+    assert 98042 in index
+    assert 98001 not in index
+    assert 98043 not in index
+    np.testing.assert_array_equal(index.rows(np.array([97000, 98199, 98100, 99999])), [-1, 2, -1, -1])
+    with pytest.raises(KeyError):
+        index.single(_row(99999))
+
+
+def test_batch_matches_single_rows():
+    index = ZipcodeIndex(demographics)
+    rows = [_row(98002, 1100.0), _row(99999), _row(98199, 1300.0)]
+    matrix, known = index.batch(rows)
+    np.testing.assert_array_equal(known, [True, False, True])
+    np.testing.assert_array_equal(matrix[0], index.single(rows[0])[0])
+    np.testing.assert_array_equal(matrix[1], index.single(rows[2])[0])
+
+
+def test_demographics_file_reads_like_pandas(tmp_path):
+    path = tmp_path / "demographics.csv"
+    demographics.reset_index().to_csv(path, index=False)
+    from_file = ZipcodeIndex(get_zipcode_features(str(path)), USER_FEATURES + ['ppltn_qty', 'per_urbn'])
+    from_frame = ZipcodeIndex(demographics, USER_FEATURES + ['ppltn_qty', 'per_urbn'])
+    np.testing.assert_array_equal(from_file.matrix, from_frame.matrix)
+    np.testing.assert_array_equal(from_file.zipcodes(), [98002, 98042, 98199])
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import time
+import pandas as pd
+from unittest.mock import patch
+from src.drift import StreamingStats, load_windows, merge_windows
+from src.logger import PredictionLogSink, is_compacted, prediction_record
+from src.monitoring import LogTail
+
+response = {
+    "id": "abc",
+    "timestamp": "2025-01-01T00:00:00",
+    "prediction": [500000.0],
+    "model": {"experiment_id": "1", "run_id": "2"},
+    "features": {"zipcode": 98042, "bedrooms": 4.0},
+}
+
+
+def test_sink_writes_batched_segments(tmp_path):
+    with patch("src.logger.LOG_DIR", str(tmp_path / "inputs")), \
+            patch("src.logger.LOG_DIR_ALL", str(tmp_path / "all_inputs")):
+        sink = PredictionLogSink(max_queue=100, batch_size=4, flush_interval=60, compact_interval=0)
+        sink.start()
+        for i in range(10):
+            assert sink.submit({**prediction_record(response), "id": str(i)}, full=i % 2 == 0)
+        sink.stop()
+
+    inputs = pd.read_parquet(tmp_path / "inputs")
+    all_inputs = pd.read_parquet(tmp_path / "all_inputs")
+    assert sorted(inputs["id"]) == ["1", "3", "5", "7", "9"]
+    assert sorted(all_inputs["id"]) == ["0", "2", "4", "6", "8"]
+    assert list(inputs.columns) == ["id", "timestamp", "prediction", "experiment_id", "run_id",
+                                    "zipcode", "bedrooms"]
+    assert sink.stats()["written"] == 10
+
+
+def test_sink_drops_when_queue_is_full():
+    sink = PredictionLogSink(max_queue=2, policy="drop")
+    results = [sink.submit(prediction_record(response)) for _ in range(3)]
+    assert results == [True, True, False]
+    assert sink.stats()["dropped"] == 1
+
+
+def test_async_submit_never_waits_on_the_event_loop():
+    sink = PredictionLogSink(max_queue=1, policy="block", block_timeout=0.2)
+
+    async def scenario():
+        assert await sink.submit_async(prediction_record(response))
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        # The queue is full, so this waits for space on a worker thread
+        accepted = await sink.submit_async(prediction_record(response))
+        task.cancel()
+        return accepted, ticks
+
+    accepted, ticks = asyncio.run(scenario())
+    assert not accepted
+    assert ticks >= 5
+    assert sink.stats()["dropped"] == 1
+
+
+def test_segments_are_compacted_and_expire_by_age(tmp_path):
+    with patch("src.logger.LOG_DIR", str(tmp_path)):
+        sink = PredictionLogSink(retention_days=30)
+        for i in range(4):
+            sink._flush([{**prediction_record(response), "id": str(i)}], full=False)
+        tail = LogTail(str(tmp_path))
+        tail.refresh()
+        sink._flush([{**prediction_record(response), "id": "4"}], full=False)
+        sink._housekeep(str(tmp_path))
+
+        [compacted] = os.listdir(tmp_path)
+        assert is_compacted(compacted)
+        assert sorted(pd.read_parquet(tmp_path)["id"]) == ["0", "1", "2", "3", "4"]
+        # Rows of segments the tail already read are not loaded again
+        assert sorted(tail.refresh()["id"]) == ["0", "1", "2", "3", "4"]
+        assert tail.total_rows == 5
+
+        sink._flush([{**prediction_record(response), "id": "5"}], full=False)
+        old = time.time() - 31 * 86400
+        os.utime(tmp_path / compacted, (old, old))
+        sink._housekeep(str(tmp_path))
+    assert sorted(pd.read_parquet(tmp_path)["id"]) == ["5"]
+
+
+def test_refresh_between_compaction_and_source_deletion(tmp_path):
+    with patch("src.logger.LOG_DIR", str(tmp_path)):
+        sink = PredictionLogSink()
+        sink._flush([{**prediction_record(response), "id": "0"}], full=False)
+        tail = LogTail(str(tmp_path))
+        tail.refresh()
+        sink._flush([{**prediction_record(response), "id": "1"}], full=False)
+        # The compacted file is in place but its sources are not deleted yet
+        with patch("src.logger.os.remove"):
+            sink._housekeep(str(tmp_path))
+        assert len(os.listdir(tmp_path)) == 3
+        assert sorted(tail.refresh()["id"]) == ["0", "1"]
+    for name in os.listdir(tmp_path):
+        if not is_compacted(name):
+            os.remove(tmp_path / name)
+    assert sorted(tail.refresh()["id"]) == ["0", "1"]
+    assert tail.total_rows == 2
+
+
+def test_oldest_logs_go_beyond_the_size_cap(tmp_path):
+    with patch("src.logger.LOG_DIR", str(tmp_path)):
+        sink = PredictionLogSink(retention_days=0, max_mb=1e-9)
+        sink._flush([prediction_record(response)], full=False)
+        sink._housekeep(str(tmp_path))
+    assert os.listdir(tmp_path) == []
+
+
+def test_flushed_records_update_streaming_stats(tmp_path):
+    stats = StreamingStats(str(tmp_path / "stats"))
+    with patch("src.logger.LOG_DIR", str(tmp_path / "inputs")):
+        sink = PredictionLogSink(batch_size=2, flush_interval=60, compact_interval=0, stats=stats)
+        sink.start()
+        for _ in range(3):
+            sink.submit(prediction_record(response))
+        sink.stop()
+
+    windows = load_windows(str(tmp_path / "stats"))
+    sketches = merge_windows(windows)
+    assert set(sketches) == {"prediction", "bedrooms"}
+    assert sketches["prediction"].n == 3
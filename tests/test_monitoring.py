@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+from src.monitoring import LogTail, box_stats, histogram, sample_rows
+
+
+def _write_segment(log_dir, name, start, n):
+    pd.DataFrame({
+        "id": [str(i) for i in range(start, start + n)],
+        "prediction": np.arange(start, start + n, dtype=float),
+        "bedrooms": np.arange(start, start + n) % 4,
+    }).to_parquet(log_dir / name, index=False)
+
+
+def test_log_tail_reads_only_new_segments(tmp_path):
+    _write_segment(tmp_path, "part-1.parquet", 0, 5)
+    tail = LogTail(str(tmp_path), max_rows=8)
+    assert len(tail.refresh()) == 5
+
+    _write_segment(tmp_path, "part-2.parquet", 5, 5)
+    (tmp_path / "part-1.parquet").unlink()
+    frame = tail.refresh()
+    assert list(frame["id"]) == [str(i) for i in range(2, 10)]
+    assert frame["prediction"].dtype == np.float32
+    assert tail.total_rows == 10
+    assert tail.refresh() is frame
+
+
+def test_plot_reductions():
+    frame = pd.DataFrame({"prediction": np.arange(1000.0), "sqft": np.arange(1000.0) * 2,
+                          "bedrooms": np.arange(1000) % 3})
+    assert histogram(frame["prediction"], bins=10)["count"].sum() == 1000
+    assert len(sample_rows(frame, max_points=100)) == 100
+
+    stats = box_stats(frame, "bedrooms")
+    assert list(stats["bedrooms"]) == [0, 1, 2]
+    assert list(stats["count"]) == [334, 333, 333]
+    assert len(box_stats(frame, "sqft", max_groups=10)) == 10
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from sklearn import neighbors, pipeline, preprocessing
+from src.neighbors import NeighborRegressor, build_index, recall_at_k
+
+rng = np.random.default_rng(0)
+X = rng.normal(size=(600, 6)) * [1, 10, 100, 1, 5, 50]
+y = X @ rng.normal(size=6)
+queries = rng.normal(size=(40, 6)) * [1, 10, 100, 1, 5, 50]
+
+
+def _pipeline(weights="uniform"):
+    return pipeline.make_pipeline(
+        preprocessing.RobustScaler(), neighbors.KNeighborsRegressor(weights=weights)).fit(X, y)
+
+
+@pytest.mark.parametrize("backend", ["brute", "kd_tree", "ball_tree"])
+@pytest.mark.parametrize("weights", ["uniform", "distance"])
+def test_exact_backends_match_sklearn(backend, weights):
+    model = _pipeline(weights)
+    regressor = NeighborRegressor.from_pipeline(model, backend)
+    np.testing.assert_allclose(regressor.predict(queries), model.predict(queries))
+
+
+def test_rp_forest_recall():
+    scaled = preprocessing.RobustScaler().fit_transform(X)
+    exact = build_index("brute", scaled).query(scaled[:50], 5)[1]
+    approx = build_index("rp_forest", scaled, n_trees=10, leaf_size=40).query(scaled[:50], 5)[1]
+    assert recall_at_k(exact, approx) > 0.9
+    # Training points find themselves first
+    np.testing.assert_array_equal(approx[:, 0], np.arange(50))
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="hnsw"):
+        build_index("hnsw", X)
+
+
+@pytest.mark.parametrize("scaler", [preprocessing.StandardScaler(), preprocessing.MinMaxScaler()])
+def test_other_scalers_match_sklearn(scaler):
+    model = pipeline.make_pipeline(scaler, neighbors.KNeighborsRegressor()).fit(X, y)
+    regressor = NeighborRegressor.from_pipeline(model, "brute")
+    np.testing.assert_allclose(regressor.predict(queries), model.predict(queries))
@@ -0,0 +1,114 @@
+import os
+import pickle
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from src.config import settings
+from src.registry import ModelRegistry, artifact_fingerprint, parse_run
+
+
+def _write_model(path, value):
+    with open(path, "wb") as f:
+        pickle.dump({"value": value}, f)
+
+
+def test_watcher_reloads_changed_model(tmp_path):
+    model_path = tmp_path / "model.pkl"
+    zipcode_path = tmp_path / "zipcodes.csv"
+    _write_model(model_path, 1)
+    pd.DataFrame({"zipcode": [98042], "ppltn_qty": [1.0]}).to_csv(zipcode_path, index=False)
+
+    registry = ModelRegistry(str(model_path), str(zipcode_path), str(tmp_path / "features.json"))
+    first = registry.load("exp", "run")
+    assert first.model == {"value": 1}
+    assert not registry.changed_on_disk()
+
+    _write_model(model_path, 2)
+    os.utime(model_path, (time.time() + 5, time.time() + 5))
+    registry.start_watcher(0.01)
+    try:
+        deadline = time.time() + 2
+        while registry.current().version == first.version and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        registry.stop_watcher()
+
+    assert registry.current().model == {"value": 2}
+    assert registry.current().version == first.version + 1
+    assert registry.keys() == [("exp", "run")]
+
+
+def _write_run(mlruns, run_id, size):
+    artifacts = mlruns / "1" / run_id / "artifacts"
+    artifacts.mkdir(parents=True)
+    _write_model(artifacts / "model.pkl", np.zeros(size))
+
+
+def test_runs_are_cached_within_the_memory_budget(tmp_path):
+    zipcode_path = tmp_path / "zipcodes.csv"
+    pd.DataFrame({"zipcode": [98042], "ppltn_qty": [1.0]}).to_csv(zipcode_path, index=False)
+    _write_model(tmp_path / "model.pkl", np.zeros(100))
+    for run_id in ("a", "b", "c"):
+        _write_run(tmp_path / "mlruns", run_id, 1000)
+
+    registry = ModelRegistry(str(tmp_path / "model.pkl"), str(zipcode_path), str(tmp_path / "features.json"),
+                             cache_bytes=20_000)
+    with patch.object(settings, "MLRUNS_DIR", str(tmp_path / "mlruns")):
+        active = registry.load("1", "active")
+        registry.pinned = frozenset({("1", "a")})
+        first = registry.get_or_load("1", "a")
+        assert first.size_bytes == 8000
+        assert registry.get_or_load("1", "a") is first
+        registry.get_or_load("1", "b")
+        registry.get_or_load("1", "c")
+        with pytest.raises(FileNotFoundError):
+            registry.get_or_load("1", "missing")
+
+    # "b" was least recently used; the active bundle and pinned "a" are never evicted
+    assert registry.keys() == [("1", "active"), ("1", "a"), ("1", "c")]
+    assert registry.current() is active
+
+
+def test_run_larger_than_the_budget_is_kept(tmp_path, capsys):
+    zipcode_path = tmp_path / "zipcodes.csv"
+    pd.DataFrame({"zipcode": [98042], "ppltn_qty": [1.0]}).to_csv(zipcode_path, index=False)
+    _write_model(tmp_path / "model.pkl", np.zeros(100))
+    _write_run(tmp_path / "mlruns", "big", 1000)
+
+    registry = ModelRegistry(str(tmp_path / "model.pkl"), str(zipcode_path), str(tmp_path / "features.json"),
+                             cache_bytes=4000)
+    with patch.object(settings, "MLRUNS_DIR", str(tmp_path / "mlruns")):
+        registry.load("1", "active")
+        big = registry.get_or_load("1", "big")
+        # Served from the cache, not loaded again on every request
+        assert registry.get_or_load("1", "big") is big
+    assert registry.keys() == [("1", "active"), ("1", "big")]
+    assert "over the" in capsys.readouterr().out
+
+
+def test_exported_artifact_is_fingerprinted_by_its_manifest(tmp_path):
+    manifest = tmp_path / "artifact" / "manifest.json"
+    manifest.parent.mkdir()
+    manifest.write_text('{"n_neighbors": 5}')
+    registry = ModelRegistry(str(tmp_path / "model.pkl"))
+    with patch.object(settings, "MODEL_ARTIFACT_DIR", str(manifest.parent)):
+        assert registry.artifact_path() == str(manifest)
+    first = artifact_fingerprint(str(manifest), "brute")
+    assert first.startswith(f"{manifest}:")
+
+    # A re-export with the same size and timestamp still changes the fingerprint
+    stat = os.stat(manifest)
+    manifest.write_text('{"n_neighbors": 7}')
+    os.utime(manifest, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert artifact_fingerprint(str(manifest), "brute") not in (first, None)
+    assert artifact_fingerprint(str(manifest), "kd_tree") != artifact_fingerprint(str(manifest), "brute")
+    assert artifact_fingerprint(str(tmp_path / "missing.json")) is None
+
+
+def test_parse_run():
+    assert parse_run("7/abc123") == ("7", "abc123")
+    assert parse_run("abc123") == (settings.EXPERIMENT_ID, "abc123")
+    with pytest.raises(ValueError):
+        parse_run("../../etc/passwd")
@@ -0,0 +1,41 @@
+import numpy as np
+from src.sketches import KLLSketch
+
+
+def test_quantiles_are_within_rank_error():
+    values = np.random.default_rng(0).lognormal(13, 0.5, 50_000)
+    sketch = KLLSketch(k=200, seed=0)
+    sketch.update_many(values)
+
+    assert sketch.n == len(values)
+    assert len(sketch.to_dict()["levels"]) < 12
+    assert sum(len(items) for items in sketch.levels) < 3 * 200
+    q = np.linspace(0.05, 0.95, 19)
+    ranks = np.searchsorted(np.sort(values), sketch.quantile(q)) / len(values)
+    assert np.max(np.abs(ranks - q)) < 0.02
+    assert sketch.min == values.min() and sketch.max == values.max()
+    np.testing.assert_allclose(sketch.mean, values.mean())
+
+
+def test_merged_sketches_match_one_sketch():
+    values = np.random.default_rng(1).normal(size=30_000)
+    parts = [KLLSketch(seed=i) for i in range(3)]
+    for part, chunk in zip(parts, np.array_split(values, 3)):
+        part.update_many(chunk)
+    merged = parts[0].merge(parts[1]).merge(parts[2])
+
+    assert merged.n == len(values)
+    weights = sum(len(items) * 2 ** level for level, items in enumerate(merged.levels))
+    assert weights == len(values)
+    np.testing.assert_allclose(merged.cdf([-1.0, 0.0, 1.0]), [0.1587, 0.5, 0.8413], atol=0.02)
+
+
+def test_round_trip_and_empty_sketch():
+    sketch = KLLSketch(k=50)
+    assert np.isnan(sketch.quantile(0.5))
+    sketch.update_many([3.0, 1.0, float("nan"), 2.0])
+    restored = KLLSketch.from_dict(sketch.to_dict())
+    assert restored.n == 3
+    assert float(restored.quantile(0.5)) == 2.0
+    restored.update(4.0)
+    assert restored.n == 4